@@ -0,0 +1,114 @@
+"""
+Measure importing, editing and deleting many notes one call at a time
+versus with one ``ZKB.apply_changes`` batch.
+
+Each phase runs on a fresh vault with the offline fake QA backend: first
+``--notes`` notes are created, then the metadata of each is rewritten, then
+all are deleted. With ``--chromadb`` the QA pairs go to an in-memory
+chromadb collection instead of the fake one, so the per-call cost of a real
+vector store shows up.
+
+Usage::
+
+    python benchmarks/bench_batch_crud.py [--notes 5000] [--chromadb]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from zkb import ZKB
+from zkb.batch import CREATE, DELETE, UPDATE
+from zkb.bench import FakeQuestionAnswerKB
+from zkb.bench.fake_qa import fake_embedding
+
+
+def make_backend(use_chromadb: bool, name: str) -> FakeQuestionAnswerKB:
+    backend = FakeQuestionAnswerKB()
+    if use_chromadb:
+        import chromadb
+
+        class FakeEmbedding(chromadb.EmbeddingFunction):
+            def __init__(self) -> None:
+                pass
+
+            def __call__(self, input):
+                return [fake_embedding(text) for text in input]
+
+            @staticmethod
+            def name() -> str:
+                return "bench-fake"
+
+        backend.collection = chromadb.EphemeralClient().get_or_create_collection(
+            name, embedding_function=FakeEmbedding(), metadata={"hnsw:space": "cosine"}
+        )
+    return backend
+
+
+def run(tmp: Path, label: str, num_notes: int, batched: bool, use_chromadb: bool):
+    zkb = ZKB(
+        data_dir=str(tmp / label / "data"),
+        db_dir=str(tmp / label / "db"),
+        qa_backend=make_backend(use_chromadb, label),
+        qa_cache_max_bytes=0,
+        qa_dedup_similarity=0,
+    )
+    zkb.notes_path.mkdir(parents=True, exist_ok=True)
+    filenames = [f"imported_{i:06d}" for i in range(num_notes)]
+    phases = [
+        (
+            "create",
+            [
+                (CREATE, name, f"Imported note {i}. It links to [[imported_{i + 1:06d}]].")
+                for i, name in enumerate(filenames)
+            ],
+        ),
+        (
+            "update metadata",
+            [
+                (
+                    UPDATE,
+                    name,
+                    f"Imported note {i}. It links to [[imported_{i + 1:06d}]].",
+                    {"tags": "imported"},
+                )
+                for i, name in enumerate(filenames)
+            ],
+        ),
+        ("delete", [(DELETE, name) for name in filenames]),
+    ]
+    methods = {CREATE: zkb.create_note, UPDATE: zkb.update_note, DELETE: zkb.delete_note}
+    timings = []
+    for phase, changes in phases:
+        start = time.perf_counter()
+        if batched:
+            zkb.apply_changes(changes)
+        else:
+            for action, *args in changes:
+                methods[action](*args)
+        timings.append((phase, time.perf_counter() - start))
+    zkb.db.close()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--chromadb", action="store_true")
+    args = parser.parse_args()
+
+    store = "chromadb" if args.chromadb else "fake collection"
+    print(f"notes: {args.notes:,}, vector store: {store}")
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            label: run(Path(tmp), label, args.notes, batched, args.chromadb)
+            for label, batched in (("per_note", False), ("batched", True))
+        }
+    print(f"{'phase':<18} {'per note s':>11} {'batched s':>10} {'speedup':>8}")
+    for (phase, single), (_, batched) in zip(results["per_note"], results["batched"]):
+        print(f"{phase:<18} {single:>11.2f} {batched:>10.2f} {single / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
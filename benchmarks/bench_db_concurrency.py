@@ -0,0 +1,117 @@
+"""
+Measure read latency of ``Database`` while another thread writes.
+
+Reader threads run backlinks, orphans and full-text search queries, first
+on an idle database, then while a writer thread rebuilds the notes in bulk
+batches as a scan does. Both runs are repeated with the reads sharing the
+writer connection (``--read-connections 0``, as before the pool) and with
+the pool of read-only connections.
+
+Usage::
+
+    python benchmarks/bench_db_concurrency.py [--notes 20000] [--readers 4]
+"""
+
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from bench_db_ingest import make_rows
+from zkb.db import Database
+
+
+def read_latencies(db: Database, readers: int, seconds: float, num_notes: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def read(worker: int) -> None:
+        i = worker
+        mine = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if i % 3 == 0:
+                db.get_backlinks(f"note_{i % num_notes}")
+            elif i % 3 == 1:
+                db.get_orphaned_notes()
+            else:
+                db.search_notes(f"Note {i % num_notes}", limit=10)
+            mine.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=read, args=(w,)) for w in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def run(db_file: Path, rows: list, readers: int, read_connections: int, seconds: float):
+    db = Database(str(db_file), read_connections=read_connections)
+    with db.bulk_mode():
+        db.bulk_add_or_update_notes(rows)
+    idle = read_latencies(db, readers, seconds, len(rows))
+
+    stop = threading.Event()
+    writes = [0]
+
+    def write() -> None:
+        while not stop.is_set():
+            with db.bulk_mode():
+                writes[0] += db.bulk_add_or_update_notes(rows)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    loaded = read_latencies(db, readers, seconds, len(rows))
+    stop.set()
+    writer.join()
+    db.close()
+    return idle, loaded, writes[0] / seconds
+
+
+def describe(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p99 = ordered[int(len(ordered) * 0.99)] if ordered else 0.0
+    return (
+        f"{len(latencies):>7,} reads"
+        f" p50 {statistics.median(ordered) * 1000:>8.2f} ms"
+        f" p99 {p99 * 1000:>8.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=20_000)
+    parser.add_argument("--links", type=int, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--read-connections", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rows = make_rows(args.notes, args.links)
+    print(f"notes: {args.notes:,}, reader threads: {args.readers}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, read_connections in (
+            ("shared connection", 0),
+            (f"{args.read_connections} read connections", args.read_connections),
+        ):
+            idle, loaded, writes = run(
+                Path(tmp) / f"{read_connections}.db",
+                rows,
+                args.readers,
+                read_connections,
+                args.seconds,
+            )
+            print(label)
+            print(f"  idle:        {describe(idle)}")
+            print(f"  under write: {describe(loaded)} ({writes:,.0f} notes/s written)")
+
+
+if __name__ == "__main__":
+    main()
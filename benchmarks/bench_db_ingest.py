@@ -0,0 +1,68 @@
+"""
+Compare per-note writes with the bulk ingest path of ``Database``.
+
+Usage::
+
+    python benchmarks/bench_db_ingest.py [--notes 20000] [--links 5]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from zkb.db import Database
+
+
+def make_rows(num_notes: int, links_per_note: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        (
+            f"note_{i}",
+            f"/vault/note_{i}.md",
+            f"Note {i}",
+            [
+                (f"note_{rng.randrange(num_notes)}", f"link {j}")
+                for j in range(links_per_note)
+            ],
+        )
+        for i in range(num_notes)
+    ]
+
+
+def bench_per_note(db_file: Path, rows: list) -> float:
+    db = Database(str(db_file))
+    start = time.perf_counter()
+    for row in rows:
+        db.add_or_update_note_links(*row)
+    return time.perf_counter() - start
+
+
+def bench_bulk(db_file: Path, rows: list) -> float:
+    db = Database(str(db_file))
+    start = time.perf_counter()
+    with db.bulk_mode():
+        db.bulk_add_or_update_notes(rows)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=20_000)
+    parser.add_argument("--links", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.notes, args.links)
+    with tempfile.TemporaryDirectory() as tmp:
+        before = bench_per_note(Path(tmp) / "per_note.db", rows)
+        after = bench_bulk(Path(tmp) / "bulk.db", rows)
+
+    print(f"notes: {args.notes}, links per note: {args.links}")
+    print(f"per-note writes: {args.notes / before:>10,.0f} notes/s ({before:.2f}s)")
+    print(f"bulk ingest:     {args.notes / after:>10,.0f} notes/s ({after:.2f}s)")
+    print(f"speedup:         {before / after:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Time the in-memory link graph on a synthetic vault.
+
+Usage::
+
+    python benchmarks/bench_graph.py [--notes 100000] [--links 1000000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from zkb.db import Database
+from zkb.graph import LinkGraph
+
+
+def make_rows(num_notes: int, num_links: int, seed: int = 0) -> list:
+    """Notes whose link targets follow a power law, plus a few broken links."""
+    rng = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(num_notes)]
+    targets = rng.choices(range(num_notes), weights=weights, k=num_links)
+    rows = []
+    for i in range(num_notes):
+        chunk = targets[i * num_links // num_notes : (i + 1) * num_links // num_notes]
+        links = [(f"note_{t}", "") for t in chunk]
+        if i % 100 == 0:
+            links.append((f"missing_{i}", ""))
+        rows.append((f"note_{i}", f"/vault/note_{i}.md", f"Note {i}", links))
+    return rows
+
+
+def timed(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label:<32} {time.perf_counter() - start:>8.3f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=100_000)
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    rows = make_rows(args.notes, args.links)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "graph.db"))
+        with db.bulk_mode():
+            db.bulk_add_or_update_notes(rows)
+        print(f"notes: {args.notes:,}, links: {args.links:,}")
+
+        graph = timed("load from SQLite", LinkGraph.from_db, db)
+        samples = [f"note_{rng.randrange(args.notes)}" for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        for filename in samples:
+            db.get_backlinks(filename)
+        sql = (time.perf_counter() - start) / args.queries
+        start = time.perf_counter()
+        for filename in samples:
+            graph.backlinks(filename)
+        mem = (time.perf_counter() - start) / args.queries
+        print(
+            f"{'backlinks (SQL / graph)':<32} {sql * 1e6:>7.0f}us / {mem * 1e6:.0f}us"
+        )
+
+        start = time.perf_counter()
+        sizes = [len(graph.neighborhood(f, hops=2, direction="out")) for f in samples]
+        elapsed = (time.perf_counter() - start) / args.queries
+        print(
+            f"{'2-hop out-neighbourhood':<32} {elapsed * 1e3:>7.2f}ms"
+            f" (avg {sum(sizes) / len(sizes):,.0f} notes)"
+        )
+
+        start = time.perf_counter()
+        for source, target in zip(samples, reversed(samples)):
+            graph.shortest_path(source, target)
+        elapsed = (time.perf_counter() - start) / args.queries
+        print(f"{'shortest path':<32} {elapsed * 1e3:>7.2f}ms")
+
+        components = timed("connected components", graph.connected_components)
+        timed("connected components (cached)", graph.connected_components)
+        print(f"{'':<32} {len(components):,} components")
+        timed("pagerank", graph.pagerank)
+        timed("pagerank (cached)", graph.pagerank)
+
+        start = time.perf_counter()
+        for i in range(1000):
+            graph.update_note(f"note_{i}", [f"note_{rng.randrange(args.notes)}"])
+        elapsed = (time.perf_counter() - start) / 1000
+        print(f"{'incremental update':<32} {elapsed * 1e6:>7.0f}us")
+        timed("compact", graph.compact)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare the memory held by Note objects and NoteRecords for a synthetic vault.
+
+Usage::
+
+    python benchmarks/bench_note_memory.py [--notes 50000]
+"""
+
+import argparse
+import gc
+import random
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from zkb.note import Note, NoteRecord
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+
+
+def make_vault(directory: Path, num_notes: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    paths = []
+    for i in range(num_notes):
+        body = " ".join(
+            rng.choice(WORDS)
+            if rng.random() > 0.02
+            else f"[[note_{rng.randrange(num_notes)}]]"
+            for _ in range(rng.randint(100, 600))
+        )
+        path = directory / f"note_{i}.md"
+        path.write_text(
+            f"---\ntitle: Note {i}\ntags: [{rng.choice(WORDS)}]\n---\n{body}"
+        )
+        paths.append(path)
+    return paths
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_vault(Path(tmp), args.notes)
+        cases = {
+            "Note, parsed": lambda: [Note(path).parse() for path in paths],
+            "Note, unparsed": lambda: [Note(path) for path in paths],
+            # Built from throwaway Notes, so no strings are shared with them
+            "NoteRecord": lambda: [NoteRecord.from_note(Note(path)) for path in paths],
+        }
+        print(f"notes: {args.notes:,}")
+        for label, build in cases.items():
+            size = measure(build)
+            print(
+                f"{label:<16} {size / 2**20:>8.1f} MiB"
+                f" {size / args.notes:>8,.0f} bytes/note"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Time Note parsing per note on a generated corpus.
+
+Usage::
+
+    python benchmarks/bench_note_parse.py [--notes 5000] [--large-mib 64]
+
+Also reports time and peak memory for one large note, which is
+memory-mapped rather than read into a string.
+"""
+
+import argparse
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import yaml
+
+from zkb.note import Note
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+
+
+def make_corpus(directory: Path, num_notes: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    paths = []
+    for i in range(num_notes):
+        frontmatter = "\n".join(
+            [
+                f"title: Note {i}",
+                f"tags: [{', '.join(rng.sample(WORDS, 3))}]",
+                "created: 2024-01-01",
+                f"summary: {' '.join(rng.choices(WORDS, k=12))}",
+            ]
+        )
+        paragraphs = [
+            " ".join(
+                rng.choice(WORDS)
+                if rng.random() > 0.05
+                else f"[[note_{rng.randrange(num_notes)}]]"
+                for _ in range(80)
+            )
+            for _ in range(rng.randint(2, 8))
+        ]
+        path = directory / f"note_{i}.md"
+        path.write_text(f"---\n{frontmatter}\n---\n\n" + "\n\n".join(paragraphs))
+        paths.append(path)
+    return paths
+
+
+def parse_legacy(path: Path) -> tuple:
+    """The parser Note used before: eager, pure-Python YAML, per-call regex."""
+    with open(path, "r", encoding="utf-8") as file:
+        content = file.read()
+    metadata = {}
+    if content.startswith("---"):
+        end = content.find("---", 3)
+        if end != -1:
+            metadata = yaml.safe_load(content[3:end]) or {}
+            content = content[end + 3 :].strip()
+    links = re.findall(r"\[\[([^\]|#]+)(?:#([^\]|]+))?(?:\|([^\]]+))?\]\]", content)
+    return metadata, content, links
+
+
+def per_note_us(func, paths: list) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    return (time.perf_counter() - start) / len(paths) * 1e6
+
+
+def bench_large(directory: Path, size_mib: int) -> None:
+    path = directory / "large.md"
+    # A transcript-like body: ~1k-byte paragraphs, one link per ~100 of them
+    paragraph = " ".join(WORDS * 14) + "\n\n"
+    section = paragraph * 100 + "See [[note_1]].\n\n"
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("---\ntitle: Large\n---\n")
+        file.write(section * (size_mib * 2**20 // len(section)))
+
+    cases = {
+        "legacy eager parse": lambda: parse_legacy(path),
+        "Note, links only": lambda: Note(path).links,
+        "Note, 16k-char chunks": lambda: sum(1 for _ in Note(path).iter_chunks(16000)),
+        "Note, all fields": lambda: Note(path).parse(),
+    }
+    print(f"large note: {size_mib} MiB")
+    for label, func in cases.items():
+        tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<24} {elapsed:>8.3f}s {peak / 2**20:>8.1f} MiB peak")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--large-mib", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(Path(tmp), args.notes)
+        per_note_us(parse_legacy, paths)  # warm the page cache
+        cases = {
+            "legacy eager parse": parse_legacy,
+            "Note, all fields": lambda path: Note(path).parse(),
+            "Note, links only": lambda path: Note(path).links,
+            "Note, construct only": Note,
+        }
+        print(f"notes: {args.notes}")
+        for label, func in cases.items():
+            print(f"{label:<24} {per_note_us(func, paths):>8.1f} us/note")
+        bench_large(Path(tmp), args.large_mib)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Measure QA collection size and query latency with and without deduplication.
+
+Notes share templated boilerplate sections, as vaults built from templates
+do. Indexing runs offline: QA pairs come from sentences, embeddings from a
+hashed bag of words, and the collection is an in-memory chromadb one.
+
+Usage::
+
+    python benchmarks/bench_qa_dedup.py [--notes 2000] [--queries 200]
+"""
+
+import argparse
+import hashlib
+import math
+import random
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import chromadb
+from zkb import ZKB
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+BOILERPLATE = [
+    "## Review\n\nReview this note every month. Link it from the weekly index. "
+    "Archive it when the project closes.",
+    "## License\n\nThis note is shared under the team license. "
+    "Ask the owner before publishing it.",
+    "## Template\n\nFill in the summary first. Keep one idea per note. "
+    "Add sources at the end.",
+]
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def embed(texts, dim: int = 256) -> list:
+    vectors = []
+    for text in texts:
+        vector = [0.0] * dim
+        for word in WORD_PATTERN.findall(text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        vectors.append([v / norm for v in vector])
+    return vectors
+
+
+class HashEmbedding(chromadb.EmbeddingFunction):
+    def __init__(self) -> None:
+        pass
+
+    def __call__(self, input):
+        return embed(input)
+
+    @staticmethod
+    def name() -> str:
+        return "bench-hash"
+
+
+class OfflineQA:
+    """One QA pair per sentence, numbered rewordings, no LLM calls."""
+
+    def __init__(self, name: str) -> None:
+        self.embedding_function = HashEmbedding()
+        self.collection = chromadb.EphemeralClient().create_collection(
+            name,
+            embedding_function=self.embedding_function,
+            metadata={"hnsw:space": "cosine"},
+        )
+
+    def generate_qa_pairs(self, input_text: str) -> list:
+        sentences = [s.strip() for s in SENTENCE_PATTERN.split(input_text)]
+        return [
+            {"q": f"What does the note say about {s.rstrip('.')}?", "a": s}
+            for s in sentences
+            if s and not s.startswith("#")
+        ]
+
+    def generate_rewordings(self, question: str, num_rewordings: int) -> list:
+        return [question] + [f"{question} ({i})" for i in range(1, num_rewordings + 1)]
+
+
+def make_vault(directory: Path, num_notes: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    questions = []
+    for i in range(num_notes):
+        facts = [
+            " ".join(rng.choice(WORDS) for _ in range(8)).capitalize() + f" {i}."
+            for _ in range(3)
+        ]
+        questions.append(f"What does the note say about {facts[0].rstrip('.')}?")
+        sections = [" ".join(facts)] + rng.sample(BOILERPLATE, 2)
+        (directory / f"note_{i}.md").write_text(
+            f"---\ntitle: Note {i}\n---\n" + "\n\n".join(sections)
+        )
+    return questions
+
+
+def build(notes_dir: Path, db_dir: Path, similarity: float) -> tuple:
+    qa = OfflineQA(f"bench_{int(similarity * 100)}")
+    zkb = ZKB(
+        data_dir=str(notes_dir),
+        db_dir=str(db_dir),
+        qa_backend=qa,
+        qa_cache_max_bytes=0,
+        qa_dedup_similarity=similarity,
+        query_cache_size=0,
+    )
+    start = time.perf_counter()
+    zkb.scan_notes()
+    return zkb, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--similarity", type=float, default=0.97)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        (data_dir / "notes").mkdir(parents=True)
+        questions = make_vault(data_dir / "notes", args.notes)
+        questions = random.Random(1).sample(questions, min(args.queries, args.notes))
+        cases = {
+            label: build(data_dir, Path(tmp) / label, similarity)
+            for label, similarity in (("no dedup", 0), ("dedup", args.similarity))
+        }
+        # Interleave the queries so both collections see the same conditions
+        latencies = {label: [] for label in cases}
+        for question in questions:
+            for label, (zkb, _) in cases.items():
+                start = time.perf_counter()
+                zkb.query_qa(question, num_rewordings=0)
+                latencies[label].append(time.perf_counter() - start)
+
+        print(f"notes: {args.notes:,}")
+        entries = {}
+        for label, (zkb, index_seconds) in cases.items():
+            entries[label] = zkb.qa_kb.collection.count()
+            print(
+                f"{label:<9} {entries[label]:>9,} entries"
+                f" {index_seconds:>7.1f} s to index"
+                f" {statistics.median(latencies[label]) * 1000:>7.2f} ms/query (median)"
+            )
+        saved = 1 - entries["dedup"] / entries["no dedup"]
+        print(f"collection size saved: {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main()
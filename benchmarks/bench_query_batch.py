@@ -0,0 +1,95 @@
+"""
+Measure answering many questions with ``ZKB.query_qa`` one at a time versus
+one ``ZKB.query_qa_batch`` call.
+
+A vault of ``--notes`` notes is indexed with the offline fake QA backend,
+then ``--questions`` distinct questions are asked each way with
+``--rewordings`` rewordings, starting from empty query caches.
+``--llm-latency`` delays each rewording call and ``--query-latency`` each
+vector store query, standing in for a remote LLM and a vector store round
+trip. With ``--chromadb`` the QA pairs go to an in-memory chromadb
+collection instead of the fake one.
+
+Usage::
+
+    python benchmarks/bench_query_batch.py [--notes 2000] [--questions 2000]
+        [--rewordings 3] [--llm-latency 0.01] [--query-latency 0.002] [--chromadb]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from bench_batch_crud import make_backend
+from zkb import ZKB
+from zkb.batch import CREATE
+
+TOPICS = "gardening cooking travel finance music history physics poetry".split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--rewordings", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.01)
+    parser.add_argument("--query-latency", type=float, default=0.002)
+    parser.add_argument("--chromadb", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = make_backend(args.chromadb, "bench-query-batch")
+        zkb = ZKB(
+            data_dir=str(Path(tmp) / "data"),
+            db_dir=str(Path(tmp) / "db"),
+            qa_backend=backend,
+            qa_cache_max_bytes=0,
+            qa_dedup_similarity=0,
+        )
+        zkb.apply_changes(
+            (
+                CREATE,
+                f"note_{i:05d}",
+                f"Note {i} is about {TOPICS[i % len(TOPICS)]}. "
+                f"It records fact {i * 7} and idea {i * 13}.",
+            )
+            for i in range(args.notes)
+        )
+        backend.latency = args.llm_latency
+        if not args.chromadb:
+            backend.collection.query_latency = args.query_latency
+        questions = [
+            f"What does the note say about {TOPICS[i % len(TOPICS)]} and fact {i}?"
+            for i in range(args.questions)
+        ]
+        entries = zkb.qa_kb.collection.count()
+        store = "chromadb" if args.chromadb else "fake collection"
+        print(
+            f"QA entries: {entries:,}, vector store: {store}, questions: "
+            f"{args.questions:,}, rewordings: {args.rewordings}"
+        )
+
+        zkb.clear_query_cache()
+        start = time.perf_counter()
+        single = [zkb.query_qa(q, num_rewordings=args.rewordings) for q in questions]
+        single_s = time.perf_counter() - start
+
+        zkb.clear_query_cache()
+        start = time.perf_counter()
+        batched = zkb.query_qa_batch(questions, num_rewordings=args.rewordings)
+        batched_s = time.perf_counter() - start
+        zkb.db.close()
+
+    same = sum(
+        [r["answer"] for r in a] == [r["answer"] for r in b]
+        for a, b in zip(single, batched)
+    )
+    print(f"{'mode':<16} {'seconds':>8} {'questions/s':>12}")
+    for mode, seconds in (("query_qa", single_s), ("query_qa_batch", batched_s)):
+        print(f"{mode:<16} {seconds:>8.2f} {args.questions / seconds:>12.0f}")
+    print(f"speedup: {single_s / batched_s:.1f}x, identical results: {same:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure the wall time of ``zkb`` CLI commands that never touch the QA store.
+
+Each command runs in a fresh interpreter, as from a shell, on a scanned
+synthetic vault. The time to start Python alone and to import ``qa_store``,
+which these commands no longer pay for, are shown for comparison.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--notes 1000] [--runs 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from zkb import ZKB
+from zkb.bench import FakeQuestionAnswerKB, generate_vault
+
+COMMANDS = [
+    ["find-backlinks", "note_000001"],
+    ["find-orphans"],
+    ["find-broken-links"],
+    ["search", "alpha beta"],
+    ["neighbors", "note_000001", "--hops", "2"],
+    ["stats"],
+]
+
+
+def wall_time(argv: list, runs: int, cwd: Path) -> float:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=cwd, env=env, check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        generate_vault(tmp / "data" / "notes", num_notes=args.notes)
+        ZKB(
+            data_dir=str(tmp / "data"),
+            db_dir=str(tmp / "db"),
+            qa_backend=FakeQuestionAnswerKB(),
+            qa_cache_max_bytes=0,
+            qa_dedup_similarity=0,
+        ).scan_notes()
+
+        python = [sys.executable]
+        print(f"notes: {args.notes:,}, median of {args.runs} runs")
+        baseline = wall_time(python + ["-c", "pass"], args.runs, tmp)
+        print(f"{'python -c pass':<40} {baseline * 1000:>8.1f} ms")
+        for command in COMMANDS:
+            seconds = wall_time(python + ["-m", "zkb.cli"] + command, args.runs, tmp)
+            print(f"{'zkb ' + ' '.join(command):<40} {seconds * 1000:>8.1f} ms")
+        seconds = wall_time(python + ["-c", "import qa_store"], args.runs, tmp)
+        print(f"{'python -c ' + repr('import qa_store'):<40} {seconds * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
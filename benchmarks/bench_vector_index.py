@@ -0,0 +1,101 @@
+"""
+Measure recall@k, query latency and memory of the IVF vector index against
+exact search, for each code storage and a range of ``nprobe`` values.
+
+Vectors are synthetic unit vectors drawn around random cluster centres, as
+sentence embeddings of questions on shared topics are. Exact search is a
+float32 matrix product over every vector, the cost the QA store's exact
+search grows with. Recall@k is the fraction of the exact ``k`` nearest
+neighbours the index returns.
+
+Usage::
+
+    python benchmarks/bench_vector_index.py [--vectors 100000] [--dim 384]
+        [--queries 200] [--k 10] [--rerank 4]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from zkb.vector_index import FLOAT16, INT8, PQ, IVFIndex, _normalize
+
+
+def make_vectors(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    noise = rng.normal(size=(n, dim)).astype(np.float32)
+    return _normalize(centres[rng.integers(0, clusters, n)] + 0.7 * noise)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    clusters = max(10, args.vectors // 1000)
+    vectors = make_vectors(args.vectors, args.dim, clusters, rng)
+    queries = make_vectors(args.queries, args.dim, clusters, rng)
+    ids = [str(i) for i in range(args.vectors)]
+
+    start = time.perf_counter()
+    exact = [np.argsort(-(vectors @ query))[: args.k] for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+    def fetch(wanted):
+        return wanted, vectors[[int(id_) for id_ in wanted]]
+
+    print(
+        f"vectors: {args.vectors:,} x {args.dim}, queries: {args.queries}, k: {args.k}"
+    )
+    print(f"exact search: {exact_ms:.2f} ms/query, {args.dim * 4} bytes/vector")
+    print(
+        f"{'storage':<8} {'bytes':>6} {'build s':>8} {'nprobe':>7} {'rerank':>7} "
+        f"{'recall':>7} {'ms/query':>9} {'speedup':>8}"
+    )
+    for storage in (PQ, INT8, FLOAT16):
+        index = IVFIndex(storage)
+        start = time.perf_counter()
+        index.train(vectors[rng.choice(args.vectors, min(args.vectors, 65_536))])
+        index.build(
+            (ids[i : i + 4096], vectors[i : i + 4096])
+            for i in range(0, args.vectors, 4096)
+        )
+        build_s = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as tmp:
+            # Search the memory-mapped index, as a freshly started process would
+            index.save(tmp, "0")
+            index = IVFIndex(storage)
+            index.load(tmp)
+            for nprobe in (4, 16, 64):
+                for rerank in sorted({0, args.rerank}):
+                    start = time.perf_counter()
+                    found = [
+                        index.search(
+                            query, args.k, nprobe=nprobe, rerank=rerank, fetch=fetch
+                        )[0]
+                        for query in queries
+                    ]
+                    query_ms = (time.perf_counter() - start) * 1000 / args.queries
+                    recall = np.mean(
+                        [
+                            len({int(id_) for id_, _ in hits} & set(row.tolist()))
+                            / args.k
+                            for hits, row in zip(found, exact)
+                        ]
+                    )
+                    print(
+                        f"{storage:<8} {index.nbytes_per_vector():>6} {build_s:>8.1f} "
+                        f"{nprobe:>7} {rerank:>7} {recall:>7.3f} {query_ms:>9.2f} "
+                        f"{exact_ms / query_ms:>7.1f}x"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,16 @@
-from .zkb import ZKB
+from typing import TYPE_CHECKING
 
 __all__ = ["ZKB"]
+
+if TYPE_CHECKING:
+    from .zkb import ZKB
+
+
+def __getattr__(name: str):
+    # Import ZKB on first use, so that importing a submodule such as zkb.db
+    # or zkb.metrics does not load the rest of the package
+    if name == "ZKB":
+        from .zkb import ZKB
+
+        return ZKB
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,109 @@
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+ACTIONS = (CREATE, UPDATE, DELETE)
+
+
+class NoteChange(NamedTuple):
+    """One create, update or delete of a note, as applied by ``ZKB.apply_changes``."""
+
+    action: str
+    filename: str
+    content: str = ""
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class CoalescedChange(NamedTuple):
+    """The net effect of a batch's changes to one note."""
+
+    filename: str
+    # Whether the note existed before the batch
+    existed: bool
+    # The last create or update, or None if the note ends up deleted
+    change: Optional[NoteChange]
+
+
+def as_change(change: Union[NoteChange, Dict[str, Any], Iterable[Any]]) -> NoteChange:
+    """A ``NoteChange`` from itself, a dict of its fields or a sequence of them."""
+    if isinstance(change, NoteChange):
+        return change
+    if isinstance(change, dict):
+        return NoteChange(**change)
+    return NoteChange(*change)
+
+
+def coalesce_changes(
+    changes: Iterable[NoteChange], exists: Callable[[str], bool]
+) -> List[CoalescedChange]:
+    """
+    Fold the changes to each note into their net effect, in first-seen order.
+
+    Each change is checked against the state the changes before it leave
+    the note in, starting from ``exists``, as the single-note methods would
+    check it. Nothing is applied if any change is invalid. A note that is
+    created and deleted again within the batch is dropped.
+
+    Raises
+    ------
+    ValueError
+        If a change has an unknown action
+    FileExistsError
+        If a note is created while it exists
+    FileNotFoundError
+        If a note is updated or deleted while it does not exist
+    """
+    existed: Dict[str, bool] = {}
+    present: Dict[str, bool] = {}
+    latest: Dict[str, Optional[NoteChange]] = {}
+    for change in changes:
+        filename = change.filename
+        if change.action not in ACTIONS:
+            raise ValueError(f"Unknown action {change.action!r} for {filename}")
+        if filename not in existed:
+            existed[filename] = present[filename] = exists(filename)
+        if change.action == CREATE and present[filename]:
+            raise FileExistsError(f"Note {filename} already exists")
+        if change.action != CREATE and not present[filename]:
+            raise FileNotFoundError(f"Note {filename} does not exist")
+        present[filename] = change.action != DELETE
+        latest[filename] = change if present[filename] else None
+    return [
+        CoalescedChange(filename, existed[filename], change)
+        for filename, change in latest.items()
+        if existed[filename] or change is not None
+    ]
+
+
+class NoteBatch:
+    """
+    Changes to notes collected by ``ZKB.batch``, applied together on exit.
+
+    ``create``, ``update`` and ``delete`` take the arguments of the ZKB
+    methods of the same names but only record the change. Once the batch
+    is applied, ``counts`` holds the counts ``apply_changes`` returned.
+    """
+
+    def __init__(self) -> None:
+        self.changes: List[NoteChange] = []
+        self.counts: Optional[Dict[str, int]] = None
+
+    def __repr__(self) -> str:
+        return f"NoteBatch(changes={len(self.changes)})"
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def create(
+        self, filename: str, content: str, metadata: Optional[Dict] = None
+    ) -> None:
+        self.changes.append(NoteChange(CREATE, filename, content, metadata))
+
+    def update(
+        self, filename: str, content: str, metadata: Optional[Dict] = None
+    ) -> None:
+        self.changes.append(NoteChange(UPDATE, filename, content, metadata))
+
+    def delete(self, filename: str) -> None:
+        self.changes.append(NoteChange(DELETE, filename))
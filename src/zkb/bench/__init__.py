@@ -0,0 +1,25 @@
+from typing import TYPE_CHECKING
+
+__all__ = ["FakeCollection", "FakeQuestionAnswerKB", "generate_vault", "run_benchmarks"]
+
+if TYPE_CHECKING:
+    from .fake_qa import FakeCollection, FakeQuestionAnswerKB
+    from .runner import run_benchmarks
+    from .vault import generate_vault
+
+_EXPORTS = {
+    "FakeCollection": "fake_qa",
+    "FakeQuestionAnswerKB": "fake_qa",
+    "generate_vault": "vault",
+    "run_benchmarks": "runner",
+}
+
+
+def __getattr__(name: str):
+    # Import on first use, so that the CLI can add the bench arguments
+    # without loading the fake QA store and NumPy
+    if name in _EXPORTS:
+        from importlib import import_module
+
+        return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
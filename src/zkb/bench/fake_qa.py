@@ -0,0 +1,288 @@
+"""
+Deterministic, offline stand-ins for the QA store, for tests and benchmarks.
+
+``FakeQuestionAnswerKB`` implements the ``QABackend`` protocol without an LLM
+or an embedding model: every sentence becomes one QA pair, rewordings are
+numbered copies of the question and embeddings are hashed bags of words.
+"""
+
+import hashlib
+import math
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Set
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, fall back to pure Python
+    np = None
+
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=65536)
+def _bucket(word: str, dim: int) -> int:
+    return int(hashlib.md5(word.encode()).hexdigest(), 16) % dim
+
+
+def fake_embedding(text: str, dim: int = 64) -> list:
+    """Deterministic bag-of-words embedding, normalized to unit length."""
+    vector = [0.0] * dim
+    for word in WORD_PATTERN.findall(text.lower()):
+        vector[_bucket(word, dim)] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _matches(metadata: dict, where: dict) -> bool:
+    for key, value in (where or {}).items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in value):
+                return False
+        elif isinstance(value, dict) and "$in" in value:
+            if metadata.get(key) not in value["$in"]:
+                return False
+        elif isinstance(value, dict) and "$ne" in value:
+            if metadata.get(key) == value["$ne"]:
+                return False
+        elif metadata.get(key) != value:
+            return False
+    return True
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for the subset of the chromadb collection API ZKB uses.
+
+    ``query_latency`` delays ``query`` to stand in for a slow vector lookup.
+    Rows are indexed by ``note_filename``, and ``query`` scores all rows with
+    one matrix product when numpy is installed, so benchmarks over large
+    vaults measure ZKB rather than this fake.
+    """
+
+    def __init__(self) -> None:
+        self.rows = {}
+        self.lock = threading.Lock()
+        self.add_calls = 0
+        self.delete_calls = 0
+        self.query_calls = 0
+        self.query_latency = 0.0
+        self._by_note: Dict[str, Set[str]] = {}
+        self._matrix = None
+
+    def _candidates(self, ids, where) -> Iterable[str]:
+        """Ids of the rows that may match, a superset of the matching ones."""
+        if ids is not None:
+            return [id_ for id_ in ids if id_ in self.rows]
+        filename = (where or {}).get("note_filename")
+        if isinstance(filename, str):
+            return list(self._by_note.get(filename, ()))
+        return list(self.rows)
+
+    def _index(self, id_: str, metadata: dict) -> None:
+        self._by_note.setdefault(metadata.get("note_filename"), set()).add(id_)
+
+    def _unindex(self, id_: str) -> None:
+        filename = self.rows[id_][1].get("note_filename")
+        self._by_note[filename].discard(id_)
+        if not self._by_note[filename]:
+            del self._by_note[filename]
+
+    def count(self) -> int:
+        return len(self.rows)
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        with self.lock:
+            self.add_calls += 1
+            for i, id_ in enumerate(ids):
+                document = documents[i] if documents else ""
+                embedding = (
+                    list(embeddings[i])
+                    if embeddings is not None
+                    else fake_embedding(document)
+                )
+                metadata = dict(metadatas[i]) if metadatas else {}
+                if id_ in self.rows:
+                    self._unindex(id_)
+                self.rows[id_] = (document, metadata, embedding)
+                self._index(id_, metadata)
+            self._matrix = None
+
+    def delete(self, ids=None, where=None) -> None:
+        with self.lock:
+            self.delete_calls += 1
+            doomed = set()
+            if ids is not None:
+                doomed.update(id_ for id_ in ids if id_ in self.rows)
+            if where is not None:
+                doomed.update(
+                    id_
+                    for id_ in self._candidates(None, where)
+                    if _matches(self.rows[id_][1], where)
+                )
+            for id_ in doomed:
+                self._unindex(id_)
+                del self.rows[id_]
+            if doomed:
+                self._matrix = None
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=None) -> dict:
+        result = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        with self.lock:
+            matching = [
+                id_
+                for id_ in self._candidates(ids, where)
+                if _matches(self.rows[id_][1], where)
+            ]
+            start = offset or 0
+            for id_ in matching[start : None if limit is None else start + limit]:
+                document, metadata, embedding = self.rows[id_]
+                result["ids"].append(id_)
+                result["documents"].append(document)
+                result["metadatas"].append(dict(metadata))
+                result["embeddings"].append(embedding)
+        return result
+
+    def query(
+        self,
+        query_texts=None,
+        query_embeddings=None,
+        n_results=10,
+        where=None,
+        include=None,
+    ) -> dict:
+        time.sleep(self.query_latency)
+        with self.lock:
+            self.query_calls += 1
+        if query_embeddings is None:
+            query_embeddings = [fake_embedding(text) for text in query_texts]
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self.lock:
+            if np is not None and where is None:
+                if self._matrix is None:
+                    rows = list(self.rows.items())
+                    embeddings = [row[2] for _, row in rows]
+                    self._matrix = (rows, np.array(embeddings, dtype=float))
+                rows, matrix = self._matrix
+            else:
+                rows = [(id_, self.rows[id_]) for id_ in self._candidates(None, where)]
+        for query in query_embeddings:
+            if np is not None and rows and where is None:
+                distances = 1 - matrix @ np.asarray(query, dtype=float)
+                # Every row tied with the n-th best, so ties break by id as below
+                limit = np.partition(distances, min(n_results, len(rows)) - 1)[
+                    min(n_results, len(rows)) - 1
+                ]
+                scored = sorted(
+                    (float(distances[k]), rows[k][0], rows[k][1][0], rows[k][1][1])
+                    for k in np.flatnonzero(distances <= limit)
+                )[:n_results]
+            else:
+                scored = sorted(
+                    (1 - sum(a * b for a, b in zip(query, embedding)), id_, doc, meta)
+                    for id_, (doc, meta, embedding) in rows
+                    if _matches(meta, where)
+                )[:n_results]
+            result["ids"].append([row[1] for row in scored])
+            result["documents"].append([row[2] for row in scored])
+            result["metadatas"].append([dict(row[3]) for row in scored])
+            result["distances"].append([row[0] for row in scored])
+        return result
+
+
+class FakeQuestionAnswerKB:
+    """
+    Offline QA backend: one QA pair per sentence and numbered rewordings.
+
+    ``fail_times`` makes the next N calls to ``generate_qa_pairs`` raise, and
+    ``latency`` adds an artificial delay to every LLM call. ``max_in_flight``
+    records the highest number of concurrent LLM calls seen, and
+    ``rewording_calls`` and ``embedding_calls`` count query-side work.
+    """
+
+    def __init__(self) -> None:
+        self.collection = FakeCollection()
+        self.fail_times = 0
+        self.latency = 0.0
+        self.generate_calls = 0
+        self.rewording_calls = 0
+        self.embedding_calls = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _llm_call(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self._in_flight -= 1
+
+    def generate_qa_pairs(self, input_text: str) -> list:
+        self._llm_call()
+        with self._lock:
+            self.generate_calls += 1
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise RuntimeError("QA backend unavailable")
+        sentences = [s.strip() for s in SENTENCE_PATTERN.split(input_text) if s.strip()]
+        return [
+            {"q": f"What does the note say about {s.rstrip('.')}?", "a": s}
+            for s in sentences
+        ]
+
+    def embedding_function(self, texts: list) -> list:
+        with self._lock:
+            self.embedding_calls += 1
+        return [fake_embedding(text) for text in texts]
+
+    def generate_rewordings(self, question: str, num_rewordings: int) -> list:
+        if num_rewordings > 0:
+            self._llm_call()
+            with self._lock:
+                self.rewording_calls += 1
+        return [question] + [f"{question} ({i})" for i in range(1, num_rewordings + 1)]
+
+    def add_qa(self, question, answer=None, metadata=None, num_rewordings=0) -> set:
+        metadata = dict(metadata or {})
+        metadata["answer"] = answer if answer else ""
+        questions = self.generate_rewordings(question, num_rewordings)
+        base = self.collection.count()
+        self.collection.add(
+            ids=[f"qa_{base}_{i}" for i in range(len(questions))],
+            documents=questions,
+            metadatas=[dict(metadata) for _ in questions],
+        )
+        return set(questions)
+
+    def query(self, question, n_results=5, metadata_filter=None, num_rewordings=0):
+        questions = self.generate_rewordings(question, num_rewordings)
+        results = self.collection.query(
+            query_texts=questions, n_results=n_results, where=metadata_filter
+        )
+        seen_answers = set()
+        unique_results = []
+        for documents, metadatas, distances in zip(
+            results["documents"], results["metadatas"], results["distances"]
+        ):
+            for document, metadata, distance in zip(documents, metadatas, distances):
+                if metadata["answer"] in seen_answers:
+                    continue
+                seen_answers.add(metadata["answer"])
+                unique_results.append(
+                    {
+                        "question": document,
+                        "answer": metadata["answer"],
+                        "metadata": {
+                            k: v for k, v in metadata.items() if k != "answer"
+                        },
+                        "similarity": 1 - distance,
+                    }
+                )
+        return sorted(unique_results, key=lambda r: r["similarity"], reverse=True)[
+            :n_results
+        ]
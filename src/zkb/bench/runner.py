@@ -0,0 +1,252 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional
+
+from .vault import WORDS, generate_vault, note_text, sample_notes
+
+if TYPE_CHECKING:
+    from ..zkb import ZKB
+
+# Bump when the set or meaning of the timed operations changes, so results
+# are only compared with results of the same schema
+SCHEMA_VERSION = 1
+
+
+def _timings(seconds: List[float]) -> Dict[str, Any]:
+    return {
+        "runs": len(seconds),
+        "total_ms": sum(seconds) * 1000,
+        "median_ms": statistics.median(seconds) * 1000,
+        "min_ms": min(seconds) * 1000,
+        "max_ms": max(seconds) * 1000,
+    }
+
+
+def _time(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _time_each(fn: Callable[[Any], Any], args: Iterable[Any]) -> Dict[str, Any]:
+    """Time ``fn`` once per argument."""
+    return _timings([_time(lambda: fn(arg)) for arg in args])
+
+
+def run_benchmarks(
+    notes: int = 1000,
+    links_per_note: float = 5.0,
+    note_words: int = 120,
+    broken_link_ratio: float = 0.05,
+    samples: int = 50,
+    seed: int = 0,
+    workers: int = 1,
+    dedup_similarity: float = 0.0,
+    work_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Generate a synthetic vault and time ZKB operations on it.
+
+    Everything runs offline against ``FakeQuestionAnswerKB``, so timings
+    measure ZKB itself rather than an LLM or embedding model. Operations on
+    single notes or queries run ``samples`` times each. Deduplication of QA
+    pairs is off by default, since its lookups scan the fake collection
+    linearly and would dominate large runs.
+
+    Returns a JSON-serializable report: the parameters, the environment, the
+    vault generated and, per operation, run count and total, median, min and
+    max milliseconds.
+    """
+    params = {
+        "notes": notes,
+        "links_per_note": links_per_note,
+        "note_words": note_words,
+        "broken_link_ratio": broken_link_ratio,
+        "samples": samples,
+        "seed": seed,
+        "workers": workers,
+        "dedup_similarity": dedup_similarity,
+    }
+    from ..zkb import ZKB
+    from .fake_qa import FakeQuestionAnswerKB
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        data_dir = Path(tmp) / "data"
+        vault = generate_vault(
+            data_dir / "notes",
+            num_notes=notes,
+            links_per_note=links_per_note,
+            note_words=note_words,
+            broken_link_ratio=broken_link_ratio,
+            seed=seed,
+        )
+        zkb = ZKB(
+            data_dir=str(data_dir),
+            db_dir=str(Path(tmp) / "db"),
+            qa_backend=FakeQuestionAnswerKB(),
+            qa_cache_max_bytes=0,
+            qa_dedup_similarity=dedup_similarity,
+        )
+        results = _run(zkb, params)
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "zkb_version": _zkb_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "vault": vault,
+        "results": results,
+    }
+
+
+def _run(zkb: "ZKB", params: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    rng = random.Random(params["seed"] + 1)
+    num_notes = params["notes"]
+    sampled = sample_notes(num_notes, params["samples"], seed=params["seed"])
+    results = {}
+
+    results["scan"] = _timings(
+        [_time(lambda: zkb.scan_notes(workers=params["workers"]))]
+    )
+    results["rescan_unchanged"] = _timings([_time(zkb.scan_notes)])
+
+    # Rewrite 1% of the notes, as between two scans of a vault in use
+    changed = sample_notes(num_notes, max(1, num_notes // 100), seed=params["seed"] + 2)
+    for filename in changed:
+        (zkb.notes_path / f"{filename}.md").write_text(
+            note_text(
+                rng,
+                int(filename.rsplit("_", 1)[1]),
+                num_notes,
+                params["note_words"],
+                params["links_per_note"],
+                params["broken_link_ratio"],
+            ),
+            encoding="utf-8",
+        )
+    results["rescan_incremental"] = _timings([_time(zkb.scan_notes)])
+
+    results["find_orphaned_notes"] = _timings([_time(zkb.find_orphaned_notes)])
+    results["find_broken_links"] = _timings([_time(zkb.find_broken_links)])
+    results["find_backlinks"] = _time_each(zkb.find_backlinks, sampled)
+
+    terms = [" ".join(rng.sample(WORDS, 2)) for _ in sampled]
+    results["search_notes"] = _time_each(
+        lambda query: zkb.search_notes(query, limit=10), terms
+    )
+    results["search"] = _time_each(lambda query: zkb.search(query, limit=10), terms)
+
+    new_notes = [f"bench_{i}" for i in range(len(sampled))]
+    texts = {
+        filename: note_text(
+            rng,
+            i,
+            num_notes,
+            params["note_words"],
+            params["links_per_note"],
+            params["broken_link_ratio"],
+        ).split("---\n", 2)[2]
+        for i, filename in enumerate(new_notes)
+    }
+    results["create_note"] = _time_each(
+        lambda filename: zkb.create_note(filename, texts[filename]), new_notes
+    )
+    results["read_note"] = _time_each(zkb.read_note, sampled)
+    results["update_note"] = _time_each(
+        lambda filename: zkb.update_note(filename, texts[filename] + "\nEdited.\n"),
+        new_notes,
+    )
+    results["delete_note"] = _time_each(zkb.delete_note, new_notes)
+
+    questions = [
+        f"What does the note say about {' '.join(rng.sample(WORDS, 3))}?"
+        for _ in sampled
+    ]
+    zkb.clear_query_cache()
+    results["query_qa"] = _time_each(
+        lambda question: zkb.query_qa(question, num_rewordings=0), questions
+    )
+    results["query_qa_cached"] = _time_each(
+        lambda question: zkb.query_qa(question, num_rewordings=0), questions
+    )
+    return results
+
+
+def _zkb_version() -> str:
+    from importlib import metadata
+
+    try:
+        return metadata.version("zkb")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--notes", type=int, default=1000, help="Number of notes in the vault"
+    )
+    parser.add_argument(
+        "--links-per-note", type=float, default=5.0, help="Average links per note"
+    )
+    parser.add_argument(
+        "--note-words", type=int, default=120, help="Approximate words per note"
+    )
+    parser.add_argument(
+        "--broken-link-ratio",
+        type=float,
+        default=0.05,
+        help="Fraction of links that point to missing notes",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=50,
+        help="Runs of each per-note or per-query operation",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Vault random seed")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Parser processes for the first scan"
+    )
+    parser.add_argument(
+        "--dedup-similarity",
+        type=float,
+        default=0.0,
+        help="QA deduplication threshold, 0 to disable it",
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Write the JSON report to a file"
+    )
+
+
+def run_from_args(args: argparse.Namespace) -> Dict[str, Any]:
+    report = run_benchmarks(
+        notes=args.notes,
+        links_per_note=args.links_per_note,
+        note_words=args.note_words,
+        broken_link_ratio=args.broken_link_ratio,
+        samples=args.samples,
+        seed=args.seed,
+        workers=args.workers,
+        dedup_similarity=args.dedup_similarity,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        sys.stdout.write(text + "\n")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Time ZKB operations on a synthetic vault, offline"
+    )
+    add_arguments(parser)
+    run_from_args(parser.parse_args(argv))
@@ -0,0 +1,90 @@
+import random
+from pathlib import Path
+from typing import Dict, List
+
+WORDS = (
+    "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi "
+    "omicron pi rho sigma tau upsilon phi chi psi omega graph note link idea "
+    "memory search index query vault section answer question source topic"
+).split()
+TAGS = ["project", "reference", "journal", "idea", "person", "book"]
+
+
+def note_name(i: int) -> str:
+    return f"note_{i:06d}"
+
+
+def note_text(
+    rng: random.Random,
+    i: int,
+    num_notes: int,
+    note_words: int,
+    links_per_note: float,
+    broken_link_ratio: float,
+) -> str:
+    """
+    The markdown of synthetic note ``i``: frontmatter, a few headed sections
+    of sentences, and about ``links_per_note`` wiki links, of which
+    ``broken_link_ratio`` point to notes that do not exist.
+    """
+    sentences = []
+    words = 0
+    while words < note_words:
+        length = rng.randint(6, 14)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words += length
+    num_links = int(links_per_note) + (rng.random() < links_per_note % 1)
+    for _ in range(num_links):
+        if rng.random() < broken_link_ratio:
+            target = f"missing_{rng.randrange(num_notes * 10):06d}"
+        else:
+            target = note_name(rng.randrange(num_notes))
+        position = rng.randrange(len(sentences))
+        sentences[position] = sentences[position][:-1] + f" [[{target}]]."
+
+    sections = []
+    per_section = max(1, len(sentences) // rng.randint(1, 4))
+    for start in range(0, len(sentences), per_section):
+        heading = " ".join(rng.choice(WORDS) for _ in range(2)).capitalize()
+        sections.append(
+            f"## {heading}\n\n" + " ".join(sentences[start : start + per_section])
+        )
+    return (
+        f"---\ntitle: Note {i}\ntags: [{rng.choice(TAGS)}]\n---\n"
+        + "\n\n".join(sections)
+        + "\n"
+    )
+
+
+def generate_vault(
+    notes_path: Path,
+    num_notes: int = 1000,
+    links_per_note: float = 5.0,
+    note_words: int = 120,
+    broken_link_ratio: float = 0.05,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """
+    Write a synthetic vault of ``num_notes`` markdown notes to ``notes_path``.
+
+    The same parameters and ``seed`` always produce the same vault. Returns
+    the number of notes, links and broken links written.
+    """
+    notes_path.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    links = broken = 0
+    for i in range(num_notes):
+        text = note_text(
+            rng, i, num_notes, note_words, links_per_note, broken_link_ratio
+        )
+        links += text.count("[[")
+        broken += text.count("[[missing_")
+        (notes_path / f"{note_name(i)}.md").write_text(text, encoding="utf-8")
+    return {"notes": num_notes, "links": links, "broken_links": broken}
+
+
+def sample_notes(num_notes: int, count: int, seed: int = 0) -> List[str]:
+    """A deterministic sample of up to ``count`` note names of a vault."""
+    rng = random.Random(seed)
+    return [note_name(i) for i in rng.sample(range(num_notes), min(count, num_notes))]
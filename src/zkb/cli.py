@@ -1,14 +1,116 @@
 import argparse
+from pathlib import Path
 
-from .zkb import ZKB
+from .bench.runner import add_arguments as add_bench_arguments
+from .client import SOCKET_FILE, ZKBClient
+from .metrics import METRICS, Metrics
 
 
 class CLI:
-    def __init__(self, data_dir=None, db_path=None):
-        self.zkb = ZKB(data_dir=data_dir, db_path=db_path)
+    def __init__(self, data_dir=None, db_path=None, socket_path=None):
+        db_dir = str(Path(db_path).parent) if db_path else None
+        kwargs = {"data_dir": data_dir, "db_dir": db_dir}
+        self._zkb_kwargs = {key: value for key, value in kwargs.items() if value}
+        self.socket_path = socket_path
+        self._zkb = None
+        self._local_zkb = None
 
-    def scan_notes(self):
-        self.zkb.scan_notes()
+    @property
+    def zkb(self):
+        """
+        The ZKB of the `zkb serve` process on the socket, if it serves this
+        vault, or a local one.
+        """
+        if self._zkb is None:
+            client = (
+                ZKBClient.connect(self.socket_path, notes_path=self.notes_path)
+                if self.socket_path
+                else None
+            )
+            self._zkb = client if client is not None else self.local_zkb
+        return self._zkb
+
+    @property
+    def notes_path(self):
+        from .zkb import DATA_DIR
+
+        return Path(self._zkb_kwargs.get("data_dir", DATA_DIR)) / "notes"
+
+    @property
+    def local_zkb(self):
+        if self._local_zkb is None:
+            from .zkb import ZKB
+
+            self._local_zkb = ZKB(**self._zkb_kwargs)
+        return self._local_zkb
+
+    def scan_notes(self, full=False, workers=1, chunk_size=None):
+        kwargs = {"chunk_size": chunk_size} if chunk_size else {}
+        counts = self.zkb.scan_notes(full=full, workers=workers, **kwargs)
+        print(
+            f"Scanned notes: {counts['added']} added, {counts['changed']} changed, "
+            f"{counts['unchanged']} unchanged, {counts['removed']} removed"
+        )
+
+    def run_index_worker(self, poll_interval=1.0, once=False):
+        try:
+            processed = self.local_zkb.run_index_worker(
+                poll_interval=poll_interval, once=once
+            )
+        except KeyboardInterrupt:
+            return
+        print(f"Processed {processed} index jobs")
+
+    def show_index_status(self):
+        counts = self.local_zkb.jobs.counts()
+        print("Index jobs:")
+        for status, count in counts.items():
+            print(f"{status}: {count}")
+
+    def watch(self, debounce=None, poll_interval=None, polling=False):
+        kwargs = {}
+        if debounce is not None:
+            kwargs["debounce"] = debounce
+        if poll_interval is not None:
+            kwargs["poll_interval"] = poll_interval
+        from .watch import NoteWatcher
+
+        watcher = NoteWatcher(self.local_zkb, force_polling=polling, **kwargs)
+        print(f"Watching {self.local_zkb.notes_path} (Ctrl-C to stop)")
+
+        def report(result):
+            latency = result["latency"]
+            print(
+                f"{result['added']} added, {result['changed']} changed, "
+                f"{result['moved']} moved, {result['removed']} removed"
+                + (
+                    f" (queryable {latency:.2f}s after save)"
+                    if latency is not None
+                    else ""
+                )
+            )
+
+        try:
+            watcher.run(on_batch=report)
+        except KeyboardInterrupt:
+            return
+
+    def serve(self, workers=None, metrics_path=None):
+        from .server import ZKBServer
+
+        kwargs = {"workers": workers} if workers else {}
+        server = ZKBServer(
+            self.local_zkb, self.socket_path, metrics_path=metrics_path, **kwargs
+        )
+        print(f"Serving {self.local_zkb.notes_path} on {self.socket_path}")
+        server.serve()
+
+    def search(self, query, limit=10, offset=0):
+        hits = self.zkb.search(query, limit=limit, offset=offset)
+        print(f"Search results for {query!r}:")
+        for hit in hits:
+            print(f"{hit['filename']} ({hit['title']})")
+            print(f"    {' '.join(hit['snippet'].split())}")
 
     def find_orphaned_notes(self):
         orphans = self.zkb.find_orphaned_notes()
@@ -28,6 +130,51 @@ class CLI:
         for backlink in backlinks:
             print(backlink)
 
+    def find_neighborhood(self, filename, hops=1, direction="both"):
+        neighborhood = self.zkb.find_neighborhood(
+            filename, hops=hops, direction=direction
+        )
+        print(f"Notes within {hops} links of {filename}:")
+        for note, distance in sorted(neighborhood.items(), key=lambda x: x[::-1]):
+            print(f"{distance} {note}")
+
+    def find_shortest_path(self, source, target, directed=False):
+        path = self.zkb.find_shortest_path(source, target, directed=directed)
+        if path is None:
+            print(f"No path from {source} to {target}")
+        else:
+            print(" -> ".join(path))
+
+    def find_components(self, min_size=1):
+        components = self.zkb.find_components()
+        print("Connected components:")
+        for component in components:
+            if len(component) >= min_size:
+                print(f"{len(component)}: {', '.join(component)}")
+
+    def rank_notes(self, top=10, by="pagerank"):
+        print(f"Notes by {by}:")
+        for note, score in self.zkb.rank_notes(top=top, by=by):
+            print(f"{score:.6g} {note}" if by == "pagerank" else f"{score} {note}")
+
+
+# Metrics of every CLI run accumulate in this file next to the database
+METRICS_FILE = "metrics.json"
+
+
+def show_stats(metrics_path, output_format="text", output=None, reset=False):
+    metrics = Metrics.load(metrics_path, reset=reset)
+    if output_format == "json":
+        text = metrics.to_json() + "\n"
+    elif output_format == "prometheus":
+        text = metrics.to_prometheus()
+    else:
+        text = metrics.to_text()
+    if output:
+        Path(output).write_text(text, encoding="utf-8")
+    else:
+        print(text, end="")
+
 
 def main():
     parser = argparse.ArgumentParser(description="ZKB CLI")
@@ -43,10 +190,107 @@ def main():
         default="db/zkb.db",
         help="Path to the SQLite database",
     )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Unix socket of `zkb serve`, used by commands when a server is "
+        "running (default: zkb.sock next to the database)",
+    )
     subparsers = parser.add_subparsers(dest="command", help="Commands")
 
     # Scan notes command
-    subparsers.add_parser("scan", help="Scan notes and update the database")
+    scan_parser = subparsers.add_parser(
+        "scan", help="Scan notes and update the database"
+    )
+    scan_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-index every note, ignoring the scan manifest",
+    )
+    scan_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse notes",
+    )
+    scan_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Number of notes handed to a parser process at a time",
+    )
+
+    # Index worker command
+    worker_parser = subparsers.add_parser(
+        "index-worker", help="Process queued QA index jobs"
+    )
+    worker_parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Exit once the queue has no due jobs",
+    )
+    worker_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between polls of an empty queue",
+    )
+    worker_parser.add_argument(
+        "--status",
+        action="store_true",
+        help="Print job counts by status and exit",
+    )
+
+    # Watch command
+    watch_parser = subparsers.add_parser(
+        "watch", help="Keep the index up to date as notes change on disk"
+    )
+    watch_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=None,
+        help="Seconds the notes must be quiet before changes are applied",
+    )
+    watch_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=None,
+        help="Seconds between directory polls when polling",
+    )
+    watch_parser.add_argument(
+        "--polling",
+        action="store_true",
+        help="Poll the notes directory instead of using filesystem events",
+    )
+
+    # Serve command
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Keep a ZKB open and answer other zkb commands over a Unix socket",
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Threads answering queries concurrently",
+    )
+
+    # Search command
+    search_parser = subparsers.add_parser(
+        "search", help="Full-text search of note titles, bodies and frontmatter"
+    )
+    search_parser.add_argument(
+        "query",
+        type=str,
+        help='Search terms; use "quotes" for phrases and term* for prefixes',
+    )
+    search_parser.add_argument(
+        "--limit", type=int, default=10, help="Maximum number of results"
+    )
+    search_parser.add_argument(
+        "--offset", type=int, default=0, help="Number of results to skip"
+    )
 
     # Find orphaned notes command
     subparsers.add_parser("find-orphans", help="Find orphaned notes")
@@ -62,18 +306,141 @@ def main():
         "filename", type=str, help="Filename of the note to find backlinks for"
     )
 
+    # Graph commands
+    neighbors_parser = subparsers.add_parser(
+        "neighbors", help="Find the notes within a number of links of a note"
+    )
+    neighbors_parser.add_argument("filename", type=str, help="Note to start from")
+    neighbors_parser.add_argument(
+        "--hops", type=int, default=1, help="Maximum number of links to follow"
+    )
+    neighbors_parser.add_argument(
+        "--direction",
+        choices=["out", "in", "both"],
+        default="both",
+        help="Follow links (out), backlinks (in) or both",
+    )
+
+    path_parser = subparsers.add_parser(
+        "path", help="Find a shortest chain of links between two notes"
+    )
+    path_parser.add_argument("source", type=str, help="Note to start from")
+    path_parser.add_argument("target", type=str, help="Note to reach")
+    path_parser.add_argument(
+        "--directed",
+        action="store_true",
+        help="Only follow links in their direction",
+    )
+
+    components_parser = subparsers.add_parser(
+        "components", help="Find groups of notes connected by links"
+    )
+    components_parser.add_argument(
+        "--min-size", type=int, default=1, help="Hide smaller components"
+    )
+
+    rank_parser = subparsers.add_parser(
+        "rank", help="Rank notes by centrality in the link graph"
+    )
+    rank_parser.add_argument(
+        "--top", type=int, default=10, help="Number of notes to show"
+    )
+    rank_parser.add_argument(
+        "--by",
+        choices=["pagerank", "in-degree"],
+        default="pagerank",
+        help="Centrality measure",
+    )
+
+    # Stats command
+    stats_parser = subparsers.add_parser(
+        "stats",
+        help="Show operation counts, latencies and bytes recorded by past runs",
+    )
+    stats_parser.add_argument(
+        "--format",
+        choices=["text", "json", "prometheus"],
+        default="text",
+        help="Output as a table, JSON or the Prometheus text format",
+    )
+    stats_parser.add_argument(
+        "--output", type=str, default=None, help="Write the stats to a file"
+    )
+    stats_parser.add_argument(
+        "--reset", action="store_true", help="Clear the recorded stats afterwards"
+    )
+
+    # Benchmark command
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="Time ZKB operations on a synthetic vault, offline, as JSON",
+    )
+    add_bench_arguments(bench_parser)
+
     args = parser.parse_args()
 
-    cli = CLI(data_dir=args.data_dir, db_path=args.db_path)
+    if args.command == "bench":
+        from .bench.runner import run_from_args
+
+        # Runs on its own temporary vault and offline QA store
+        run_from_args(args)
+        return
+
+    metrics_path = Path(args.db_path).parent / METRICS_FILE
+    if args.command == "stats":
+        show_stats(
+            metrics_path,
+            output_format=args.format,
+            output=args.output,
+            reset=args.reset,
+        )
+        return
+
+    try:
+        run_command(parser, args)
+    finally:
+        if args.command is not None and METRICS.snapshot():
+            METRICS.save(metrics_path)
+
+
+def run_command(parser, args):
+    socket_path = args.socket or str(Path(args.db_path).parent / SOCKET_FILE)
+    cli = CLI(data_dir=args.data_dir, db_path=args.db_path, socket_path=socket_path)
 
     if args.command == "scan":
-        cli.scan_notes()
+        cli.scan_notes(full=args.full, workers=args.workers, chunk_size=args.chunk_size)
+    elif args.command == "index-worker":
+        if args.status:
+            cli.show_index_status()
+        else:
+            cli.run_index_worker(poll_interval=args.poll_interval, once=args.once)
+    elif args.command == "serve":
+        cli.serve(
+            workers=args.workers,
+            metrics_path=Path(args.db_path).parent / METRICS_FILE,
+        )
+    elif args.command == "watch":
+        cli.watch(
+            debounce=args.debounce,
+            poll_interval=args.poll_interval,
+            polling=args.polling,
+        )
+    elif args.command == "search":
+        cli.search(args.query, limit=args.limit, offset=args.offset)
     elif args.command == "find-orphans":
         cli.find_orphaned_notes()
     elif args.command == "find-broken-links":
         cli.find_broken_links()
     elif args.command == "find-backlinks":
         cli.find_backlinks(args.filename)
+    elif args.command == "neighbors":
+        cli.find_neighborhood(args.filename, hops=args.hops, direction=args.direction)
+    elif args.command == "path":
+        cli.find_shortest_path(args.source, args.target, directed=args.directed)
+    elif args.command == "components":
+        cli.find_components(min_size=args.min_size)
+    elif args.command == "rank":
+        cli.rank_notes(top=args.top, by=args.by)
     else:
         parser.print_help()
 
@@ -0,0 +1,114 @@
+import builtins
+import itertools
+import json
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+# The socket `zkb serve` listens on, next to the database by default
+SOCKET_FILE = "zkb.sock"
+# Exceptions raised by ZKB methods that clients re-raise as themselves;
+# any other error arrives as a ServerError
+FORWARDED_ERRORS = (
+    "FileExistsError",
+    "FileNotFoundError",
+    "KeyError",
+    "TypeError",
+    "ValueError",
+)
+
+
+class ServerError(Exception):
+    """An error of a ``zkb serve`` process, or of talking to it."""
+
+
+class ZKBClient:
+    """
+    Calls the methods of the ZKB served by ``zkb serve`` over its socket.
+
+    Any public ZKB method the server exposes can be called as if on a local
+    ZKB, e.g. ``client.find_backlinks("note")``. Results come back as JSON:
+    tuples become lists and notes become dicts of their filename, path,
+    metadata, content and links. Calls from several threads are serialized
+    over one connection; use one client per thread for parallel requests.
+    """
+
+    def __init__(self, socket_path: Union[str, Path], timeout: Optional[float] = None):
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file: Any = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"ZKBClient(socket_path='{self.socket_path}')"
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def __enter__(self) -> "ZKBClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @classmethod
+    def connect(
+        cls,
+        socket_path: Union[str, Path],
+        notes_path: Optional[Union[str, Path]] = None,
+    ) -> Optional["ZKBClient"]:
+        """
+        A client of the server at ``socket_path``, or None if none answers,
+        or if it serves a vault other than the one at ``notes_path``.
+        """
+        if not Path(socket_path).exists():
+            return None
+        client = cls(socket_path)
+        try:
+            served = client.call("ping")["notes_path"]
+        except (OSError, ServerError):
+            client.close()
+            return None
+        if notes_path is not None and Path(served) != Path(notes_path).resolve():
+            client.close()
+            return None
+        return client
+
+    def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        request = {"id": next(self._ids), "method": method, "args": args}
+        if kwargs:
+            request["kwargs"] = kwargs
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.settimeout(self.timeout)
+                    sock.connect(str(self.socket_path))
+                except OSError:
+                    sock.close()
+                    raise
+                self._sock, self._file = sock, sock.makefile("rb")
+            self._sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            line = self._file.readline()
+        if not line:
+            self.close()
+            raise ServerError(f"Server at {self.socket_path} closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            error = response["error"]
+            if error["type"] in FORWARDED_ERRORS:
+                raise getattr(builtins, error["type"])(error["message"])
+            raise ServerError(f"{error['type']}: {error['message']}")
+        return response["result"]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sock is not None:
+                self._file.close()
+                self._sock.close()
+                self._sock = self._file = None
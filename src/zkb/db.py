@@ -1,12 +1,159 @@
+import queue
+import re
 import sqlite3
-from typing import Any
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from .metrics import METRICS
 
+BULK_BATCH_SIZE = 1000
+BULK_CACHE_SIZE_KIB = 64 * 1024
+# Read-only connections serving queries while the writer connection commits
+READ_CONNECTIONS = 4
+# Keep IN (...) lists under SQLite's default limit of 999 bound parameters
+SQL_VARIABLES_BATCH = 500
+
+# (filename, full_path, title, links[, body, frontmatter])
+NoteRow = tuple
+
+# Schema migrations, applied in order; the schema version is PRAGMA user_version
+MIGRATIONS: list[tuple[str, ...]] = [
+    # 1: index the link graph and forbid duplicate (from_note, to_note) rows
+    (
+        """
+        DELETE FROM links WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM links GROUP BY from_note, to_note
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_links_from_to ON links(from_note, to_note)",
+        "CREATE INDEX IF NOT EXISTS idx_links_to_note ON links(to_note, from_note)",
+    ),
+    # 2: durable queue of (re)index jobs, one row per note
+    (
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            filename TEXT PRIMARY KEY,
+            action TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            generation INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL,
+            last_error TEXT,
+            updated_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, run_after)",
+    ),
+    # 3: full-text index of notes (rowid = notes.id) and a key/value meta table
+    (
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            title, body, frontmatter,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """,
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+        # Notes indexed before this migration need their text read from disk
+        """
+        INSERT OR REPLACE INTO meta (key, value)
+        SELECT 'search_index_stale', '1' WHERE EXISTS (SELECT 1 FROM notes)
+        """,
+    ),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+ORPHANED_NOTES_SQL = """
+    SELECT filename FROM notes AS n
+    WHERE NOT EXISTS (SELECT 1 FROM links AS l WHERE l.to_note = n.filename)
+"""
+BROKEN_LINKS_SQL = """
+    SELECT from_note, to_note FROM links AS l
+    WHERE NOT EXISTS (SELECT 1 FROM notes AS n WHERE n.filename = l.to_note)
+"""
+BACKLINKS_SQL = "SELECT from_note FROM links WHERE to_note = ?"
+SEARCH_SQL = """
+    SELECT n.filename, n.full_path, n.title,
+           snippet(notes_fts, -1, '[', ']', '...', 16),
+           bm25(notes_fts, 10.0, 1.0, 2.0) AS score
+    FROM notes_fts JOIN notes AS n ON n.id = notes_fts.rowid
+    WHERE notes_fts MATCH ?
+    ORDER BY score
+    LIMIT ? OFFSET ?
+"""
+
+_SEARCH_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+SEARCH_FIELDS = ("title", "body", "frontmatter")
+
+
+def build_match_query(
+    query: str,
+    fields: Optional[Iterable[str]] = None,
+    match_any: bool = False,
+) -> Optional[str]:
+    """
+    Translate a user search query into an FTS5 MATCH expression.
+
+    Terms are ANDed together, or ORed with ``match_any``. ``"quoted text"``
+    matches a phrase and a trailing ``*`` matches a prefix; every other
+    character is taken literally, so user input can never be an FTS5 syntax
+    error. ``fields`` restricts matching to some of ``SEARCH_FIELDS``.
+    Returns None when the query contains no terms.
+    """
+    terms = []
+    for phrase, word in _SEARCH_TERM_PATTERN.findall(query):
+        text, prefix = (phrase, False) if phrase else (word, word.endswith("*"))
+        text = text.rstrip("*") if prefix else text
+        if not text.strip():
+            continue
+        term = '"' + text.replace('"', '""') + '"'
+        terms.append(term + "*" if prefix else term)
+    if not terms:
+        return None
+    expression = (" OR " if match_any else " ").join(terms)
+    if fields is not None:
+        fields = list(fields)
+        unknown = set(fields) - set(SEARCH_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown search fields: {sorted(unknown)}")
+        expression = "{" + " ".join(fields) + "} : (" + expression + ")"
+    return expression
+
+
+@METRICS.instrument_methods("db", exclude=("bulk_mode", "reader", "transaction"))
 class Database:
-    def __init__(self, db_file: str) -> None:
+    """
+    The notes, links, manifest and search index of a vault, in SQLite.
+
+    The database runs in WAL mode with one writer connection, ``conn``, and
+    a pool of up to ``read_connections`` read-only connections. Writes are
+    serialized by a lock; queries run on the readers, so any number of
+    threads can read, without waiting for a long write such as a scan to
+    commit. A thread that is already reading, e.g. iterating the rows of
+    one query while running others, reuses its reader. With no read
+    connections, queries share the writer connection and its lock, and the
+    journal is only switched to WAL within ``bulk_mode``.
+    """
+
+    def __init__(self, db_file: str, read_connections: int = READ_CONNECTIONS) -> None:
         self.db_file = db_file
-        self.conn = sqlite3.connect(db_file)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        # An in-memory database is private to the writer connection
+        self.read_connections = read_connections if db_file != ":memory:" else 0
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(max(1, self.read_connections))
+        self._local = threading.local()
+        if self.read_connections:
+            self.conn.execute("PRAGMA journal_mode = WAL")
         self._create_tables()
+        self._migrate()
 
     def __str__(self) -> str:
         return f"Database(db_file='{self.db_file}')"
@@ -14,6 +161,78 @@ class Database:
     def __repr__(self) -> str:
         return f"Database(db_file='{self.db_file}')"
 
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Hold the writer connection for one transaction, committed on exit.
+
+        A transaction opened inside another joins it, so several writes,
+        including those of methods that open their own, commit together.
+        """
+        with self._write_lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield self.conn
+                finally:
+                    self._write_depth -= 1
+                return
+            self._write_depth = 1
+            try:
+                with self.conn:
+                    yield self.conn
+            finally:
+                self._write_depth = 0
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read-only connection for queries, waiting while all are in
+        use.
+
+        A read opened inside another reuses its connection. With no read
+        connections, the writer connection is held instead.
+        """
+        conn = getattr(self._local, "reader", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        if not self.read_connections:
+            with self._write_lock:
+                yield self.conn
+            return
+        with self._reader_slots:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = sqlite3.connect(
+                    Path(self.db_file).resolve().as_uri() + "?mode=ro",
+                    uri=True,
+                    check_same_thread=False,
+                )
+            self._local.reader, self._local.depth = conn, 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+                if not self._local.depth:
+                    self._local.reader = None
+                self._readers.put(conn)
+
+    def close(self) -> None:
+        """Close the writer and every idle reader connection."""
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            self.conn.close()
+
     def _create_tables(self) -> None:
         with self.conn:
             self.conn.execute("""
@@ -33,6 +252,33 @@ class Database:
                     FOREIGN KEY(to_note) REFERENCES notes(filename)
                 )
             """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS manifest (
+                    full_path TEXT PRIMARY KEY,
+                    filename TEXT,
+                    mtime_ns INTEGER,
+                    size INTEGER,
+                    content_hash TEXT
+                )
+            """)
+
+    def _migrate(self) -> None:
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self.conn:
+                for statement in statements:
+                    self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {number}")
+
+    def schema_version(self) -> int:
+        with self.reader() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def explain_query_plan(self, sql: str, params: tuple = ()) -> list[str]:
+        """Return the ``EXPLAIN QUERY PLAN`` detail lines for a query."""
+        with self.reader() as conn:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[-1] for row in rows]
 
     def add_or_update_note_links(
         self,
@@ -40,9 +286,11 @@ class Database:
         full_path: str,
         title: str,
         links: list[tuple[str, str]],
+        body: str = "",
+        frontmatter: str = "",
     ) -> None:
-        with self.conn:
-            self.conn.execute(
+        with self.transaction() as conn:
+            conn.execute(
                 """
                 INSERT INTO notes (filename, full_path, title)
                 VALUES (?, ?, ?)
@@ -50,49 +298,323 @@ class Database:
             """,
                 (filename, full_path, title, full_path, title),
             )
-            self.conn.execute("DELETE FROM links WHERE from_note = ?", (filename,))
+            conn.execute("DELETE FROM links WHERE from_note = ?", (filename,))
             for link, display_text in links:
-                self.conn.execute(
-                    "INSERT INTO links (from_note, to_note, display_text) VALUES (?, ?, ?)",
+                conn.execute(
+                    "INSERT OR IGNORE INTO links (from_note, to_note, display_text) VALUES (?, ?, ?)",
                     (filename, link, display_text),
                 )
+            self._write_search_rows([(filename, title, body, frontmatter)])
+
+    def _write_search_rows(self, rows: list[tuple[str, str, str, str]]) -> None:
+        """Replace the full-text rows of ``(filename, title, body, frontmatter)``."""
+        self.conn.executemany(
+            "DELETE FROM notes_fts WHERE rowid = (SELECT id FROM notes WHERE filename = ?)",
+            [(filename,) for filename, *_ in rows],
+        )
+        self.conn.executemany(
+            """
+            INSERT INTO notes_fts (rowid, title, body, frontmatter)
+            SELECT id, ?, ?, ? FROM notes WHERE filename = ?
+        """,
+            [
+                (title, body, frontmatter, filename)
+                for filename, title, body, frontmatter in rows
+            ],
+        )
+
+    @contextmanager
+    def bulk_mode(self) -> Iterator[None]:
+        """
+        Tune the writer connection for a large rebuild and restore it
+        afterwards.
+
+        Switches to ``synchronous=NORMAL`` and a larger page cache, so that
+        batched commits no longer pay a full fsync each, and to the WAL
+        journal when there are no read connections to have set it already:
+        ``synchronous=NORMAL`` is only crash-safe with WAL.
+        """
+        with self._write_lock:
+            journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+            synchronous = self.conn.execute("PRAGMA synchronous").fetchone()[0]
+            cache_size = self.conn.execute("PRAGMA cache_size").fetchone()[0]
+            if journal_mode != "wal":
+                self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            self.conn.execute(f"PRAGMA cache_size = {-BULK_CACHE_SIZE_KIB}")
+        try:
+            yield
+        finally:
+            with self._write_lock:
+                self.conn.execute(f"PRAGMA cache_size = {int(cache_size)}")
+                self.conn.execute(f"PRAGMA synchronous = {int(synchronous)}")
+                if journal_mode != "wal":
+                    self.conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+    def bulk_add_or_update_notes(
+        self,
+        notes: Iterable[NoteRow],
+        batch_size: int = BULK_BATCH_SIZE,
+    ) -> int:
+        """
+        Insert or update many notes and their links in batched transactions.
+
+        Each item is a ``(filename, full_path, title, links[, body,
+        frontmatter])`` tuple, as taken by ``add_or_update_note_links``.
+        Returns the number of notes written.
+        """
+        written = 0
+        notes = iter(notes)
+        while batch := list(islice(notes, batch_size)):
+            with self.transaction() as conn:
+                # A filename repeated within the batch keeps its last links only
+                latest = {row[0]: row for row in batch}
+                # Only notes already in the table can have stale links to drop
+                existing = [
+                    (filename,)
+                    for filename, *_ in batch
+                    if conn.execute(
+                        "SELECT 1 FROM notes WHERE filename = ?", (filename,)
+                    ).fetchone()
+                ]
+                conn.executemany(
+                    """
+                    INSERT INTO notes (filename, full_path, title)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(filename) DO UPDATE SET
+                        full_path = excluded.full_path,
+                        title = excluded.title
+                """,
+                    [
+                        (filename, full_path, title)
+                        for filename, full_path, title, *_ in batch
+                    ],
+                )
+                conn.executemany("DELETE FROM links WHERE from_note = ?", existing)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO links (from_note, to_note, display_text) VALUES (?, ?, ?)",
+                    [
+                        (filename, link, display_text)
+                        for filename, _, _, links, *_ in latest.values()
+                        for link, display_text in links
+                    ],
+                )
+                self._write_search_rows(
+                    [
+                        (filename, title, *(text or ("", "")))
+                        for filename, _, title, _, *text in latest.values()
+                    ]
+                )
+            written += len(batch)
+        return written
+
+    def bulk_upsert_manifest_entries(
+        self, entries: Iterable[tuple[str, str, int, int, str]]
+    ) -> None:
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO manifest (full_path, filename, mtime_ns, size, content_hash)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(full_path) DO UPDATE SET
+                    filename = excluded.filename,
+                    mtime_ns = excluded.mtime_ns,
+                    size = excluded.size,
+                    content_hash = excluded.content_hash
+            """,
+                entries,
+            )
+
+    def get_manifest(self) -> dict[str, tuple[str, int, int, str]]:
+        with self.reader() as conn:
+            rows = conn.execute(
+                "SELECT full_path, filename, mtime_ns, size, content_hash FROM manifest"
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def upsert_manifest_entry(
+        self,
+        full_path: str,
+        filename: str,
+        mtime_ns: int,
+        size: int,
+        content_hash: str,
+    ) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO manifest (full_path, filename, mtime_ns, size, content_hash)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(full_path) DO UPDATE SET
+                    filename = excluded.filename,
+                    mtime_ns = excluded.mtime_ns,
+                    size = excluded.size,
+                    content_hash = excluded.content_hash
+            """,
+                (full_path, filename, mtime_ns, size, content_hash),
+            )
+
+    def delete_manifest_entry(self, full_path: str) -> None:
+        self.bulk_delete_manifest_entries([full_path])
+
+    def bulk_delete_manifest_entries(self, full_paths: Iterable[str]) -> None:
+        with self.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM manifest WHERE full_path = ?",
+                [(full_path,) for full_path in full_paths],
+            )
 
     def get_all_notes(self):
-        with self.conn:
-            return self.conn.execute("SELECT * FROM notes").fetchall()
+        with self.reader() as conn:
+            return conn.execute("SELECT * FROM notes").fetchall()
 
     def get_note_by_filename(self, filename) -> Any:
-        with self.conn:
-            return self.conn.execute(
+        with self.reader() as conn:
+            return conn.execute(
                 "SELECT * FROM notes WHERE filename = ?", (filename,)
             ).fetchone()
 
+    def iter_note_filenames(self) -> Iterator[str]:
+        with self.reader() as conn:
+            for (filename,) in conn.execute("SELECT filename FROM notes"):
+                yield filename
+
+    def iter_links(self) -> Iterator[Tuple[str, str]]:
+        with self.reader() as conn:
+            yield from conn.execute("SELECT from_note, to_note FROM links")
+
+    def iter_note_summaries(
+        self, filenames: Optional[Iterable[str]] = None
+    ) -> Iterator[Tuple[str, str, str, List[str]]]:
+        """
+        Yield ``(filename, full_path, title, link_targets)`` for some notes,
+        or for every note when ``filenames`` is None.
+        """
+        with self.reader() as conn:
+            if filenames is None:
+                notes = conn.execute("SELECT filename, full_path, title FROM notes")
+                links: Dict[str, List[str]] = {}
+                for from_note, to_note in self.iter_links():
+                    links.setdefault(from_note, []).append(to_note)
+                for filename, full_path, title in notes:
+                    yield filename, full_path, title, links.get(filename, [])
+                return
+            filenames = list(filenames)
+            for start in range(0, len(filenames), SQL_VARIABLES_BATCH):
+                batch = filenames[start : start + SQL_VARIABLES_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                links = {}
+                for from_note, to_note in conn.execute(
+                    f"SELECT from_note, to_note FROM links WHERE from_note IN ({placeholders})",
+                    batch,
+                ):
+                    links.setdefault(from_note, []).append(to_note)
+                rows = {
+                    row[0]: row
+                    for row in conn.execute(
+                        f"SELECT filename, full_path, title FROM notes WHERE filename IN ({placeholders})",
+                        batch,
+                    )
+                }
+                for filename in batch:
+                    if filename in rows:
+                        yield (*rows[filename], links.get(filename, []))
+
+    def data_version(self) -> int:
+        """
+        Return SQLite's ``PRAGMA data_version`` of the writer connection,
+        which changes whenever another connection commits to the database.
+        """
+        with self._write_lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
     def get_orphaned_notes(self) -> list[Any]:
-        with self.conn:
-            return self.conn.execute("""
-                SELECT filename FROM notes
-                WHERE filename NOT IN (
-                    SELECT DISTINCT to_note FROM links
-                )
-            """).fetchall()
+        with self.reader() as conn:
+            return conn.execute(ORPHANED_NOTES_SQL).fetchall()
 
     def get_broken_links(self) -> list[Any]:
-        with self.conn:
-            return self.conn.execute("""
-                SELECT from_note, to_note FROM links
-                WHERE to_note NOT IN (SELECT filename FROM notes)
-            """).fetchall()
+        with self.reader() as conn:
+            return conn.execute(BROKEN_LINKS_SQL).fetchall()
 
     def get_backlinks(self, filename) -> list[Any]:
-        with self.conn:
-            return self.conn.execute(
-                "SELECT from_note FROM links WHERE to_note = ?", (filename,)
-            ).fetchall()
+        with self.reader() as conn:
+            return conn.execute(BACKLINKS_SQL, (filename,)).fetchall()
+
+    def search_notes(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        fields: Optional[Iterable[str]] = None,
+        match_any: bool = False,
+    ) -> list[Any]:
+        """
+        Full-text search of note titles, bodies and frontmatter.
+
+        Returns ``(filename, full_path, title, snippet, score)`` rows, best
+        BM25 match first (lower scores are better). See ``build_match_query``
+        for the query syntax.
+        """
+        match = build_match_query(query, fields, match_any)
+        if match is None:
+            return []
+        limit = -1 if limit is None else limit
+        with self.reader() as conn:
+            return conn.execute(SEARCH_SQL, (match, limit, offset)).fetchall()
+
+    def update_search_index(self, rows: Iterable[tuple[str, str, str, str]]) -> None:
+        """Rewrite the full-text rows of ``(filename, title, body, frontmatter)``."""
+        rows = iter(rows)
+        while batch := list(islice(rows, BULK_BATCH_SIZE)):
+            with self.transaction():
+                self._write_search_rows(batch)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self.reader() as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        with self.transaction() as conn:
+            if value is None:
+                conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    (key, value),
+                )
+
+    def increment_meta(self, key: str) -> None:
+        """Increment an integer counter in the meta table, starting from 0."""
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO meta (key, value) VALUES (?, '1')
+                ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+                """,
+                (key,),
+            )
 
     def delete_note(self, filename: str) -> None:
-        with self.conn:
-            self.conn.execute("DELETE FROM notes WHERE filename = ?", (filename,))
-            self.conn.execute(
-                "DELETE FROM links WHERE from_note = ? OR to_note = ?",
-                (filename, filename),
+        self.bulk_delete_notes([filename])
+
+    def bulk_delete_notes(self, filenames: Iterable[str]) -> int:
+        """
+        Delete many notes, their outgoing links and search rows in one
+        transaction.
+
+        Links from other notes to a deleted note are kept: they become broken
+        links, as a fresh scan of the remaining notes would record them.
+        Returns the number of filenames given.
+        """
+        params = [(filename,) for filename in filenames]
+        with self.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM notes_fts WHERE rowid = (SELECT id FROM notes WHERE filename = ?)",
+                params,
             )
+            conn.executemany("DELETE FROM notes WHERE filename = ?", params)
+            conn.executemany("DELETE FROM links WHERE from_note = ?", params)
+        return len(params)
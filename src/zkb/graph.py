@@ -0,0 +1,419 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# NumPy, or None when it is not installed; imported on first use by _numpy,
+# since importing it takes longer than most graph queries
+_UNLOADED = object()
+np: Any = _UNLOADED
+
+# Per-note overlays are folded back into the CSR arrays past this many
+COMPACT_THRESHOLD = 1024
+
+OUT = "out"
+IN = "in"
+BOTH = "both"
+DIRECTIONS = (OUT, IN, BOTH)
+
+
+class LinkGraph:
+    """
+    Compact in-memory graph of the links between notes.
+
+    Every note and link target gets an integer node id. Adjacency is stored
+    as CSR (compressed sparse row) ``array('i')`` offsets and neighbours, in
+    both the link direction and the backlink direction, so a note's links or
+    backlinks are a contiguous slice. Link targets without a note are nodes
+    too (that is what makes a link broken), but they are left out of
+    components and PageRank.
+
+    ``update_note`` and ``remove_note`` apply changes incrementally: a
+    changed note's links go into a per-note overlay on top of the CSR
+    arrays, which are rebuilt once more than ``compact_threshold`` notes have
+    changed. Analytics results are cached until the graph changes.
+    """
+
+    def __init__(
+        self,
+        notes: Iterable[str] = (),
+        links: Iterable[Tuple[str, str]] = (),
+        compact_threshold: int = COMPACT_THRESHOLD,
+    ) -> None:
+        self.compact_threshold = compact_threshold
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._is_note = bytearray()
+        self._cache: Dict[tuple, object] = {}
+        for filename in notes:
+            self._is_note[self._node(filename)] = 1
+        ids, node = self._ids, self._node
+        sources, targets = array("i"), array("i")
+        for from_note, to_note in links:
+            source, target = ids.get(from_note), ids.get(to_note)
+            sources.append(node(from_note) if source is None else source)
+            targets.append(node(to_note) if target is None else target)
+        self._build(sources, targets)
+
+    def __repr__(self) -> str:
+        return f"LinkGraph(nodes={len(self._names)}, links={self.num_links})"
+
+    def __contains__(self, filename: str) -> bool:
+        node = self._ids.get(filename)
+        return node is not None and bool(self._is_note[node])
+
+    @classmethod
+    def from_db(cls, db, **kwargs) -> "LinkGraph":
+        """Load the graph from the ``notes`` and ``links`` tables of a Database."""
+        return cls(db.iter_note_filenames(), db.iter_links(), **kwargs)
+
+    @property
+    def num_links(self) -> int:
+        return sum(len(self._out(node)) for node in range(len(self._names)))
+
+    @property
+    def notes(self) -> List[str]:
+        return [name for name, is_note in zip(self._names, self._is_note) if is_note]
+
+    def update_note(self, filename: str, links: Iterable[str]) -> None:
+        """Add a note, or replace its links, as in ``add_or_update_note_links``."""
+        node = self._node(filename)
+        self._is_note[node] = 1
+        self._set_links(node, links)
+
+    def remove_note(self, filename: str) -> None:
+        """
+        Remove a note and its links, as ``Database.delete_note``. Links to it
+        are kept, so it stays as a broken link target.
+        """
+        node = self._ids.get(filename)
+        if node is None:
+            return
+        self._is_note[node] = 0
+        self._set_links(node, ())
+
+    def links(self, filename: str) -> List[str]:
+        node = self._ids.get(filename)
+        return [] if node is None else [self._names[n] for n in self._out(node)]
+
+    def backlinks(self, filename: str) -> List[str]:
+        node = self._ids.get(filename)
+        return [] if node is None else [self._names[n] for n in self._in(node)]
+
+    def neighborhood(
+        self, filename: str, hops: int = 1, direction: str = BOTH
+    ) -> Dict[str, int]:
+        """
+        Return the notes within ``hops`` links of a note, with their distance.
+
+        ``direction`` follows links (``out``), backlinks (``in``) or both.
+        Broken link targets are not traversed. The note itself is not
+        included.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction {direction!r}")
+        if filename not in self:
+            return {}
+        start = self._ids[filename]
+        distances = {start: 0}
+        frontier = [start]
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in self._neighbors(node, direction):
+                    if neighbor not in distances and self._is_note[neighbor]:
+                        distances[neighbor] = hop
+                        next_frontier.append(neighbor)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        del distances[start]
+        return {self._names[node]: hop for node, hop in distances.items()}
+
+    def shortest_path(
+        self, source: str, target: str, directed: bool = False
+    ) -> Optional[List[str]]:
+        """
+        Return the notes on a shortest path from ``source`` to ``target``.
+
+        With ``directed`` only links are followed; otherwise links and
+        backlinks both count. Returns None when there is no path.
+        """
+        if source not in self or target not in self:
+            return None
+        start, goal = self._ids[source], self._ids[target]
+        # Bidirectional BFS, always growing the smaller frontier
+        forward, backward = (OUT, IN) if directed else (BOTH, BOTH)
+        parents, children = {start: start}, {goal: goal}
+        frontier, back_frontier = [start], [goal]
+        meet = start if start == goal else None
+        while meet is None and frontier and back_frontier:
+            if len(frontier) <= len(back_frontier):
+                frontier, meet = self._expand(frontier, parents, children, forward)
+            else:
+                back_frontier, meet = self._expand(
+                    back_frontier, children, parents, backward
+                )
+        if meet is None:
+            return None
+        path = [meet]
+        while path[-1] != start:
+            path.append(parents[path[-1]])
+        path.reverse()
+        while path[-1] != goal:
+            path.append(children[path[-1]])
+        return [self._names[n] for n in path]
+
+    def connected_components(self) -> List[List[str]]:
+        """
+        Return the weakly connected components of notes, largest first.
+
+        Cached until the graph changes.
+        """
+        key = ("components",)
+        if key not in self._cache:
+            self.compact()
+            num_nodes = len(self._names)
+            labels = array("i", [-1]) * num_nodes
+            components = []
+            for start in range(num_nodes):
+                if labels[start] != -1 or not self._is_note[start]:
+                    continue
+                label = len(components)
+                labels[start] = label
+                members = [start]
+                stack = [start]
+                while stack:
+                    node = stack.pop()
+                    for neighbor in self._neighbors(node, BOTH):
+                        if labels[neighbor] == -1 and self._is_note[neighbor]:
+                            labels[neighbor] = label
+                            members.append(neighbor)
+                            stack.append(neighbor)
+                components.append(sorted(self._names[n] for n in members))
+            components.sort(key=lambda members: (-len(members), members[0]))
+            self._cache[key] = components
+        return [list(members) for members in self._cache[key]]
+
+    def pagerank(
+        self, damping: float = 0.85, tol: float = 1e-8, max_iter: int = 100
+    ) -> Dict[str, float]:
+        """
+        Return the PageRank of every note.
+
+        Only links between existing notes count; the rank of notes without
+        such links is spread evenly. Uses NumPy when it is installed. Cached
+        until the graph changes.
+        """
+        key = ("pagerank", damping, tol, max_iter)
+        if key not in self._cache:
+            self.compact()
+            nodes = [node for node in range(len(self._names)) if self._is_note[node]]
+            if not nodes:
+                ranks = []
+            elif _numpy() is not None:
+                ranks = self._pagerank_numpy(nodes, damping, tol, max_iter)
+            else:
+                ranks = self._pagerank_python(nodes, damping, tol, max_iter)
+            self._cache[key] = {
+                self._names[node]: float(rank) for node, rank in zip(nodes, ranks)
+            }
+        return dict(self._cache[key])
+
+    def in_degrees(self) -> Dict[str, int]:
+        """Return the number of notes linking to each note."""
+        return {
+            self._names[node]: sum(1 for n in self._in(node) if self._is_note[n])
+            for node in range(len(self._names))
+            if self._is_note[node]
+        }
+
+    def compact(self) -> None:
+        """Fold the incremental overlays back into the CSR arrays."""
+        if not self._out_overlay and len(self._names) == self._num_base_nodes:
+            return
+        sources, targets = array("i"), array("i")
+        for node in range(len(self._names)):
+            neighbors = self._out(node)
+            sources.extend([node] * len(neighbors))
+            targets.extend(neighbors)
+        self._build(sources, targets)
+
+    def _node(self, filename: str) -> int:
+        node = self._ids.get(filename)
+        if node is None:
+            node = self._ids[filename] = len(self._names)
+            self._names.append(filename)
+            self._is_note.append(0)
+        return node
+
+    def _build(self, sources: array, targets: array) -> None:
+        num_nodes = len(self._names)
+        self._out_offsets, self._out_targets = _csr(num_nodes, sources, targets)
+        self._in_offsets, self._in_sources = _csr(num_nodes, targets, sources)
+        self._num_base_nodes = num_nodes
+        self._out_overlay: Dict[int, array] = {}
+        self._in_added: Dict[int, Set[int]] = {}
+        self._in_removed: Dict[int, Set[int]] = {}
+        self._cache.clear()
+
+    def _set_links(self, node: int, links: Iterable[str]) -> None:
+        old = set(self._out(node))
+        new = array("i", dict.fromkeys(self._node(link) for link in links))
+        for target in old.difference(new):
+            if node in self._in_added.get(target, ()):
+                self._in_added[target].discard(node)
+            else:
+                self._in_removed.setdefault(target, set()).add(node)
+        for target in set(new).difference(old):
+            if node in self._in_removed.get(target, ()):
+                self._in_removed[target].discard(node)
+            else:
+                self._in_added.setdefault(target, set()).add(node)
+        self._out_overlay[node] = new
+        self._cache.clear()
+        if len(self._out_overlay) > self.compact_threshold:
+            self.compact()
+
+    def _out(self, node: int) -> array:
+        overlay = self._out_overlay.get(node)
+        if overlay is not None:
+            return overlay
+        if node >= self._num_base_nodes:
+            return array("i")
+        return self._out_targets[self._out_offsets[node] : self._out_offsets[node + 1]]
+
+    def _in(self, node: int) -> array:
+        if node < self._num_base_nodes:
+            sources = self._in_sources[
+                self._in_offsets[node] : self._in_offsets[node + 1]
+            ]
+        else:
+            sources = array("i")
+        removed = self._in_removed.get(node)
+        if removed:
+            sources = array("i", (n for n in sources if n not in removed))
+        added = self._in_added.get(node)
+        if added:
+            sources.extend(sorted(added))
+        return sources
+
+    def _neighbors(self, node: int, direction: str) -> array:
+        if direction == OUT:
+            return self._out(node)
+        if direction == IN:
+            return self._in(node)
+        return self._out(node) + self._in(node)
+
+    def _expand(
+        self,
+        frontier: List[int],
+        seen: Dict[int, int],
+        other_seen: Dict[int, int],
+        direction: str,
+    ) -> Tuple[List[int], Optional[int]]:
+        """Grow a BFS frontier by one level, stopping where it meets the other."""
+        next_frontier = []
+        for node in frontier:
+            for neighbor in self._neighbors(node, direction):
+                if neighbor in seen or not self._is_note[neighbor]:
+                    continue
+                seen[neighbor] = node
+                if neighbor in other_seen:
+                    return next_frontier, neighbor
+                next_frontier.append(neighbor)
+        return next_frontier, None
+
+    def _note_edges(self, nodes: List[int]) -> Tuple[array, array, array]:
+        """Links between notes as (sources, targets) positions in ``nodes``."""
+        position = array("i", [-1]) * len(self._names)
+        for i, node in enumerate(nodes):
+            position[node] = i
+        sources, targets = array("i"), array("i")
+        out_degree = array("i", [0]) * len(nodes)
+        for i, node in enumerate(nodes):
+            for target in self._out(node):
+                j = position[target]
+                if j != -1:
+                    sources.append(i)
+                    targets.append(j)
+                    out_degree[i] += 1
+        return sources, targets, out_degree
+
+    def _pagerank_numpy(
+        self, nodes: List[int], damping: float, tol: float, max_iter: int
+    ) -> List[float]:
+        sources, targets, out_degree = self._note_edges(nodes)
+        n = len(nodes)
+        sources = np.frombuffer(sources, dtype=np.int32)
+        targets = np.frombuffer(targets, dtype=np.int32)
+        out_degree = np.frombuffer(out_degree, dtype=np.int32).astype(np.float64)
+        dangling = out_degree == 0
+        inv_degree = np.divide(1.0, out_degree, where=~dangling, out=np.zeros(n))
+        ranks = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            spread = np.bincount(
+                targets, weights=(ranks * inv_degree)[sources], minlength=n
+            )
+            new_ranks = (1 - damping + damping * ranks[dangling].sum()) / n
+            new_ranks = new_ranks + damping * spread
+            delta = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if delta < tol:
+                break
+        return ranks.tolist()
+
+    def _pagerank_python(
+        self, nodes: List[int], damping: float, tol: float, max_iter: int
+    ) -> List[float]:
+        sources, targets, out_degree = self._note_edges(nodes)
+        n = len(nodes)
+        offsets, in_sources = _csr(n, targets, sources)
+        inv_degree = [1.0 / d if d else 0.0 for d in out_degree]
+        ranks = [1.0 / n] * n
+        for _ in range(max_iter):
+            dangling = sum(r for r, d in zip(ranks, out_degree) if not d)
+            base = (1 - damping + damping * dangling) / n
+            share = [r * w for r, w in zip(ranks, inv_degree)]
+            new_ranks = [
+                base
+                + damping
+                * sum(share[u] for u in in_sources[offsets[v] : offsets[v + 1]])
+                for v in range(n)
+            ]
+            delta = sum(abs(a - b) for a, b in zip(new_ranks, ranks))
+            ranks = new_ranks
+            if delta < tol:
+                break
+        return ranks
+
+
+def _csr(num_nodes: int, sources: array, targets: array) -> Tuple[array, array]:
+    """Return CSR ``(offsets, neighbors)`` arrays of the edges ``sources -> targets``."""
+    if len(sources) and _numpy() is not None:
+        source_ids = np.frombuffer(sources, dtype=np.int32)
+        offsets = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(source_ids, minlength=num_nodes), out=offsets[1:])
+        order = np.argsort(source_ids, kind="stable")
+        neighbors = np.frombuffer(targets, dtype=np.int32)[order]
+        return array("i", offsets.tobytes()), array("i", neighbors.tobytes())
+    offsets = array("i", [0]) * (num_nodes + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for node in range(num_nodes):
+        offsets[node + 1] += offsets[node]
+    fill = offsets[:-1]
+    neighbors = array("i", [0]) * len(targets)
+    for source, target in zip(sources, targets):
+        neighbors[fill[source]] = target
+        fill[source] += 1
+    return offsets, neighbors
+
+
+def _numpy() -> Any:
+    global np
+    if np is _UNLOADED:
+        try:
+            import numpy
+        except ImportError:  # optional dependency, PageRank falls back to pure Python
+            numpy = None
+        np = numpy
+    return np
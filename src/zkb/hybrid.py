@@ -0,0 +1,49 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, Sequence[str]], k: int = RRF_K
+) -> List[Tuple[str, float]]:
+    """
+    Merge ranked lists of keys with reciprocal rank fusion.
+
+    Each key scores ``sum(1 / (k + rank))`` over the lists it appears in,
+    with ranks starting at 1. Returns ``(key, score)`` pairs, best first;
+    ties keep the order in which keys were first seen.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings.values():
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class StageLatencies:
+    """
+    Exponentially weighted moving averages of per-stage latencies, used to
+    skip a retrieval stage up front when it is expected to blow the budget.
+    """
+
+    def __init__(self, alpha: float = 0.3) -> None:
+        self.alpha = alpha
+        self._averages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"StageLatencies({self._averages})"
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            previous = self._averages.get(stage)
+            self._averages[stage] = (
+                seconds
+                if previous is None
+                else self.alpha * seconds + (1 - self.alpha) * previous
+            )
+
+    def expected(self, stage: str) -> Optional[float]:
+        with self._lock:
+            return self._averages.get(stage)
@@ -0,0 +1,595 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .metrics import METRICS
+from .note import Note
+from .qa import QABackend
+from .qa_cache import QACache
+from .qa_dedup import (
+    QA_DEDUP_SIMILARITY,
+    QARefs,
+    cosine_similarity,
+    distance_similarity,
+    distance_space,
+    pair_hash,
+)
+
+# The models qa_store generates with; part of the QA cache key
+QA_PAIRS_MODEL_NAME = os.getenv("QA_PAIRS_MODEL_NAME", "gpt-4o-mini")
+REWORDING_MODEL_NAME = os.getenv("REWORDING_MODEL_NAME", "gpt-4o-mini")
+# Notes longer than this are split into chunks, each its own QA generation call
+QA_CHUNK_CHARS = int(os.getenv("QA_CHUNK_CHARS", "16000"))
+# Nearest neighbors fetched per generated question when looking for
+# near-duplicates; the note's own entries among them are skipped
+DEDUP_NEIGHBORS = 8
+# Entries written per collection.add of a batch; chromadb rejects larger
+# batches than its max_batch_size, a few thousand with the default SQLite
+VECTOR_BATCH_SIZE = 4096
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting calls to ``rate`` per second on average,
+    with bursts of up to ``capacity`` calls. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"TokenBucket(rate={self.rate}, capacity={self.capacity})"
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class QAIndexer:
+    """
+    Generate and index QA pairs for many notes concurrently.
+
+    Notes are processed by up to ``concurrency`` threads. Every call to the
+    QA backend's LLM (pair generation and rewordings) goes through a shared
+    semaphore and token bucket, so at most ``concurrency`` calls are in
+    flight and no more than ``rate_limit`` start per second. All questions
+    of a note, rewordings included, are written with one ``collection.add``.
+
+    When a ``QACache`` is given, generated pairs and rewordings are looked
+    up by note body before calling the LLM and stored after. When ``QARefs``
+    are given, pairs already stored for another note are not stored again;
+    the section generating them references the stored pair instead.
+    """
+
+    def __init__(
+        self,
+        qa_kb: QABackend,
+        concurrency: int = 8,
+        rate_limit: float = 0.0,
+        cache: Optional[QACache] = None,
+        chunk_chars: int = QA_CHUNK_CHARS,
+        refs: Optional[QARefs] = None,
+        dedup_similarity: float = QA_DEDUP_SIMILARITY,
+    ) -> None:
+        self.qa_kb = qa_kb
+        self.cache = cache
+        self.chunk_chars = chunk_chars
+        self.refs = refs
+        self.dedup_similarity = dedup_similarity
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = TokenBucket(rate_limit)
+        self._in_flight = threading.BoundedSemaphore(self.concurrency)
+
+    def __repr__(self) -> str:
+        return (
+            f"QAIndexer(concurrency={self.concurrency}, "
+            f"rate_limit={self.rate_limiter.rate})"
+        )
+
+    def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.rate_limiter.acquire()
+        with self._in_flight:
+            return fn(*args)
+
+    @METRICS.instrument("qa.index")
+    def index_note(
+        self, note: Note, num_rewordings: int = 3, replace: bool = False
+    ) -> int:
+        """
+        Generate, reword and index the QA pairs of one note, section by section.
+
+        The note is split at its headings, and sections longer than
+        ``chunk_chars`` at paragraph boundaries, so no single prompt grows with
+        the note. Each section is identified by a hash of its text, stored as
+        ``section_id`` in the metadata of its questions. Pairs are generated
+        for up to ``concurrency`` sections at a time.
+
+        With ``replace``, the note is already indexed: only sections whose
+        hash is not in the collection are generated and embedded, and entries
+        of sections that no longer exist are deleted afterwards, so editing
+        one section of a long note costs one section's worth of LLM calls.
+        Returns the number of questions added to the collection.
+        """
+        indexed = None
+        if replace:
+            indexed = self.qa_kb.collection.get(
+                where={"note_filename": note.filename}, include=["metadatas"]
+            )
+        plan = self._plan(note, num_rewordings, indexed)
+        self._write([plan])
+        return len(plan.ids)
+
+    @METRICS.instrument("qa.index_batch")
+    def index_batch(
+        self,
+        notes: Sequence[Note],
+        replace: Sequence[bool],
+        removed: Sequence[str] = (),
+        num_rewordings: int = 3,
+    ) -> List[Optional[Exception]]:
+        """
+        Index many notes and remove others with one batched write.
+
+        As with ``index_notes``, the notes' QA pairs are generated
+        concurrently and each note's failure is returned in input order. But
+        nothing is written until all are generated: the entries the replaced
+        and ``removed`` notes own are read with one ``get``, then stale and
+        removed entries are dropped with one ``delete`` and the new entries are
+        stored with one ``add`` per ``VECTOR_BATCH_SIZE`` of them.
+        """
+        replaced = [note.filename for note, r in zip(notes, replace) if r]
+        indexed: Dict[str, Dict[str, List[Any]]] = {
+            filename: {"ids": [], "metadatas": []} for filename in replaced
+        }
+        removed_entries: List[Tuple[str, Dict[str, Any]]] = []
+        if self.refs is not None:
+            for filename in removed:
+                self.refs.remove(filename)
+        if replaced or removed:
+            rows = self.qa_kb.collection.get(
+                where={"note_filename": {"$in": replaced + list(removed)}},
+                include=["metadatas"],
+            )
+            for id_, metadata in zip(rows["ids"], rows["metadatas"]):
+                metadata = metadata or {}
+                owned = indexed.get(metadata.get("note_filename"))
+                if owned is None:
+                    removed_entries.append((id_, metadata))
+                else:
+                    owned["ids"].append(id_)
+                    owned["metadatas"].append(metadata)
+
+        def plan(job: Tuple[Note, bool]) -> Union["_IndexPlan", Exception]:
+            note, should_replace = job
+            try:
+                return self._plan(
+                    note,
+                    num_rewordings,
+                    indexed[note.filename] if should_replace else None,
+                )
+            except Exception as e:
+                from loguru import logger
+
+                logger.warning(f"Failed to index QA pairs for {note.filename}: {e}")
+                return e
+
+        if len(notes) <= 1:
+            planned = [plan(job) for job in zip(notes, replace)]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.concurrency, len(notes)),
+                thread_name_prefix="zkb-index",
+            ) as executor:
+                planned = list(executor.map(plan, zip(notes, replace)))
+        self._write([p for p in planned if isinstance(p, _IndexPlan)], removed_entries)
+        return [p if isinstance(p, Exception) else None for p in planned]
+
+    def _plan(
+        self, note: Note, num_rewordings: int, indexed: Optional[Dict[str, Any]]
+    ) -> "_IndexPlan":
+        """
+        Generate the entries of a note's new sections without writing them.
+
+        ``indexed`` holds the ids and metadatas of the entries the note
+        already owns, or is None for a note that is not indexed yet.
+        """
+        # section id -> the (id, metadata) of each entry the note owns in it
+        existing: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        referencing: Set[str] = set()
+        if indexed is not None:
+            for id_, metadata in zip(indexed["ids"], indexed["metadatas"]):
+                metadata = metadata or {}
+                section_id = metadata.get("section_id", "")
+                existing.setdefault(section_id, []).append((id_, metadata))
+            if self.refs is not None:
+                referencing = self.refs.sections(note.filename)
+        current: Set[str] = set()
+
+        def pending() -> Iterator[Tuple[str, Optional[str], str]]:
+            occurrences: Dict[str, int] = {}
+            for heading, text in note.iter_sections(self.chunk_chars):
+                section_id = _section_id(text, occurrences)
+                current.add(section_id)
+                owned = existing.pop(section_id, None)
+                if owned is None and section_id not in referencing:
+                    yield section_id, heading, text
+
+        generated = [
+            (section_id, heading, i, pair)
+            for section_id, heading, qa_pairs in self._generate_sections(
+                pending(), num_rewordings
+            )
+            for i, pair in enumerate(qa_pairs)
+        ]
+        hashes = [pair_hash(pair["q"], pair["a"]) for *_, pair in generated]
+        duplicates = self._find_duplicates(note, generated, hashes)
+
+        plan = _IndexPlan(note.filename, [], [], [], [], referencing - current, [])
+        for k, (section_id, heading, i, pair) in enumerate(generated):
+            if k in duplicates:
+                plan.refs.append(
+                    (duplicates[k], note.filename, str(note.full_path), section_id)
+                )
+                continue
+            metadata = {
+                "note_filename": note.filename,
+                "note_full_path": str(note.full_path),
+                "section_id": section_id,
+                "section": heading or "",
+                "pair_hash": hashes[k],
+                "answer": pair["a"] if pair["a"] else "",
+            }
+            for j, question in enumerate(pair["questions"]):
+                plan.documents.append(question)
+                plan.metadatas.append(metadata.copy())
+                plan.ids.append(f"qa_{note.filename}_{section_id}_{i}_{j}")
+        plan.stale.extend(entry for entries in existing.values() for entry in entries)
+        return plan
+
+    def _write(
+        self,
+        plans: List["_IndexPlan"],
+        removed: Sequence[Tuple[str, Dict[str, Any]]] = (),
+    ) -> None:
+        """
+        Apply planned changes with one delete and one add for all notes,
+        split into adds of at most ``VECTOR_BATCH_SIZE`` entries.
+
+        ``removed`` are the entries of notes being removed altogether. New
+        references are recorded before anything is deleted, so a pair that a
+        new section shares with a deleted one is handed over to it.
+        """
+        refs = [ref for plan in plans for ref in plan.refs]
+        if refs:
+            self.refs.add(refs)
+        for plan in plans:
+            if plan.unreferenced:
+                self.refs.remove(plan.filename, plan.unreferenced)
+        stale = list(removed) + [entry for plan in plans for entry in plan.stale]
+        if stale:
+            self._delete_entries(*map(list, zip(*stale)))
+        documents = [document for plan in plans for document in plan.documents]
+        metadatas = [metadata for plan in plans for metadata in plan.metadatas]
+        ids = [id_ for plan in plans for id_ in plan.ids]
+        for start in range(0, len(ids), VECTOR_BATCH_SIZE):
+            end = start + VECTOR_BATCH_SIZE
+            with METRICS.timer("vector.add"):
+                self.qa_kb.collection.add(
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end],
+                )
+
+    def remove_note(self, filename: str) -> None:
+        """Remove a note's QA pairs, handing shared ones over to a referencing note."""
+        collection = self.qa_kb.collection
+        if self.refs is None:
+            collection.delete(where={"note_filename": filename})
+            return
+        self.refs.remove(filename)
+        indexed = collection.get(
+            where={"note_filename": filename}, include=["metadatas"]
+        )
+        if len(indexed["ids"]) > 0:
+            self._delete_entries(list(indexed["ids"]), list(indexed["metadatas"]))
+
+    def _find_duplicates(
+        self,
+        note: Note,
+        generated: List[Tuple[str, Optional[str], int, Dict[str, Any]]],
+        hashes: List[str],
+    ) -> Dict[int, str]:
+        """
+        Map the index of each generated pair that is already stored to the
+        hash of the stored pair.
+
+        A pair is a duplicate when its normalized hash matches a pair stored
+        for another note or generated earlier in this one, or when both its
+        question and its answer are at least ``dedup_similarity`` similar to
+        those of the nearest pair stored for another note.
+        """
+        if self.refs is None or self.dedup_similarity <= 0 or not generated:
+            return {}
+        duplicates: Dict[int, str] = {}
+        first: Dict[str, int] = {}
+        for k, hash_ in enumerate(hashes):
+            if hash_ in first:
+                duplicates[k] = hash_
+            else:
+                first[hash_] = k
+
+        # Entries of this note are skipped in Python: a metadata filter would
+        # turn the nearest neighbor search into a much slower filtered one
+        collection = self.qa_kb.collection
+        stored = collection.get(
+            where={"pair_hash": {"$in": list(first)}}, include=["metadatas"]
+        )
+        stored_hashes = {
+            metadata.get("pair_hash")
+            for metadata in stored["metadatas"]
+            if metadata.get("note_filename") != note.filename
+        }
+        for hash_, k in first.items():
+            if hash_ in stored_hashes:
+                duplicates[k] = hash_
+
+        remaining = [k for k in first.values() if k not in duplicates]
+        if self.dedup_similarity >= 1 or not remaining:
+            return duplicates
+        stored_count = collection.count()
+        if stored_count == 0:
+            return duplicates
+        nearest = collection.query(
+            query_embeddings=self.qa_kb.embedding_function(
+                [generated[k][3]["q"] for k in remaining]
+            ),
+            n_results=min(DEDUP_NEIGHBORS, stored_count),
+            include=["metadatas", "distances"],
+        )
+        space = distance_space(collection)
+        candidates = []
+        for k, metadatas, distances in zip(
+            remaining, nearest["metadatas"], nearest["distances"]
+        ):
+            for metadata, distance in zip(metadatas, distances):
+                if metadata.get("note_filename") == note.filename:
+                    continue
+                if (
+                    metadata.get("pair_hash")
+                    and distance_similarity(distance, space) >= self.dedup_similarity
+                ):
+                    candidates.append((k, metadata))
+                break
+        if not candidates:
+            return duplicates
+        answers = self.qa_kb.embedding_function(
+            [
+                text
+                for k, metadata in candidates
+                for text in (generated[k][3]["a"] or "", metadata.get("answer", ""))
+            ]
+        )
+        for n, (k, metadata) in enumerate(candidates):
+            similarity = cosine_similarity(answers[2 * n], answers[2 * n + 1])
+            if similarity >= self.dedup_similarity:
+                duplicates[k] = metadata["pair_hash"]
+        return duplicates
+
+    def _delete_entries(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Delete entries of the collection. Pairs that other note sections
+        reference are re-added, with their embeddings, under the oldest one.
+        """
+        collection = self.qa_kb.collection
+        shared = {}
+        if self.refs is not None:
+            hashes = {metadata.get("pair_hash") for metadata in metadatas} - {None}
+            shared = self.refs.referrers(hashes)
+        handed_over = None
+        if shared:
+            handed_over = collection.get(
+                ids=[
+                    id_
+                    for id_, metadata in zip(ids, metadatas)
+                    if metadata.get("pair_hash") in shared
+                ],
+                include=["documents", "metadatas", "embeddings"],
+            )
+        collection.delete(ids=ids)
+        if handed_over is None:
+            return
+
+        entries: Dict[str, List[Tuple[str, Dict[str, Any], Any]]] = {}
+        for document, metadata, embedding in zip(
+            handed_over["documents"],
+            handed_over["metadatas"],
+            handed_over["embeddings"],
+        ):
+            entries.setdefault(metadata["pair_hash"], []).append(
+                (document, metadata, embedding)
+            )
+        for hash_, pair_entries in entries.items():
+            ref = self.refs.pop(hash_)
+            if ref is None:
+                continue
+            _, filename, full_path, section_id = ref
+            collection.add(
+                ids=[
+                    f"qa_{filename}_{section_id}_{hash_[:16]}_{j}"
+                    for j in range(len(pair_entries))
+                ],
+                documents=[document for document, _, _ in pair_entries],
+                metadatas=[
+                    {
+                        **metadata,
+                        "note_filename": filename,
+                        "note_full_path": full_path,
+                        "section_id": section_id,
+                    }
+                    for _, metadata, _ in pair_entries
+                ],
+                embeddings=[embedding for _, _, embedding in pair_entries],
+            )
+
+    def _generate_sections(
+        self, sections: Iterator[Tuple[str, Optional[str], str]], num_rewordings: int
+    ) -> Iterator[Tuple[str, Optional[str], List[Dict[str, Any]]]]:
+        """Generate the pairs of each section, ``concurrency`` sections at a time."""
+        batch = list(islice(sections, self.concurrency))
+        if len(batch) <= 1:
+            for section_id, heading, text in batch:
+                yield section_id, heading, self.generate(text, num_rewordings)
+            return
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="zkb-chunk"
+        ) as executor:
+            while batch:
+                generated = executor.map(
+                    lambda section: self.generate(section[2], num_rewordings), batch
+                )
+                for (section_id, heading, _), qa_pairs in zip(batch, generated):
+                    yield section_id, heading, qa_pairs
+                batch = list(islice(sections, self.concurrency))
+
+    def generate(self, text: str, num_rewordings: int = 3) -> List[Dict[str, Any]]:
+        """
+        Generate the QA pairs of ``text`` with their questions reworded.
+
+        Each pair is a ``{"q", "a", "questions"}`` dict, where ``questions``
+        holds the original question followed by its rewordings.
+        """
+        key = None
+        if self.cache is not None:
+            key = QACache.key(
+                text,
+                num_rewordings=num_rewordings,
+                qa_pairs_model=QA_PAIRS_MODEL_NAME,
+                rewording_model=REWORDING_MODEL_NAME,
+            )
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with METRICS.timer("llm.generate_qa_pairs", len(text.encode("utf-8"))):
+            qa_pairs = self._call(self.qa_kb.generate_qa_pairs, text)
+        question_sets = self.reword([pair["q"] for pair in qa_pairs], num_rewordings)
+        generated = [
+            {"q": pair["q"], "a": pair["a"], "questions": list(questions)}
+            for pair, questions in zip(qa_pairs, question_sets)
+        ]
+        if self.cache is not None and generated:
+            self.cache.put(key, generated)
+        return generated
+
+    def reword(self, questions: List[str], num_rewordings: int = 3) -> List[List[str]]:
+        """
+        Each question followed by its rewordings, in the order of ``questions``.
+
+        Rewordings are generated concurrently, within the indexer's
+        concurrency and rate limits.
+        """
+        if num_rewordings <= 0 or not questions:
+            return [[question] for question in questions]
+
+        def reword(question: str) -> List[str]:
+            with METRICS.timer("llm.generate_rewordings"):
+                return self._call(
+                    self.qa_kb.generate_rewordings, question, num_rewordings
+                )
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.concurrency, len(questions)),
+            thread_name_prefix="zkb-reword",
+        ) as executor:
+            return list(executor.map(reword, questions))
+
+    def index_notes(
+        self,
+        notes: Sequence[Note],
+        num_rewordings: int = 3,
+        replace: Optional[Sequence[bool]] = None,
+    ) -> List[Optional[Exception]]:
+        """
+        Index many notes concurrently.
+
+        ``replace`` holds, per note, whether it is already indexed and only its
+        changed sections should be regenerated; by default none are. Returns,
+        in input order, None for each note indexed successfully or the
+        exception that made it fail; one failing note does not stop the
+        others.
+        """
+        if replace is None:
+            replace = [False] * len(notes)
+
+        def index(job: Tuple[Note, bool]) -> Optional[Exception]:
+            note, should_replace = job
+            try:
+                self.index_note(
+                    note, num_rewordings=num_rewordings, replace=should_replace
+                )
+            except Exception as e:
+                from loguru import logger
+
+                logger.warning(f"Failed to index QA pairs for {note.filename}: {e}")
+                return e
+            return None
+
+        if len(notes) <= 1:
+            return [index(job) for job in zip(notes, replace)]
+        with ThreadPoolExecutor(
+            max_workers=min(self.concurrency, len(notes)),
+            thread_name_prefix="zkb-index",
+        ) as executor:
+            return list(executor.map(index, zip(notes, replace)))
+
+
+class _IndexPlan(NamedTuple):
+    """The changes indexing one note makes to the collection and its refs."""
+
+    filename: str
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    ids: List[str]
+    refs: List[Tuple[str, str, str, str]]
+    unreferenced: Set[str]
+    stale: List[Tuple[str, Dict[str, Any]]]
+
+
+def _section_id(text: str, occurrences: Dict[str, int]) -> str:
+    """A stable id for a section: its text hash, suffixed when repeated."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    count = occurrences.get(digest, 0)
+    occurrences[digest] = count + 1
+    return f"{digest}-{count}" if count else digest
@@ -0,0 +1,154 @@
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .db import Database
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 300.0
+
+INDEX = "index"
+DELETE = "delete"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Durable queue of QA (re)index jobs stored in the ZKB SQLite database.
+
+    There is at most one job per note: enqueuing a note that already has a
+    job coalesces into it, resetting its attempts and bumping its generation.
+    A worker only marks a job done or failed if its generation is unchanged,
+    so an edit made while the job runs leaves it pending for another pass.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        max_attempts: int = MAX_ATTEMPTS,
+        backoff_seconds: float = BACKOFF_SECONDS,
+    ) -> None:
+        self.db = db
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+
+    def __repr__(self) -> str:
+        return f"JobQueue(db={self.db!r})"
+
+    def enqueue(self, filename: str, action: str = INDEX) -> None:
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO jobs (filename, action, status, attempts, generation,
+                                  run_after, last_error, updated_at)
+                VALUES (?, ?, ?, 0, 1, ?, NULL, ?)
+                ON CONFLICT(filename) DO UPDATE SET
+                    action = excluded.action,
+                    status = excluded.status,
+                    attempts = 0,
+                    generation = jobs.generation + 1,
+                    run_after = excluded.run_after,
+                    last_error = NULL,
+                    updated_at = excluded.updated_at
+            """,
+                (filename, action, PENDING, now, now),
+            )
+
+    def claim(self) -> Optional[Tuple[str, str, int]]:
+        """
+        Claim the next due job, returning ``(filename, action, generation)``.
+
+        Returns None when no job is due.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                """
+                SELECT filename, action, generation FROM jobs
+                WHERE status = ? AND run_after <= ?
+                ORDER BY run_after
+                LIMIT 1
+            """,
+                (PENDING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE filename = ?",
+                (RUNNING, now, row[0]),
+            )
+        return row
+
+    def complete(self, filename: str, generation: int) -> None:
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, updated_at = ?
+                WHERE filename = ? AND generation = ? AND status = ?
+            """,
+                (DONE, time.time(), filename, generation, RUNNING),
+            )
+
+    def fail(self, filename: str, generation: int, error: str) -> None:
+        """Schedule a retry with exponential backoff, or give up on the job."""
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                """
+                SELECT attempts FROM jobs
+                WHERE filename = ? AND generation = ? AND status = ?
+            """,
+                (filename, generation, RUNNING),
+            ).fetchone()
+            if row is None:
+                return
+            attempts = row[0] + 1
+            now = time.time()
+            if attempts >= self.max_attempts:
+                status, run_after = FAILED, now
+            else:
+                delay = self.backoff_seconds * 2 ** (attempts - 1)
+                status, run_after = PENDING, now + min(delay, MAX_BACKOFF_SECONDS)
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = ?, run_after = ?,
+                                last_error = ?, updated_at = ?
+                WHERE filename = ?
+            """,
+                (status, attempts, run_after, error, now, filename),
+            )
+
+    def requeue_running(self) -> int:
+        """Return jobs left running by a worker that died to the pending state."""
+        with self.db.transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), RUNNING),
+            ).rowcount
+
+    def get_status(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self.db.reader() as conn:
+            row = conn.execute(
+                """
+                SELECT filename, action, status, attempts, run_after, last_error
+                FROM jobs WHERE filename = ?
+            """,
+                (filename,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("filename", "action", "status", "attempts", "run_after", "last_error")
+        return dict(zip(keys, row))
+
+    def counts(self) -> Dict[str, int]:
+        with self.db.reader() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
@@ -1,21 +1,59 @@
+import mmap
+import os
 import re
+import sys
+from contextlib import contextmanager
+from functools import cached_property, lru_cache
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-import yaml
+from .metrics import METRICS
+
+LINK_PATTERN = re.compile(r"\[\[([^\]|#]+)(?:#([^\]|]+))?(?:\|([^\]]+))?\]\]")
+# Frontmatter opens with a line holding only "---" and closes at the next one
+FRONTMATTER_OPEN = re.compile(r"---[ \t]*\r?\n")
+FRONTMATTER_CLOSE = re.compile(r"^---[ \t]*$", re.MULTILINE)
+# Bytes versions for memory-mapped notes. UTF-8 never encodes a non-ASCII
+# character with ASCII bytes, so they match exactly what the str versions do.
+LINK_PATTERN_BYTES = re.compile(LINK_PATTERN.pattern.encode())
+FRONTMATTER_OPEN_BYTES = re.compile(FRONTMATTER_OPEN.pattern.encode())
+FRONTMATTER_CLOSE_BYTES = re.compile(
+    FRONTMATTER_CLOSE.pattern.encode().replace(b"$", b"\r?$"), re.MULTILINE
+)
+
+# Notes at least this large are memory-mapped instead of read into a string
+MMAP_THRESHOLD = 1 << 20
+CHUNK_SEPARATORS = ("\n\n", "\n", " ")
+# ATX headings, and the code fences whose contents cannot hold headings
+HEADING_PATTERN = re.compile(
+    r"^(?:(?P<fence>(?:```|~~~)[^\r\n]*)"
+    r"|#{1,6}[ \t]+(?P<title>[^\r\n]*?)(?:[ \t]+#+)?[ \t]*)\r?$",
+    re.MULTILINE,
+)
+HEADING_PATTERN_BYTES = re.compile(HEADING_PATTERN.pattern.encode(), re.MULTILINE)
 
 
 class Note:
+    """
+    A markdown note, parsed lazily.
+
+    Constructing a Note does not touch the file. It is read and split into
+    frontmatter and body once, the first time ``content``, ``metadata`` or
+    ``links`` is accessed, and the YAML and links are only parsed when their
+    own property is first accessed.
+
+    Notes of ``MMAP_THRESHOLD`` bytes or more are memory-mapped instead: the
+    frontmatter and links are found in the mapping, the body is only decoded
+    when ``content`` is accessed, and ``iter_chunks`` streams it in pieces.
+    """
+
     def __init__(
         self,
         file_path: Path,
     ) -> None:
         self.file_path = Path(file_path)
         self.filename = self.file_path.stem
-        self.full_path = file_path.absolute()
-        self.metadata = {}  # Initialize as an empty dictionary
-        self.content = ""
-        self.links = []
-        self._parse_note()
+        self.full_path = self.file_path.absolute()
 
     def __str__(self) -> str:
         """
@@ -36,32 +74,340 @@ class Note:
             f"links={self.links})"
         )
 
-    def _parse_note(self) -> None:
-        with open(self.file_path, "r", encoding="utf-8") as file:
-            content = file.read()
-            if content.startswith("---"):
-                end = content.find("---", 3)
-                if end != -1:
-                    try:
-                        self.metadata = yaml.safe_load(content[3:end]) or {}
-                    except yaml.YAMLError:
-                        # If YAML parsing fails, set metadata to an empty dict
-                        self.metadata = {}
-                    self.content = content[end + 3 :].strip()
-                else:
-                    self.content = content
-            else:
-                self.content = content
-            self.links = self._extract_links()
+    @cached_property
+    def metadata(self) -> Dict[str, Any]:
+        frontmatter = self._parts[0]
+        if frontmatter is None:
+            return {}
+        yaml, loader = _yaml()
+        try:
+            with METRICS.timer("note.parse_frontmatter", len(frontmatter)):
+                metadata = yaml.load(frontmatter, Loader=loader)
+        except yaml.YAMLError:
+            # If YAML parsing fails, use empty metadata
+            return {}
+        return metadata if isinstance(metadata, dict) else {}
+
+    @cached_property
+    def content(self) -> str:
+        body = self._parts[1]
+        return body if isinstance(body, str) else body.text()
+
+    @cached_property
+    @METRICS.instrument("note.extract_links")
+    def links(self) -> List[Dict[str, Optional[str]]]:
+        body = self._parts[1]
+        if isinstance(body, str) or "content" in self.__dict__:
+            return self._extract_links()
+        return body.links()
+
+    def iter_chunks(self, max_chars: int) -> Iterator[str]:
+        """
+        Yield the body in pieces of at most ``max_chars`` characters.
+
+        Pieces end at a paragraph break where possible, else at a line break
+        or a space. A body that fits is yielded whole, as ``content``. Large
+        notes are streamed from the file without decoding the whole body.
+        """
+        body = self._parts[1]
+        if isinstance(body, str) or "content" in self.__dict__:
+            text = self.content
+            if len(text) <= max_chars:
+                if text:
+                    yield text
+                return
+            for start, end in _chunk_spans(text, 0, len(text), max_chars):
+                chunk = text[start:end].strip()
+                if chunk:
+                    yield chunk
+        else:
+            yield from body.chunks(max_chars)
+
+    def iter_sections(self, max_chars: int) -> Iterator[Tuple[Optional[str], str]]:
+        """
+        Yield ``(heading, text)`` for each heading-delimited section of the body.
+
+        A section runs from a markdown heading (outside code fences) to the
+        next one and includes its heading line; text before the first heading
+        is a section with heading None. Sections longer than ``max_chars``
+        are split as in ``iter_chunks``, each piece keeping the heading.
+        Empty sections are skipped.
+        """
+        body = self._parts[1]
+        if isinstance(body, str) or "content" in self.__dict__:
+            yield from _sections(self.content, 0, len(self.content), max_chars)
+        else:
+            yield from body.sections(max_chars)
+
+    def parse(self) -> "Note":
+        """Parse every field now, e.g. before sending the note to another process."""
+        for name in ("metadata", "content", "links"):
+            getattr(self, name)
+        # The raw text is no longer needed once every field is parsed
+        self.__dict__.pop("_parts", None)
+        return self
 
-    def _extract_links(self) -> list[dict]:
-        link_pattern = r"\[\[([^\]|#]+)(?:#([^\]|]+))?(?:\|([^\]]+))?\]\]"
-        matches = re.findall(link_pattern, self.content)
+    @cached_property
+    def _parts(self) -> Tuple[Optional[str], Union[str, "_MappedBody"]]:
+        """
+        The raw ``(frontmatter, body)`` of the file; frontmatter may be None,
+        and the body of a large note is a ``_MappedBody``.
+        """
+        size = os.stat(self.file_path).st_size
+        with METRICS.timer("note.read", size):
+            if size >= MMAP_THRESHOLD:
+                with _map_note(self.file_path) as (buffer, frontmatter, _, _):
+                    return (
+                        None if frontmatter is None else _decode(buffer, *frontmatter),
+                        _MappedBody(self.file_path),
+                    )
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                text = file.read()
+        opening = FRONTMATTER_OPEN.match(text)
+        if opening is None:
+            return None, text
+        closing = FRONTMATTER_CLOSE.search(text, opening.end())
+        if closing is None:
+            return None, text
+        return text[opening.end() : closing.start()], text[closing.end() :].strip()
+
+    def _extract_links(self) -> List[Dict[str, Optional[str]]]:
         return [
             {
                 "filename": match[0],
                 "heading": match[1] if match[1] else None,
                 "display_text": match[2] if match[2] else match[0],
             }
-            for match in matches
+            for match in LINK_PATTERN.findall(self.content)
+        ]
+
+
+class NoteRecord:
+    """
+    Compact, read-only summary of a note for holding many notes in memory.
+
+    Only the filename, path, title and link targets are kept, in slots
+    rather than an instance ``__dict__``. Filenames, link targets and
+    directories are interned, so a filename shared by many notes' links or a
+    directory shared by many notes is stored once. The links are a tuple of
+    target filenames, and ``full_path`` is rebuilt from the directory and
+    filename. ``content`` is read from disk each time it is accessed and
+    ``load()`` returns the full ``Note``.
+    """
+
+    __slots__ = ("filename", "title", "links", "_directory", "_basename")
+
+    def __init__(
+        self, filename: str, full_path: str, title: str, links: Iterable[str] = ()
+    ) -> None:
+        self.filename = sys.intern(filename)
+        directory, basename = os.path.split(str(full_path))
+        self._directory = sys.intern(directory)
+        # Only stored when it is not simply "{filename}.md"
+        self._basename = None if basename == f"{filename}.md" else basename
+        # Share the interned filename string for the common untitled case
+        self.title = self.filename if title == filename else title
+        self.links = tuple(sys.intern(link) for link in links)
+
+    def __repr__(self) -> str:
+        return (
+            f"NoteRecord(filename='{self.filename}', full_path='{self.full_path}', "
+            f"title='{self.title}', links={self.links})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, NoteRecord):
+            return NotImplemented
+        return (self.filename, self.full_path, self.title, self.links) == (
+            other.filename,
+            other.full_path,
+            other.title,
+            other.links,
+        )
+
+    @classmethod
+    def from_note(cls, note: Note) -> "NoteRecord":
+        return cls(
+            note.filename,
+            str(note.full_path),
+            note.metadata.get("title", note.filename),
+            (link["filename"] for link in note.links),
+        )
+
+    @property
+    def full_path(self) -> str:
+        return os.path.join(self._directory, self._basename or f"{self.filename}.md")
+
+    @property
+    def content(self) -> str:
+        """The note body, read from disk on every access."""
+        return self.load().content
+
+    def load(self) -> Note:
+        """Return the full, lazily parsed ``Note`` for this record."""
+        return Note(Path(self.full_path))
+
+
+class _MappedBody:
+    """
+    The body of a large note, read through a fresh memory map on each use
+    rather than held in memory (or keeping the file open) between uses.
+    """
+
+    __slots__ = ("path",)
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def text(self) -> str:
+        with _map_note(self.path) as (buffer, _, body, strip):
+            text = _decode(buffer, *body)
+        return text.strip() if strip else text
+
+    def links(self) -> List[Dict[str, Optional[str]]]:
+        with _map_note(self.path) as (buffer, _, (start, end), _):
+            matches = [
+                match.groups()
+                for match in LINK_PATTERN_BYTES.finditer(buffer, start, end)
+            ]
+        return [
+            {
+                "filename": _translate_newlines(filename.decode("utf-8")),
+                "heading": (
+                    _translate_newlines(heading.decode("utf-8")) if heading else None
+                ),
+                "display_text": _translate_newlines(
+                    (display_text or filename).decode("utf-8")
+                ),
+            }
+            for filename, heading, display_text in matches
         ]
+
+    def chunks(self, max_chars: int) -> Iterator[str]:
+        with _map_note(self.path) as (buffer, _, (start, end), _):
+            # A chunk of max_chars bytes never holds more than max_chars characters
+            for chunk_start, chunk_end in _chunk_spans(buffer, start, end, max_chars):
+                chunk = _decode(buffer, chunk_start, chunk_end).strip()
+                if chunk:
+                    yield chunk
+
+    def sections(self, max_chars: int) -> Iterator[Tuple[Optional[str], str]]:
+        with _map_note(self.path) as (buffer, _, (start, end), _):
+            yield from _sections(buffer, start, end, max_chars)
+
+
+@contextmanager
+def _map_note(
+    path: Path,
+) -> Iterator[Tuple[mmap.mmap, Optional[Tuple[int, int]], Tuple[int, int], bool]]:
+    """
+    Memory-map a note and yield ``(buffer, frontmatter, body, strip)``.
+
+    ``frontmatter`` and ``body`` are ``(start, end)`` byte offsets, and
+    ``strip`` tells whether the body is stripped, as it is after frontmatter.
+    """
+    with open(path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        opening = FRONTMATTER_OPEN_BYTES.match(buffer)
+        closing = (
+            None
+            if opening is None
+            else FRONTMATTER_CLOSE_BYTES.search(buffer, opening.end())
+        )
+        if closing is None:
+            yield buffer, None, (0, len(buffer)), False
+            return
+        # Trim ASCII whitespace here so that only the kept body is decoded
+        start, end = closing.end(), len(buffer)
+        while start < end and buffer[start] in b" \t\r\n\f\v":
+            start += 1
+        while end > start and buffer[end - 1] in b" \t\r\n\f\v":
+            end -= 1
+        yield buffer, (opening.end(), closing.start()), (start, end), True
+
+
+def _decode(buffer: Any, start: int = 0, end: Optional[int] = None) -> str:
+    """Decode UTF-8 from a slice of a buffer, translating newlines as ``open()``."""
+    view = memoryview(buffer)[start:end]
+    try:
+        return _translate_newlines(str(view, "utf-8"))
+    finally:
+        view.release()
+
+
+def _translate_newlines(text: str) -> str:
+    if "\r" in text:
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _chunk_spans(
+    buffer: Any, start: int, end: int, max_size: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Split ``buffer[start:end]`` (a str, or bytes-like UTF-8) into spans of at
+    most ``max_size``, cutting after a separator in the second half of each
+    span where there is one, and never inside a UTF-8 character.
+    """
+    is_text = isinstance(buffer, str)
+    separators = (
+        CHUNK_SEPARATORS if is_text else [sep.encode() for sep in CHUNK_SEPARATORS]
+    )
+    while end - start > max_size:
+        limit = start + max_size
+        for separator in separators:
+            cut = buffer.rfind(separator, start + max_size // 2, limit)
+            if cut != -1:
+                cut += len(separator)
+                break
+        else:
+            cut = limit
+            while not is_text and cut > start and buffer[cut] & 0xC0 == 0x80:
+                cut -= 1
+        yield start, cut
+        start = cut
+    if start < end:
+        yield start, end
+
+
+def _sections(
+    buffer: Any, start: int, end: int, max_chars: int
+) -> Iterator[Tuple[Optional[str], str]]:
+    """The ``(heading, text)`` sections of ``buffer[start:end]``, a str or UTF-8."""
+    is_text = isinstance(buffer, str)
+    pattern = HEADING_PATTERN if is_text else HEADING_PATTERN_BYTES
+    spans = []
+    heading, section_start, in_fence = None, start, False
+    for match in pattern.finditer(buffer, start, end):
+        if match.group("fence") is not None:
+            in_fence = not in_fence
+        elif not in_fence:
+            spans.append((heading, section_start, match.start()))
+            heading = match.group("title")
+            if not is_text:
+                heading = _decode(heading)
+            section_start = match.start()
+    spans.append((heading, section_start, end))
+    for heading, section_start, section_end in spans:
+        for chunk_start, chunk_end in _chunk_spans(
+            buffer, section_start, section_end, max_chars
+        ):
+            if is_text:
+                text = buffer[chunk_start:chunk_end].strip()
+            else:
+                text = _decode(buffer, chunk_start, chunk_end).strip()
+            if text:
+                yield heading, text
+
+
+@lru_cache(maxsize=None)
+def _yaml() -> Tuple[Any, Any]:
+    """PyYAML and its fastest safe loader, imported when first needed."""
+    import yaml
+
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:  # PyYAML built without libyaml
+        from yaml import SafeLoader
+    return yaml, SafeLoader
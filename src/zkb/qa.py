@@ -0,0 +1,35 @@
+from typing import Any, Callable, Dict, List, Optional, Protocol, Set
+
+
+class QABackend(Protocol):
+    """
+    The question-answer store used by ZKB.
+
+    ``qa_store.QuestionAnswerKB`` is the default implementation; any object
+    with the same methods, a chromadb-style ``collection`` and that
+    collection's ``embedding_function`` can be passed to
+    ``ZKB(qa_backend=...)``, e.g. an offline fake in tests.
+    """
+
+    collection: Any
+    embedding_function: Callable[[List[str]], List[Any]]
+
+    def generate_qa_pairs(self, input_text: str) -> List[Dict[str, str]]: ...
+
+    def generate_rewordings(self, question: str, num_rewordings: int) -> List[str]: ...
+
+    def add_qa(
+        self,
+        question: str,
+        answer: Any = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        num_rewordings: int = 0,
+    ) -> Set[str]: ...
+
+    def query(
+        self,
+        question: str,
+        n_results: int = 5,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        num_rewordings: int = 0,
+    ) -> List[Dict[str, Any]]: ...
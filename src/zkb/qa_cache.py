@@ -0,0 +1,141 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Hits whose last-used times are buffered before they are written in one go
+TOUCH_BATCH_SIZE = 256
+
+
+class QACache:
+    """
+    On-disk, content-addressed cache of generated QA pairs and rewordings.
+
+    Entries are keyed by a hash of the note body, the generation parameters
+    and the model names, so a note whose body is unchanged (for example,
+    after a frontmatter-only edit or a full rescan) reuses its QA pairs
+    instead of paying for LLM generation again. The cache is bounded by the
+    total size of the stored values and evicts least recently used entries.
+
+    Several processes may share one cache file, so the total size is summed
+    in the database before evicting rather than tracked in memory. Hits only
+    buffer their last-used time; the buffer is written in one transaction
+    every ``TOUCH_BATCH_SIZE`` hits and before each put.
+    """
+
+    def __init__(self, db_file: str, max_bytes: int) -> None:
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS qa_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_qa_cache_last_used ON qa_cache(last_used)"
+            )
+
+    def __repr__(self) -> str:
+        return f"QACache(db_file='{self.db_file}', max_bytes={self.max_bytes})"
+
+    @staticmethod
+    def key(text: str, **params: Any) -> str:
+        """Return the cache key of ``text`` generated with ``params``."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM qa_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH_SIZE:
+                with self.conn:
+                    self._flush_touched()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: List[Dict[str, Any]]) -> None:
+        data = json.dumps(value)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock, self.conn:
+            self._flush_touched()
+            self.conn.execute(
+                """
+                INSERT INTO qa_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value,
+                    size = excluded.size,
+                    last_used = excluded.last_used
+            """,
+                (key, data, size, time.time()),
+            )
+            self._evict()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE qa_cache SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        # The write transaction of the put is open, so no other process can
+        # change the total between summing and deleting
+        excess = self._total_size() - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM qa_cache ORDER BY last_used"
+        ):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM qa_cache WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def _total_size(self) -> int:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM qa_cache"
+        ).fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM qa_cache")
+            self._touched.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM qa_cache").fetchone()[0]
+            size = self._total_size()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
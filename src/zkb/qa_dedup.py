@@ -0,0 +1,170 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Minimum cosine similarity of both question and answer for two QA pairs to
+# count as near-duplicates; 1 keeps only exact duplicates and 0 disables
+# deduplication
+QA_DEDUP_SIMILARITY = float(os.getenv("QA_DEDUP_SIMILARITY", "0.97"))
+
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]+")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# (pair_hash, note_filename, note_full_path, section_id)
+Ref = Tuple[str, str, str, str]
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace."""
+    text = _PUNCTUATION_PATTERN.sub(" ", text.casefold())
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def pair_hash(question: str, answer: Optional[str]) -> str:
+    """Hash of a QA pair that ignores case, punctuation and spacing."""
+    digest = hashlib.sha256()
+    digest.update(normalize_text(question).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(answer or "").encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def cosine_similarity(a: Sequence[Any], b: Sequence[Any]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return float(dot / norm) if norm else 0.0
+
+
+def distance_space(collection: Any) -> str:
+    """
+    The distance a vector store collection reports: its ``hnsw:space``.
+    chromadb collections default to squared L2; others report cosine
+    distance, as the fake collection does.
+    """
+    metadata = getattr(collection, "metadata", None)
+    return (metadata or {}).get(
+        "hnsw:space", "l2" if hasattr(collection, "metadata") else "cosine"
+    )
+
+
+def distance_similarity(distance: float, space: str) -> float:
+    """The cosine similarity of unit vectors ``distance`` apart in ``space``."""
+    return 1 - distance / 2 if space == "l2" else 1 - distance
+
+
+class QARefs:
+    """
+    On-disk references from note sections to QA pairs stored for other notes.
+
+    When a note section generates a QA pair that is already in the collection
+    (exactly, after normalization, or nearly, by embedding similarity), the
+    pair is not stored again; instead a row ``(pair_hash, note_filename,
+    note_full_path, section_id)`` records that the section shares it. The
+    stored pair's entries belong to one owning note, and are handed over to a
+    referencing section when the owner drops them.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS qa_refs (
+                    pair_hash TEXT NOT NULL,
+                    note_filename TEXT NOT NULL,
+                    note_full_path TEXT NOT NULL,
+                    section_id TEXT NOT NULL,
+                    PRIMARY KEY (note_filename, section_id, pair_hash)
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_qa_refs_pair ON qa_refs(pair_hash)"
+            )
+
+    def __repr__(self) -> str:
+        return f"QARefs(db_file='{self.db_file}')"
+
+    def add(self, refs: Iterable[Ref]) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO qa_refs VALUES (?, ?, ?, ?)", list(refs)
+            )
+
+    def sections(self, note_filename: str) -> Set[str]:
+        """The ids of the sections of a note that reference shared pairs."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT section_id FROM qa_refs WHERE note_filename = ?",
+                (note_filename,),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def remove(
+        self, note_filename: str, section_ids: Optional[Iterable[str]] = None
+    ) -> None:
+        """Remove the references of a note, or of some of its sections."""
+        with self._lock, self.conn:
+            if section_ids is None:
+                self.conn.execute(
+                    "DELETE FROM qa_refs WHERE note_filename = ?", (note_filename,)
+                )
+            else:
+                self.conn.executemany(
+                    "DELETE FROM qa_refs WHERE note_filename = ? AND section_id = ?",
+                    [(note_filename, section_id) for section_id in section_ids],
+                )
+
+    def pop(self, pair_hash: str) -> Optional[Ref]:
+        """Remove and return the oldest reference to a pair, if any."""
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT rowid, * FROM qa_refs WHERE pair_hash = ? ORDER BY rowid LIMIT 1",
+                (pair_hash,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("DELETE FROM qa_refs WHERE rowid = ?", (row[0],))
+        return row[1:]
+
+    def referrers(self, pair_hashes: Iterable[str]) -> Dict[str, List[str]]:
+        """Map each pair hash to the filenames of the notes that reference it."""
+        pair_hashes = list(set(pair_hashes))
+        referrers: Dict[str, List[str]] = {}
+        with self._lock:
+            for start in range(0, len(pair_hashes), 500):
+                batch = pair_hashes[start : start + 500]
+                rows = self.conn.execute(
+                    "SELECT DISTINCT pair_hash, note_filename FROM qa_refs "
+                    f"WHERE pair_hash IN ({', '.join('?' * len(batch))}) "
+                    "ORDER BY note_filename",
+                    batch,
+                ).fetchall()
+                for hash_, filename in rows:
+                    referrers.setdefault(hash_, []).append(filename)
+        return referrers
+
+    def move(self, old_filename: str, new_filename: str, new_full_path: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                UPDATE OR REPLACE qa_refs SET note_filename = ?, note_full_path = ?
+                WHERE note_filename = ?
+                """,
+                (new_filename, new_full_path, old_filename),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM qa_refs")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            refs, pairs = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT pair_hash) FROM qa_refs"
+            ).fetchone()
+        return {"refs": refs, "shared_pairs": pairs}
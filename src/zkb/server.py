@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from .client import ZKBClient
+from .metrics import METRICS
+from .note import Note, NoteRecord
+from .zkb import ZKB
+
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "8"))
+# Seconds between saves of the server's metrics, so `zkb stats` sees them
+SERVER_METRICS_INTERVAL = float(os.getenv("SERVER_METRICS_INTERVAL", "60"))
+# Requests hold note content, so allow lines well past asyncio's 64 KiB
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+# Queries that run concurrently on the reader threads
+READ_METHODS = frozenset(
+    {
+        "find_backlinks",
+        "find_broken_links",
+        "find_orphaned_notes",
+        "hybrid_query",
+        "query_cache_stats",
+        "query_qa",
+        "query_qa_batch",
+        "read_note",
+        "read_note_records",
+        "search",
+        "search_notes",
+    }
+)
+# Calls that change notes or use the in-memory link graph, which writes
+# update in place, run one at a time on the writer thread
+WRITE_METHODS = frozenset(
+    {
+        "apply_changes",
+        "clear_query_cache",
+        "create_note",
+        "delete_note",
+        "find_components",
+        "find_neighborhood",
+        "find_shortest_path",
+        "process_index_jobs",
+        "rank_notes",
+        "rebuild_search_index",
+        "scan_notes",
+        "sync_paths",
+        "update_note",
+    }
+)
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, Note):
+        return {
+            "filename": value.filename,
+            "full_path": str(value.full_path),
+            "metadata": value.metadata,
+            "content": value.content,
+            "links": value.links,
+        }
+    if isinstance(value, NoteRecord):
+        return {
+            "filename": value.filename,
+            "full_path": value.full_path,
+            "title": value.title,
+            "links": list(value.links),
+        }
+    if isinstance(value, (Path, set, frozenset)):
+        return str(value) if isinstance(value, Path) else sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ZKBServer:
+    """
+    Serves a long-lived ZKB to ``ZKBClient``s over a Unix socket.
+
+    Each request is one line of JSON, ``{"id", "method", "args", "kwargs"}``,
+    answered by one line ``{"id", "result"}`` or ``{"id", "error": {"type",
+    "message"}}``. An asyncio event loop accepts connections and reads
+    requests; the ZKB calls run on executor threads, queries concurrently on
+    ``workers`` reader threads and changes one at a time on a writer thread.
+    Requests on one connection may be answered out of order.
+
+    With ``metrics_path``, the metrics recorded while serving are added to
+    that file every ``metrics_interval`` seconds and on shutdown.
+    """
+
+    def __init__(
+        self,
+        zkb: ZKB,
+        socket_path: Union[str, Path],
+        workers: int = SERVER_WORKERS,
+        metrics_path: Optional[Union[str, Path]] = None,
+        metrics_interval: float = SERVER_METRICS_INTERVAL,
+    ) -> None:
+        self.zkb = zkb
+        self.socket_path = Path(socket_path)
+        self.workers = workers
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+        self.metrics_interval = metrics_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def __repr__(self) -> str:
+        return f"ZKBServer(socket_path='{self.socket_path}', workers={self.workers})"
+
+    def serve(self) -> None:
+        """Serve until SIGINT or SIGTERM, or until ``stop`` is called."""
+        asyncio.run(self.serve_forever())
+
+    async def serve_forever(self) -> None:
+        self._claim_socket()
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(signum, self._stopped.set)
+            except (RuntimeError, ValueError):  # not the main thread
+                pass
+        self._readers = ThreadPoolExecutor(self.workers, thread_name_prefix="zkb-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="zkb-write")
+        server = await asyncio.start_unix_server(
+            self._handle, path=str(self.socket_path), limit=MAX_REQUEST_BYTES
+        )
+        saver = asyncio.create_task(self._save_metrics_periodically())
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            saver.cancel()
+            self._readers.shutdown(wait=True)
+            self._writer.shutdown(wait=True)
+            self.socket_path.unlink(missing_ok=True)
+            self.save_metrics()
+
+    def stop(self) -> None:
+        """Stop serving; safe to call from any thread."""
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def save_metrics(self) -> None:
+        """Add the metrics recorded since the last save to ``metrics_path``."""
+        if self.metrics_path is not None and METRICS.snapshot():
+            METRICS.save(self.metrics_path, reset=True)
+
+    async def _save_metrics_periodically(self) -> None:
+        if self.metrics_path is None:
+            return
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            await self._loop.run_in_executor(None, self.save_metrics)
+
+    def _claim_socket(self) -> None:
+        client = ZKBClient.connect(self.socket_path)
+        if client is not None:
+            client.close()
+            raise RuntimeError(f"A server is already listening on {self.socket_path}")
+        # Left behind by a server that did not shut down cleanly
+        self.socket_path.unlink(missing_ok=True)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        lock = asyncio.Lock()
+        pending = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._respond(line, writer, lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(
+        self, line: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock
+    ) -> None:
+        data = await self.dispatch(line)
+        async with lock:
+            writer.write(data)
+            await writer.drain()
+
+    async def dispatch(self, line: bytes) -> bytes:
+        """Run one request line and return its response line."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = request["method"]
+            args = request.get("args", [])
+            kwargs = request.get("kwargs", {})
+            if method == "ping":
+                result = json.dumps(
+                    {
+                        "pid": os.getpid(),
+                        "notes_path": str(self.zkb.notes_path.resolve()),
+                    }
+                )
+            elif method in READ_METHODS or method in WRITE_METHODS:
+                executor = self._readers if method in READ_METHODS else self._writer
+                result = await self._loop.run_in_executor(
+                    executor, self._call, method, args, kwargs
+                )
+            else:
+                raise ValueError(f"Unknown method {method!r}")
+        except Exception as e:
+            response = {"id": request_id, "error": _error(e)}
+            return json.dumps(response).encode("utf-8") + b"\n"
+        return f'{{"id": {json.dumps(request_id)}, "result": {result}}}\n'.encode(
+            "utf-8"
+        )
+
+    def _call(self, method: str, args: List[Any], kwargs: Dict[str, Any]) -> str:
+        """Call a ZKB method and encode its result as JSON, off the event loop."""
+        return json.dumps(getattr(self.zkb, method)(*args, **kwargs), default=_to_json)
+
+
+def _error(e: Exception) -> Dict[str, str]:
+    return {"type": type(e).__name__, "message": str(e)}
@@ -0,0 +1,755 @@
+"""
+A local approximate nearest-neighbour index over the QA collection.
+
+``IVFIndex`` is an inverted-file index in NumPy: vectors are assigned to the
+nearest of ``nlist`` centroids, and a query only scores the vectors of its
+``nprobe`` nearest lists. Vectors are stored as product-quantized codes of
+their residuals (``pq``, one byte per ``pq_dims`` dimensions), as int8 or as
+float16, and the best candidates can be re-ranked with exact vectors.
+
+``IndexedCollection`` puts an index in front of a chromadb-style collection:
+writes go to both, and unfiltered queries are answered by the index.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from .metrics import METRICS
+from .qa_dedup import distance_space
+
+PQ = "pq"
+INT8 = "int8"
+FLOAT16 = "float16"
+STORAGES = (PQ, INT8, FLOAT16)
+
+# Lists scanned per query; more lists raise recall and latency
+NPROBE = 32
+# Candidates per result re-scored with exact vectors, 0 to skip re-ranking
+RERANK = 4
+# Dimensions encoded by each byte of a product-quantized code
+PQ_DIMS = 4
+# Below this many vectors, queries go to the collection's own exact search
+MIN_ENTRIES = 10_000
+# Vectors sampled to train the centroids and codebooks
+TRAIN_SIZE = 65_536
+# Residuals the product quantizer's codebooks are trained on, of the sample
+PQ_TRAIN_SIZE = 16_384
+KMEANS_ITERATIONS = 12
+# Vectors read from the collection per page while rebuilding
+PAGE_SIZE = 4096
+# Pending and deleted vectors are merged into the lists once there are more
+# than COMPACT_MIN of them and more than COMPACT_RATIO of the listed vectors
+COMPACT_MIN = 4096
+COMPACT_RATIO = 0.0625
+
+FetchVectors = Callable[[List[str]], Tuple[List[str], Any]]
+
+
+def _normalize(x: Any) -> Any:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _assign(x: Any, centroids: Any, spherical: bool, chunk: int = 8192) -> Any:
+    """Index of the nearest centroid of each row, by cosine or by L2 distance."""
+    assignment = np.empty(len(x), dtype=np.int64)
+    half_norms = None if spherical else 0.5 * (centroids * centroids).sum(axis=1)
+    for start in range(0, len(x), chunk):
+        scores = x[start : start + chunk] @ centroids.T
+        if half_norms is not None:
+            scores -= half_norms
+        assignment[start : start + chunk] = scores.argmax(axis=1)
+    return assignment
+
+
+def _ranges(starts: Any, ends: Any) -> Any:
+    """The concatenation of ``arange(start, end)`` for each pair of bounds."""
+    counts = ends - starts
+    firsts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.repeat(starts - firsts, counts) + np.arange(counts.sum())
+
+
+def kmeans(
+    x: Any, k: int, spherical: bool = False, iterations: int = KMEANS_ITERATIONS
+) -> Any:
+    """
+    ``k`` centroids of the rows of ``x`` by Lloyd's algorithm, seeded with
+    random rows. Spherical k-means keeps centroids at unit length, for
+    clustering by cosine similarity.
+    """
+    rng = np.random.default_rng(0)
+    x = np.asarray(x, dtype=np.float32)
+    centroids = x[rng.choice(len(x), k, replace=len(x) < k)].copy()
+    for _ in range(iterations):
+        assignment = _assign(x, centroids, spherical)
+        counts = np.bincount(assignment, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums = np.add.reduceat(x[np.argsort(assignment, kind="stable")], starts)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty))]
+        if spherical:
+            centroids = _normalize(centroids)
+    return centroids
+
+
+def _save_array(path: Path, array: Any) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class IVFIndex:
+    """
+    Inverted-file index of unit vectors for maximum inner product search.
+
+    ``train`` learns the quantizers from a sample, ``build`` fills the lists
+    and ``add`` and ``remove`` change them: added vectors wait in a pending
+    buffer and removed ones are marked deleted until ``save`` compacts them
+    into the lists. ``load`` memory-maps the saved codes and ids, so opening
+    a large index reads little more than its centroids.
+
+    Parameters
+    ----------
+    storage : str
+        ``pq`` (product-quantized residuals), ``int8`` or ``float16``
+    nlist : Optional[int]
+        Number of lists, by default four times the square root of the
+        number of training vectors
+    nprobe : int
+        Lists scanned per query
+    pq_dims : int
+        Dimensions per code byte with ``pq`` storage
+    """
+
+    def __init__(
+        self,
+        storage: str = PQ,
+        nlist: Optional[int] = None,
+        nprobe: int = NPROBE,
+        pq_dims: int = PQ_DIMS,
+    ) -> None:
+        if storage not in STORAGES:
+            raise ValueError(f"Unknown storage {storage!r}, expected one of {STORAGES}")
+        self.storage = storage
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_dims = pq_dims
+        self.centroids: Any = None
+        # Codebooks of the residual subvectors (pq), or per-dimension scales (int8)
+        self.quantizer: Any = None
+        self._clear()
+
+    def __repr__(self) -> str:
+        return (
+            f"IVFIndex(storage='{self.storage}', nlist={self.nlist}, "
+            f"nprobe={self.nprobe}, pq_dims={self.pq_dims})"
+        )
+
+    def __len__(self) -> int:
+        return (
+            len(self._ids)
+            - int(self._deleted.sum())
+            + len(self._pending_ids)
+            - int(self._pending_deleted.sum())
+        )
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def dim(self) -> int:
+        return 0 if self.centroids is None else self.centroids.shape[1]
+
+    def nbytes_per_vector(self) -> int:
+        """Bytes of each vector's code, in memory and on disk."""
+        width = self.dim // self.pq_dims if self.storage == PQ else self.dim
+        return width * (2 if self.storage == FLOAT16 else 1)
+
+    def _clear(self) -> None:
+        """Drop every vector, keeping the trained quantizers."""
+        self._codes: Any = self._empty_codes()
+        self._ids: Any = np.empty(0, dtype="S1")
+        self._offsets = np.zeros(len(self.centroids) + 1 if self.trained else 1, int)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._pending_codes: Any = self._empty_codes()
+        self._pending_lists = np.empty(0, dtype=np.int64)
+        self._pending_ids: List[str] = []
+        self._pending_deleted = np.zeros(0, dtype=bool)
+        # id -> (True for the lists or False for pending, row); built on the
+        # first change, so searching a loaded index never decodes every id
+        self._rows: Optional[Dict[str, Tuple[bool, int]]] = None
+
+    def _empty_codes(self) -> Any:
+        width = self.nbytes_per_vector() // (2 if self.storage == FLOAT16 else 1)
+        dtype = {PQ: np.uint8, INT8: np.int8, FLOAT16: np.float16}[self.storage]
+        return np.empty((0, width), dtype=dtype)
+
+    def train(self, sample: Any) -> None:
+        """Learn the centroids and the code quantizer from sample vectors."""
+        sample = _normalize(sample)
+        dim = sample.shape[1]
+        if self.storage == PQ and dim % self.pq_dims:
+            raise ValueError(f"pq_dims={self.pq_dims} does not divide {dim} dimensions")
+        nlist = self.nlist or int(4 * np.sqrt(len(sample)))
+        self.centroids = kmeans(sample, max(1, min(nlist, len(sample))), spherical=True)
+        if self.storage == PQ:
+            sample = sample[:: -(-len(sample) // PQ_TRAIN_SIZE)]
+            residuals = sample - self.centroids[_assign(sample, self.centroids, True)]
+            subvectors = residuals.reshape(len(sample), -1, self.pq_dims)
+            self.quantizer = np.stack(
+                [kmeans(subvectors[:, j], 256) for j in range(subvectors.shape[1])]
+            )
+        elif self.storage == INT8:
+            # 127 at the 99.9th percentile of each dimension; rarer values clip
+            bound = np.quantile(np.abs(sample), 0.999, axis=0)
+            self.quantizer = (127 / np.maximum(bound, 1e-6)).astype(np.float32)
+        self._clear()
+
+    def _encode(self, vectors: Any) -> Tuple[Any, Any]:
+        """The list and the code of each unit vector."""
+        lists = _assign(vectors, self.centroids, True)
+        if self.storage == FLOAT16:
+            return lists, vectors.astype(np.float16)
+        if self.storage == INT8:
+            codes = np.clip(np.rint(vectors * self.quantizer), -127, 127)
+            return lists, codes.astype(np.int8)
+        residuals = vectors - self.centroids[lists]
+        residuals = residuals.reshape(len(vectors), len(self.quantizer), -1)
+        codes = np.empty(residuals.shape[:2], dtype=np.uint8)
+        for j, codebook in enumerate(self.quantizer):
+            codes[:, j] = _assign(residuals[:, j], codebook, False)
+        return lists, codes
+
+    def build(self, batches: Iterable[Tuple[Sequence[str], Any]]) -> None:
+        """Replace the indexed vectors with batches of ``(ids, vectors)``."""
+        ids, lists, codes = [], [], []
+        for batch_ids, vectors in batches:
+            if len(batch_ids):
+                batch_lists, batch_codes = self._encode(_normalize(vectors))
+                ids.extend(id_.encode("utf-8") for id_ in batch_ids)
+                lists.append(batch_lists)
+                codes.append(batch_codes)
+        self._clear()
+        if ids:
+            self._set_lists(
+                np.array(ids, dtype="S"), np.concatenate(lists), np.concatenate(codes)
+            )
+
+    def _set_lists(self, ids: Any, lists: Any, codes: Any) -> None:
+        order = np.argsort(lists, kind="stable")
+        self._ids = ids[order]
+        self._codes = codes[order]
+        counts = np.bincount(lists, minlength=len(self.centroids))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._deleted = np.zeros(len(ids), dtype=bool)
+        self._rows = None
+
+    def _index_rows(self) -> Dict[str, Tuple[bool, int]]:
+        if self._rows is None:
+            rows = {
+                id_.decode("utf-8"): (True, row)
+                for row, id_ in enumerate(self._ids.tolist())
+                if not self._deleted[row]
+            }
+            for row, id_ in enumerate(self._pending_ids):
+                if not self._pending_deleted[row]:
+                    rows[id_] = (False, row)
+            self._rows = rows
+        return self._rows
+
+    def add(self, ids: Sequence[str], vectors: Any) -> None:
+        """Add vectors, replacing those already indexed under the same ids."""
+        if not len(ids):
+            return
+        self.remove(ids)
+        lists, codes = self._encode(_normalize(vectors))
+        rows = self._index_rows()
+        for k, id_ in enumerate(ids, start=len(self._pending_ids)):
+            rows[id_] = (False, k)
+        self._pending_ids.extend(ids)
+        self._pending_codes = np.concatenate((self._pending_codes, codes))
+        self._pending_lists = np.concatenate((self._pending_lists, lists))
+        self._pending_deleted = np.concatenate(
+            (self._pending_deleted, np.zeros(len(ids), dtype=bool))
+        )
+
+    def remove(self, ids: Iterable[str]) -> None:
+        rows = self._index_rows()
+        for id_ in ids:
+            location = rows.pop(id_, None)
+            if location is None:
+                continue
+            listed, row = location
+            if listed:
+                self._deleted[row] = True
+            else:
+                self._pending_deleted[row] = True
+
+    def compact(self) -> None:
+        """Merge pending vectors into the lists and drop deleted ones."""
+        live = ~self._deleted
+        pending = ~self._pending_deleted
+        list_of_row = np.repeat(
+            np.arange(len(self._offsets) - 1), np.diff(self._offsets)
+        )
+        self._set_lists(
+            np.concatenate(
+                (
+                    self._ids[live],
+                    np.array(
+                        [id_.encode("utf-8") for id_ in self._pending_ids], dtype="S"
+                    )[pending]
+                    if self._pending_ids
+                    else np.empty(0, dtype="S1"),
+                )
+            ),
+            np.concatenate((list_of_row[live], self._pending_lists[pending])),
+            np.concatenate((self._codes[live], self._pending_codes[pending])),
+        )
+        self._pending_codes = self._empty_codes()
+        self._pending_lists = np.empty(0, dtype=np.int64)
+        self._pending_ids = []
+        self._pending_deleted = np.zeros(0, dtype=bool)
+
+    def needs_compaction(self) -> bool:
+        changed = len(self._pending_ids) + int(self._deleted.sum())
+        return changed > max(COMPACT_MIN, COMPACT_RATIO * len(self._ids))
+
+    def search(
+        self,
+        queries: Any,
+        k: int,
+        nprobe: Optional[int] = None,
+        rerank: int = 0,
+        fetch: Optional[FetchVectors] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        The ``k`` ids with the highest estimated inner product with each
+        query, best first, with their scores.
+
+        With ``rerank`` and ``fetch``, which returns the ids found among a
+        list of ids and their exact vectors, ``rerank * k`` candidates per
+        query are re-scored with exact vectors fetched for all queries at once.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+        candidates = k * rerank if rerank > 1 and fetch is not None else k
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, lists, list_scores in zip(
+            queries, probes, np.take_along_axis(coarse, probes, axis=1)
+        ):
+            positions, scores = self._scan(query, lists, list_scores)
+            if len(scores) > candidates:
+                top = np.argpartition(-scores, candidates - 1)[:candidates]
+                positions, scores = positions[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            results.append([(self._id(positions[i]), float(scores[i])) for i in order])
+        if candidates > k:
+            results = self._rerank(queries, results, k, fetch)
+        return results
+
+    def _id(self, position: int) -> str:
+        """The id at a position returned by ``_scan``."""
+        if position >= 0:
+            return self._ids[position].decode("utf-8")
+        return self._pending_ids[-1 - position]
+
+    def _scan(self, query: Any, lists: Any, list_scores: Any) -> Tuple[Any, Any]:
+        """
+        Positions and estimated scores of the live vectors in some lists:
+        listed rows as their row, pending row ``i`` as ``-1 - i``.
+        """
+        starts, ends = self._offsets[lists], self._offsets[lists + 1]
+        rows = _ranges(starts, ends)
+        coarse = np.repeat(list_scores, ends - starts)
+        live = ~self._deleted[rows]
+        rows, coarse = rows[live], coarse[live]
+        pending = np.flatnonzero(
+            np.isin(self._pending_lists, lists) & ~self._pending_deleted
+        )
+        codes = np.concatenate((self._codes[rows], self._pending_codes[pending]))
+        if self.storage == PQ:
+            # Residual codes: the query's score with the centroid plus one
+            # table lookup per code byte
+            m = len(self.quantizer)
+            tables = np.einsum("jcd,jd->jc", self.quantizer, query.reshape(m, -1))
+            scores = tables[np.arange(m), codes.astype(np.intp)].sum(axis=1)
+            scores += np.concatenate(
+                (coarse, self.centroids[self._pending_lists[pending]] @ query)
+            )
+        elif self.storage == INT8:
+            scores = codes.astype(np.float32) @ (query / self.quantizer)
+        else:
+            scores = codes.astype(np.float32) @ query
+        positions = np.concatenate((rows, -1 - pending))
+        return positions, np.asarray(scores, dtype=np.float32)
+
+    def _rerank(
+        self,
+        queries: Any,
+        results: List[List[Tuple[str, float]]],
+        k: int,
+        fetch: FetchVectors,
+    ) -> List[List[Tuple[str, float]]]:
+        wanted = sorted({id_ for hits in results for id_, _ in hits})
+        found, vectors = fetch(wanted) if wanted else ([], [])
+        exact = dict(zip(found, _normalize(vectors))) if len(found) else {}
+        reranked = []
+        for query, hits in zip(queries, results):
+            scored = [
+                (id_, float(exact[id_] @ query)) for id_, _ in hits if id_ in exact
+            ]
+            scored.sort(key=lambda hit: -hit[1])
+            reranked.append(scored[:k])
+        return reranked
+
+    def save(self, path: Union[str, Path], version: str) -> None:
+        """
+        Write the index to the directory ``path``, tagged with ``version``.
+
+        The lists are only rewritten after a compaction; otherwise only the
+        pending vectors and the deleted rows are. ``meta.json`` is written
+        last, so a reader never pairs new metadata with old arrays.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        rewrite = self.needs_compaction() or not (path / "codes.npy").exists()
+        if rewrite:
+            self.compact()
+        arrays = {
+            "deleted": np.flatnonzero(self._deleted),
+            "pending_codes": self._pending_codes,
+            "pending_lists": self._pending_lists,
+            "pending_ids": np.array(
+                [id_.encode("utf-8") for id_ in self._pending_ids], dtype="S"
+            ),
+            "pending_deleted": self._pending_deleted,
+        }
+        if rewrite:
+            arrays.update(
+                centroids=self.centroids,
+                codes=self._codes,
+                ids=self._ids,
+                offsets=self._offsets,
+            )
+            if self.quantizer is not None:
+                arrays["quantizer"] = self.quantizer
+        for name, array in arrays.items():
+            _save_array(path / f"{name}.npy", array)
+        meta = {
+            "version": version,
+            "storage": self.storage,
+            "pq_dims": self.pq_dims,
+            "nlist": len(self.centroids),
+            "dim": self.dim,
+            "count": len(self._ids),
+        }
+        tmp_path = path / f".meta.json.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_path, path / "meta.json")
+        if rewrite:
+            # Serve the freshly written lists from the page cache, not memory
+            self._codes = np.load(path / "codes.npy", mmap_mode="r")
+            self._ids = np.load(path / "ids.npy", mmap_mode="r")
+
+    def load(self, path: Union[str, Path]) -> Optional[str]:
+        """
+        Open the index saved in the directory ``path`` and return its version.
+
+        Returns None, leaving this index unchanged, if there is none or it
+        was saved with other settings.
+        """
+        path = Path(path)
+        try:
+            meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+            if (meta["storage"], meta["pq_dims"]) != (self.storage, self.pq_dims):
+                return None
+            if self.nlist and meta["nlist"] != self.nlist:
+                return None
+            centroids = np.load(path / "centroids.npy")
+            quantizer = (
+                np.load(path / "quantizer.npy") if self.storage != FLOAT16 else None
+            )
+            codes = np.load(path / "codes.npy", mmap_mode="r")
+            ids = np.load(path / "ids.npy", mmap_mode="r")
+            offsets = np.load(path / "offsets.npy")
+            deleted = np.load(path / "deleted.npy")
+            pending = {
+                name: np.load(path / f"pending_{name}.npy")
+                for name in ("codes", "lists", "ids", "deleted")
+            }
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+        if len(ids) != meta["count"] or len(codes) != meta["count"]:
+            return None
+        self.centroids, self.quantizer = centroids, quantizer
+        self._codes, self._ids, self._offsets = codes, ids, offsets
+        self._deleted = np.zeros(len(ids), dtype=bool)
+        self._deleted[deleted] = True
+        self._pending_codes = pending["codes"].astype(self._codes.dtype)
+        self._pending_lists = pending["lists"].astype(np.int64)
+        self._pending_ids = [id_.decode("utf-8") for id_ in pending["ids"].tolist()]
+        self._pending_deleted = pending["deleted"].astype(bool)
+        self._rows = None
+        return meta["version"]
+
+
+class IndexedCollection:
+    """
+    A chromadb-style collection with an ``IVFIndex`` in front of it.
+
+    Adds, updates and deletes go to the collection and to the index, and
+    queries without a ``where`` filter are answered by the index, with the
+    documents and metadatas of the hits read from the collection. Anything
+    else is passed to the collection.
+
+    The index follows the ZKB's QA index version, read by ``version``: it is
+    saved in ``path`` tagged with the version it matches, and when the
+    version moves past it, because another process changed the collection,
+    the index is loaded again or rebuilt from the collection's embeddings.
+    Until the collection holds ``min_entries`` vectors, the collection's own
+    exact search answers queries and no index is kept.
+    """
+
+    def __init__(
+        self,
+        collection: Any,
+        index: IVFIndex,
+        embedding_function: Callable[[List[str]], Any],
+        version: Callable[[], str],
+        path: Union[str, Path],
+        rerank: int = RERANK,
+        min_entries: int = MIN_ENTRIES,
+    ) -> None:
+        self.collection = collection
+        self.index = index
+        self.embedding_function = embedding_function
+        self.path = Path(path)
+        self.rerank = rerank
+        self.min_entries = min_entries
+        self.lock = threading.RLock()
+        self._current_version = version
+        # The QA index version the index matches, None when unknown
+        self.version: Optional[str] = None
+        # Whether the index is built and answers queries
+        self.active = False
+        self.space = distance_space(collection)
+
+    def __repr__(self) -> str:
+        return f"IndexedCollection({self.index!r}, active={self.active})"
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    def sync(self) -> None:
+        """Bring the index in line with the current QA index version."""
+        with self.lock:
+            version = self._current_version()
+            if version == self.version:
+                return
+            with METRICS.timer("vector_index.load"):
+                loaded = self.index.load(self.path) if self.path.is_dir() else None
+            self.active = loaded is not None
+            if loaded != version:
+                self._rebuild(version)
+            self.version = version
+
+    def _rebuild(self, version: str) -> None:
+        count = self.collection.count()
+        self.active = count >= self.min_entries
+        if not self.active:
+            return
+        with METRICS.timer("vector_index.rebuild"):
+            if not self.index.trained or self.index.dim != self._dim():
+                self.index.train(self._sample(count))
+            self.index.build(self._pages(count))
+            self.index.save(self.path, version)
+
+    def _page(self, offset: int, limit: int = PAGE_SIZE) -> Tuple[List[str], Any]:
+        rows = self.collection.get(include=["embeddings"], limit=limit, offset=offset)
+        return list(rows["ids"]), np.asarray(rows["embeddings"], dtype=np.float32)
+
+    def _dim(self) -> int:
+        return self._page(0, 1)[1].shape[1]
+
+    def _sample(self, count: int) -> Any:
+        """Up to TRAIN_SIZE vectors, in pages spread evenly over the collection."""
+        pages = -(-min(TRAIN_SIZE, count) // PAGE_SIZE)
+        offsets = np.linspace(0, max(0, count - PAGE_SIZE), pages).astype(int)
+        return np.concatenate([self._page(int(offset))[1] for offset in offsets])
+
+    def _pages(self, count: int) -> Iterable[Tuple[List[str], Any]]:
+        for offset in range(0, count, PAGE_SIZE):
+            yield self._page(offset)
+
+    def commit(self) -> None:
+        """
+        Record that the QA index version was just bumped, after this
+        process's own changes, and save the index with the new version.
+
+        If the version moved more than one step, another process changed
+        the collection too and the index is rebuilt on next use.
+        """
+        with self.lock:
+            version = self._current_version()
+            if self.version is None or int(version) != int(self.version) + 1:
+                self.version = None
+            elif self.active:
+                with METRICS.timer("vector_index.save"):
+                    self.index.save(self.path, version)
+                self.version = version
+            elif self.collection.count() >= self.min_entries:
+                self.version = None
+            else:
+                self.version = version
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: Any = None,
+        metadatas: Any = None,
+        documents: Any = None,
+        **kwargs: Any,
+    ) -> None:
+        with self.lock:
+            self.sync()
+            if self.active and embeddings is None:
+                embeddings = self.embedding_function(documents)
+            self.collection.add(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                documents=documents,
+                **kwargs,
+            )
+            if self.active:
+                self.index.add(list(ids), embeddings)
+
+    def update(
+        self,
+        ids: List[str],
+        embeddings: Any = None,
+        metadatas: Any = None,
+        documents: Any = None,
+        **kwargs: Any,
+    ) -> None:
+        with self.lock:
+            self.sync()
+            if self.active and embeddings is None and documents is not None:
+                embeddings = self.embedding_function(documents)
+            self.collection.update(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                documents=documents,
+                **kwargs,
+            )
+            if self.active and embeddings is not None:
+                self.index.add(list(ids), embeddings)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Any = None) -> None:
+        with self.lock:
+            self.sync()
+            doomed = list(ids or [])
+            if self.active and where is not None:
+                doomed += self.collection.get(where=where, include=[])["ids"]
+            self.collection.delete(ids=ids, where=where)
+            if self.active:
+                self.index.remove(doomed)
+
+    def _fetch(self, ids: List[str]) -> Tuple[List[str], Any]:
+        rows = self.collection.get(ids=ids, include=["embeddings"])
+        return list(rows["ids"]), rows["embeddings"]
+
+    def query(
+        self,
+        query_texts: Optional[List[str]] = None,
+        query_embeddings: Any = None,
+        n_results: int = 10,
+        where: Any = None,
+        include: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, List[Any]]:
+        with self.lock:
+            self.sync()
+            include = include or ["metadatas", "documents", "distances"]
+            if (
+                not self.active
+                or where is not None
+                or kwargs
+                or not set(include) <= {"metadatas", "documents", "distances"}
+            ):
+                params = {
+                    "query_texts": query_texts,
+                    "query_embeddings": query_embeddings,
+                    "where": where,
+                    "include": include,
+                }
+                return self.collection.query(
+                    n_results=n_results,
+                    **{
+                        key: value for key, value in params.items() if value is not None
+                    },
+                    **kwargs,
+                )
+            if query_embeddings is None:
+                query_embeddings = self.embedding_function(query_texts)
+            with METRICS.timer("vector_index.search"):
+                hits = self.index.search(
+                    query_embeddings, n_results, rerank=self.rerank, fetch=self._fetch
+                )
+        wanted = sorted({id_ for query_hits in hits for id_, _ in query_hits})
+        rows = (
+            self.collection.get(ids=wanted, include=["documents", "metadatas"])
+            if wanted
+            else {"ids": [], "documents": [], "metadatas": []}
+        )
+        found = {
+            id_: (document, metadata)
+            for id_, document, metadata in zip(
+                rows["ids"], rows["documents"], rows["metadatas"]
+            )
+        }
+        results: Dict[str, List[Any]] = {"ids": []}
+        for key in include:
+            results[key] = []
+        for query_hits in hits:
+            # Hits deleted from the collection by another process are dropped
+            query_hits = [(id_, score) for id_, score in query_hits if id_ in found]
+            results["ids"].append([id_ for id_, _ in query_hits])
+            if "documents" in include:
+                results["documents"].append([found[id_][0] for id_, _ in query_hits])
+            if "metadatas" in include:
+                results["metadatas"].append([found[id_][1] for id_, _ in query_hits])
+            if "distances" in include:
+                results["distances"].append(
+                    [self._distance(score) for _, score in query_hits]
+                )
+        return results
+
+    def _distance(self, similarity: float) -> float:
+        """The collection's distance for a cosine similarity of unit vectors."""
+        return 2 - 2 * similarity if self.space == "l2" else 1 - similarity
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+from loguru import logger
+
+from .zkb import ZKB
+
+try:
+    import watchfiles
+except ImportError:  # optional dependency, fall back to polling
+    watchfiles = None
+
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "0.5"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "1.0"))
+
+
+class NoteWatcher:
+    """
+    Keep a ZKB index live by watching its notes directory.
+
+    Filesystem events are collected until the notes directory has been quiet
+    for ``debounce`` seconds, so the burst of events an editor produces when
+    saving (temp file, rename, chmod) becomes a single update. Each batch of
+    changed paths is applied with ``ZKB.sync_paths``, which treats renames as
+    moves.
+
+    Events come from ``watchfiles`` (inotify, FSEvents, ...) when it is
+    installed, and from polling the directory every ``poll_interval`` seconds
+    otherwise or when ``force_polling`` is set.
+    """
+
+    def __init__(
+        self,
+        zkb: ZKB,
+        debounce: float = WATCH_DEBOUNCE,
+        poll_interval: float = WATCH_POLL_INTERVAL,
+        force_polling: bool = False,
+    ) -> None:
+        self.zkb = zkb
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling or watchfiles is None
+        self.stop_event = threading.Event()
+
+    def __repr__(self) -> str:
+        return (
+            f"NoteWatcher(notes_path='{self.zkb.notes_path}', "
+            f"debounce={self.debounce}, polling={self.force_polling})"
+        )
+
+    def run(
+        self,
+        on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+        initial_scan: bool = True,
+    ) -> None:
+        """
+        Watch the notes directory until ``stop()`` is called.
+
+        Parameters
+        ----------
+        on_batch : Optional[Callable[[Dict[str, Any]], None]], optional
+            Called after each batch is applied with the ``sync_paths`` counts
+            plus ``latency``: the seconds from the most recent save in the
+            batch to the index being queryable, by default None
+        initial_scan : bool, optional
+            Scan the notes first, to pick up changes made while nothing was
+            watching, by default True
+        """
+        if initial_scan:
+            self.zkb.scan_notes()
+        for paths in self._batches():
+            result = self.apply(paths)
+            logger.info(f"Applied {len(paths)} changed paths: {result}")
+            if on_batch is not None:
+                on_batch(result)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def apply(self, paths: Set[str]) -> Dict[str, Any]:
+        """Apply a batch of changed paths and measure save-to-queryable latency."""
+        saved_at = [path.stat().st_mtime for path in map(Path, paths) if path.is_file()]
+        result: Dict[str, Any] = dict(self.zkb.sync_paths(paths))
+        result["latency"] = time.time() - max(saved_at) if saved_at else None
+        return result
+
+    def _batches(self) -> Iterator[Set[str]]:
+        if self.force_polling:
+            yield from self._poll_batches()
+            return
+        step = max(1, int(self.debounce * 1000))
+        for changes in watchfiles.watch(
+            self.zkb.notes_path,
+            watch_filter=lambda _, path: path.endswith(".md"),
+            debounce=max(1600, step * 4),
+            step=step,
+            stop_event=self.stop_event,
+        ):
+            yield {path for _, path in changes}
+
+    def _poll_batches(self) -> Iterator[Set[str]]:
+        snapshot = self._snapshot()
+        changed: Set[str] = set()
+        last_change = 0.0
+        while not self.stop_event.wait(self.poll_interval):
+            current = self._snapshot()
+            diff = {
+                path
+                for path in snapshot.keys() | current.keys()
+                if snapshot.get(path) != current.get(path)
+            }
+            snapshot = current
+            now = time.monotonic()
+            if diff:
+                changed |= diff
+                last_change = now
+            elif changed and now - last_change >= self.debounce:
+                yield changed
+                changed = set()
+
+    def _snapshot(self) -> Dict[str, tuple]:
+        snapshot = {}
+        for path in self.zkb.notes_path.rglob("*.md"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[str(path.absolute())] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
@@ -1,17 +1,50 @@
+import copy
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from dotenv import load_dotenv
-from qa_store import QuestionAnswerKB
 
-from .db import Database
-from .note import Note
+from .batch import NoteBatch, NoteChange, as_change, coalesce_changes
+from .db import BULK_BATCH_SIZE, Database
+from .graph import BOTH, LinkGraph
+from .hybrid import RRF_K, StageLatencies, reciprocal_rank_fusion
+from .indexer import QA_CHUNK_CHARS, QAIndexer
+from .jobs import DELETE, DONE, INDEX, JobQueue
+from .metrics import METRICS
+from .note import Note, NoteRecord
+from .qa import QABackend
+from .qa_cache import QACache
+from .qa_dedup import QA_DEDUP_SIMILARITY, QARefs
+from .query_cache import TTLCache, normalize_question
 
 load_dotenv()
 
 DATA_DIR = os.getenv("DATA_DIR", "data/")
 DB_DIR = os.getenv("DB_DIR", "db/")
+DB_READ_CONNECTIONS = int(os.getenv("DB_READ_CONNECTIONS", "4"))
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", "64"))
+QA_CONCURRENCY = int(os.getenv("QA_CONCURRENCY", "8"))
+QA_RATE_LIMIT = float(os.getenv("QA_RATE_LIMIT", "0"))
+QA_CACHE_MAX_BYTES = int(os.getenv("QA_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+DEFER_INDEXING = os.getenv("DEFER_INDEXING", "false").lower() in ("1", "true", "yes")
+QA_VECTOR_INDEX = os.getenv("QA_VECTOR_INDEX", "")
+QA_VECTOR_NPROBE = int(os.getenv("QA_VECTOR_NPROBE", "32"))
+QA_VECTOR_RERANK = int(os.getenv("QA_VECTOR_RERANK", "4"))
+QA_VECTOR_MIN_ENTRIES = int(os.getenv("QA_VECTOR_MIN_ENTRIES", "10000"))
+# query_qa_batch embeds this many texts per call, and sends this many
+# questions' embeddings to the collection per query
+EMBED_BATCH_SIZE = 1024
+QUERY_BATCH_SIZE = 256
 
 
 class ZKB:
@@ -19,6 +52,20 @@ class ZKB:
         self,
         data_dir: str = DATA_DIR,
         db_dir: str = DB_DIR,
+        qa_backend: Optional[QABackend] = None,
+        defer_indexing: bool = DEFER_INDEXING,
+        qa_concurrency: int = QA_CONCURRENCY,
+        qa_rate_limit: float = QA_RATE_LIMIT,
+        qa_cache_max_bytes: int = QA_CACHE_MAX_BYTES,
+        qa_chunk_chars: int = QA_CHUNK_CHARS,
+        qa_dedup_similarity: float = QA_DEDUP_SIMILARITY,
+        query_cache_size: int = QUERY_CACHE_SIZE,
+        query_cache_ttl: float = QUERY_CACHE_TTL,
+        db_read_connections: int = DB_READ_CONNECTIONS,
+        qa_vector_index: str = QA_VECTOR_INDEX,
+        qa_vector_nprobe: int = QA_VECTOR_NPROBE,
+        qa_vector_rerank: int = QA_VECTOR_RERANK,
+        qa_vector_min_entries: int = QA_VECTOR_MIN_ENTRIES,
     ) -> None:
         """
         Initialize the ZKB (Zettelkasten Base) object.
@@ -29,6 +76,53 @@ class ZKB:
             Directory for storing notes, by default DATA_DIR
         db_dir : str, optional
             Directory for storing the database, by default DB_DIR
+        qa_backend : Optional[QABackend], optional
+            QA store to use instead of a ``QuestionAnswerKB`` in ``db_dir``,
+            which is created when QA pairs are first indexed or queried, by
+            default None
+        defer_indexing : bool, optional
+            Queue QA (re)index jobs for ``run_index_worker`` instead of
+            indexing inline during scans and CRUD, by default DEFER_INDEXING
+        qa_concurrency : int, optional
+            Maximum number of concurrent QA generation calls, by default
+            QA_CONCURRENCY
+        qa_rate_limit : float, optional
+            Maximum QA generation calls started per second, 0 for no limit,
+            by default QA_RATE_LIMIT
+        qa_cache_max_bytes : int, optional
+            Size bound of the on-disk cache of generated QA pairs, 0 to
+            disable it, by default QA_CACHE_MAX_BYTES
+        qa_chunk_chars : int, optional
+            Maximum characters of note content per QA generation call; longer
+            notes are split into chunks, by default QA_CHUNK_CHARS
+        qa_dedup_similarity : float, optional
+            Minimum similarity of question and answer for a generated QA pair
+            to be stored once and shared with the note already holding it; 1
+            for exact duplicates only, 0 to disable deduplication, by default
+            QA_DEDUP_SIMILARITY
+        query_cache_size : int, optional
+            Maximum number of entries in each level of the in-memory
+            ``query_qa`` cache, 0 to disable it, by default QUERY_CACHE_SIZE
+        query_cache_ttl : float, optional
+            Lifetime in seconds of ``query_qa`` cache entries, by default
+            QUERY_CACHE_TTL
+        db_read_connections : int, optional
+            Number of read-only database connections serving concurrent
+            queries, by default DB_READ_CONNECTIONS
+        qa_vector_index : str, optional
+            Storage of the approximate nearest-neighbour index answering
+            ``query_qa`` in place of the QA store's exact search: ``pq``,
+            ``int8`` or ``float16``, or empty for none. Needs numpy, by
+            default QA_VECTOR_INDEX
+        qa_vector_nprobe : int, optional
+            Index lists scanned per query; more raise recall and latency, by
+            default QA_VECTOR_NPROBE
+        qa_vector_rerank : int, optional
+            Candidates per result re-scored with exact embeddings, 0 to skip
+            re-ranking, by default QA_VECTOR_RERANK
+        qa_vector_min_entries : int, optional
+            Minimum QA store size for the index to be built and used, by
+            default QA_VECTOR_MIN_ENTRIES
         """
         self.data_path = Path(str(data_dir))
         self.notes_path = self.data_path / "notes"
@@ -38,16 +132,105 @@ class ZKB:
         self.db_dir_path.mkdir(parents=True, exist_ok=True)
         self.db_file_path = self.db_dir_path / "zkb.db"
 
-        self.db = Database(str(self.db_file_path))
-        self.qa_kb = QuestionAnswerKB(
-            db_dir=db_dir,
-            collection_name="zkb",
+        self.db = Database(str(self.db_file_path), read_connections=db_read_connections)
+        self.jobs = JobQueue(self.db)
+        self._stage_latencies = StageLatencies()
+        self._graph: Optional[LinkGraph] = None
+        self._graph_data_version = None
+        self.defer_indexing = defer_indexing
+        # The QA store and indexer are created on first use, so commands that
+        # only query notes and links never import the vector store
+        self._qa_kb: Optional[QABackend] = qa_backend
+        self._qa_ready = False
+        # The QA collection behind a vector index, once the QA store is created
+        self._vector_collection: Any = None
+        self._indexer: Optional[QAIndexer] = None
+        self._qa_lock = threading.RLock()
+        self._qa_options = {
+            "concurrency": qa_concurrency,
+            "rate_limit": qa_rate_limit,
+            "chunk_chars": qa_chunk_chars,
+            "dedup_similarity": qa_dedup_similarity,
+        }
+        self._qa_vector_options = {
+            "storage": qa_vector_index,
+            "nprobe": qa_vector_nprobe,
+            "rerank": qa_vector_rerank,
+            "min_entries": qa_vector_min_entries,
+        }
+        self.qa_cache = (
+            QACache(str(self.db_dir_path / "qa_cache.db"), max_bytes=qa_cache_max_bytes)
+            if qa_cache_max_bytes > 0
+            else None
         )
+        self.qa_refs = (
+            QARefs(str(self.db_dir_path / "qa_refs.db"))
+            if qa_dedup_similarity > 0
+            else None
+        )
+        # Level 1: question -> rewordings and their embeddings.
+        # Level 2: (question, n_results, rewordings, QA index version) -> results.
+        self.rewording_cache = TTLCache(query_cache_size, query_cache_ttl)
+        self.query_cache = TTLCache(query_cache_size, query_cache_ttl)
+
+    @property
+    def qa_kb(self) -> QABackend:
+        """
+        The QA store, a ``QuestionAnswerKB`` in ``db_dir`` unless one was
+        given, with its collection behind a vector index if one is configured.
+        """
+        if not self._qa_ready:
+            with self._qa_lock:
+                if not self._qa_ready:
+                    if self._qa_kb is None:
+                        from qa_store import QuestionAnswerKB
+
+                        self._qa_kb = QuestionAnswerKB(
+                            db_dir=str(self.db_dir_path),
+                            collection_name="zkb",
+                        )
+                    if self._qa_vector_options["storage"]:
+                        self._vector_collection = self._indexed_collection(self._qa_kb)
+                        self._qa_kb.collection = self._vector_collection
+                    self._qa_ready = True
+        return self._qa_kb
+
+    def _indexed_collection(self, backend: QABackend) -> Any:
+        try:
+            from .vector_index import IndexedCollection, IVFIndex
+        except ImportError as e:
+            raise ImportError(
+                "qa_vector_index needs numpy; install it with `pip install zkb[ann]`"
+            ) from e
+        options = self._qa_vector_options
+        return IndexedCollection(
+            backend.collection,
+            IVFIndex(options["storage"], nprobe=options["nprobe"]),
+            backend.embedding_function,
+            self._qa_index_version,
+            self.db_dir_path / "qa_index",
+            rerank=options["rerank"],
+            min_entries=options["min_entries"],
+        )
+
+    @property
+    def indexer(self) -> QAIndexer:
+        if self._indexer is None:
+            with self._qa_lock:
+                if self._indexer is None:
+                    self._indexer = QAIndexer(
+                        self.qa_kb,
+                        cache=self.qa_cache,
+                        refs=self.qa_refs,
+                        **self._qa_options,
+                    )
+        return self._indexer
 
     def generate_and_index_qa_pairs(
         self,
         note: Note,
         num_rewordings: int = 3,
+        replace: bool = False,
     ):
         """
         Generate and index question-answer pairs for a given note.
@@ -58,26 +241,86 @@ class ZKB:
             The note to generate QA pairs from
         num_rewordings : int, optional
             Number of rewordings for each question, by default 3
+        replace : bool, optional
+            Whether the note is already indexed; only sections whose content
+            changed are regenerated and entries of removed sections are
+            deleted, by default False
         """
-        qa_pairs = self.qa_kb.generate_qa_pairs(note.content)
-        for pair in qa_pairs:
-            metadata = {
-                "note_filename": note.filename,
-                "note_full_path": str(note.full_path),
-            }
-            self.qa_kb.add_qa(
-                pair["q"],
-                pair["a"],
-                metadata=metadata,
-                num_rewordings=num_rewordings,
-            )
+        self.indexer.index_note(note, num_rewordings=num_rewordings, replace=replace)
 
-    def scan_notes(self) -> None:
-        """Scan all notes and update the database and QA index."""
-        for note_file in self.notes_path.rglob("*.md"):
-            note = Note(note_file)
-            self._update_note_in_db(note)
-            self.generate_and_index_qa_pairs(note)
+    @METRICS.instrument("scan")
+    def scan_notes(
+        self,
+        full: bool = False,
+        workers: int = 1,
+        chunk_size: int = SCAN_CHUNK_SIZE,
+    ) -> Dict[str, int]:
+        """
+        Scan notes and update the database and QA index.
+
+        Only notes that are new or whose content changed since the last scan
+        (according to the manifest of mtime, size and content hash) are
+        re-parsed and re-indexed. Notes that disappeared from disk are purged.
+
+        With ``workers > 1`` notes are hashed and parsed in a process pool and
+        streamed back, in scan order, to this process, which remains the only
+        writer to the database. The resulting database state is identical to
+        a serial scan.
+
+        Parameters
+        ----------
+        full : bool, optional
+            Re-index every note regardless of the manifest, by default False
+        workers : int, optional
+            Number of parser processes, by default 1 (parse in-process)
+        chunk_size : int, optional
+            Number of notes sent to a parser process at a time, by default
+            SCAN_CHUNK_SIZE
+
+        Returns
+        -------
+        Dict[str, int]
+            Counts of added, changed, unchanged and removed notes
+        """
+        counts = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+        if self.db.get_meta("search_index_stale"):
+            self.rebuild_search_index(workers=workers)
+        manifest = self.db.get_manifest()
+        note_files = {
+            str(note_file.absolute()): note_file
+            for note_file in self.notes_path.rglob("*.md")
+        }
+
+        # Purge first, so a note moved to another directory is re-added cleanly
+        for full_path, (filename, *_) in manifest.items():
+            if full_path not in note_files:
+                self._purge_note(filename, full_path)
+                counts["removed"] += 1
+
+        pending = []
+        for full_path, note_file in note_files.items():
+            entry = manifest.get(full_path)
+            stat = note_file.stat()
+            if (
+                not full
+                and entry is not None
+                and entry[1] == stat.st_mtime_ns
+                and entry[2] == stat.st_size
+            ):
+                counts["unchanged"] += 1
+                continue
+            pending.append((full_path, entry, stat))
+
+        jobs = [
+            (full_path, None if full or entry is None else entry[3])
+            for full_path, entry, _ in pending
+        ]
+        loaded = zip(pending, _load_notes(jobs, workers, chunk_size))
+        with self.db.bulk_mode():
+            while batch := list(islice(loaded, BULK_BATCH_SIZE)):
+                self._index_scan_batch(batch, counts)
+
+        return counts
 
     def find_orphaned_notes(self) -> List[str]:
         """
@@ -119,6 +362,104 @@ class ZKB:
         backlinks = self.db.get_backlinks(filename)
         return [backlink[0] for backlink in backlinks]
 
+    @property
+    def graph(self) -> LinkGraph:
+        """
+        The in-memory link graph, loaded on first use.
+
+        Changes made through this ZKB are applied to it incrementally; it is
+        reloaded when another process has written to the database.
+        """
+        data_version = self.db.data_version()
+        if self._graph is None or data_version != self._graph_data_version:
+            self._graph = LinkGraph.from_db(self.db)
+            self._graph_data_version = data_version
+        return self._graph
+
+    def find_neighborhood(
+        self, filename: str, hops: int = 1, direction: str = BOTH
+    ) -> Dict[str, int]:
+        """
+        Find the notes within a number of links of a note.
+
+        Parameters
+        ----------
+        filename : str
+            The filename of the note to start from
+        hops : int, optional
+            Maximum number of links to follow, by default 1
+        direction : str, optional
+            Follow links (``out``), backlinks (``in``) or both, by default both
+
+        Returns
+        -------
+        Dict[str, int]
+            Filenames of the notes found, mapped to their distance in links
+        """
+        return self.graph.neighborhood(filename, hops=hops, direction=direction)
+
+    def find_shortest_path(
+        self, source: str, target: str, directed: bool = False
+    ) -> Optional[List[str]]:
+        """
+        Find a shortest chain of links between two notes.
+
+        Parameters
+        ----------
+        source : str
+            The filename of the note to start from
+        target : str
+            The filename of the note to reach
+        directed : bool, optional
+            Only follow links in their direction, by default False
+
+        Returns
+        -------
+        Optional[List[str]]
+            Filenames along the path, from source to target, or None if the
+            notes are not connected
+        """
+        return self.graph.shortest_path(source, target, directed=directed)
+
+    def find_components(self) -> List[List[str]]:
+        """
+        Find groups of notes connected by links, in either direction.
+
+        Returns
+        -------
+        List[List[str]]
+            Filenames of the notes in each group, largest group first
+        """
+        return self.graph.connected_components()
+
+    def rank_notes(
+        self, top: Optional[int] = None, by: str = "pagerank"
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank notes by their centrality in the link graph.
+
+        Parameters
+        ----------
+        top : Optional[int], optional
+            Number of notes to return, by default None (all)
+        by : str, optional
+            ``pagerank`` or ``in-degree`` (the number of notes linking to
+            the note), by default pagerank
+
+        Returns
+        -------
+        List[Tuple[str, float]]
+            ``(filename, score)`` pairs, most central first
+        """
+        if by == "pagerank":
+            scores = self.graph.pagerank()
+        elif by == "in-degree":
+            scores = self.graph.in_degrees()
+        else:
+            raise ValueError(f"Unknown centrality measure {by!r}")
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:top] if top is not None else ranked
+
     def create_note(
         self,
         filename: str,
@@ -157,7 +498,8 @@ class ZKB:
 
         note = Note(full_path)
         self._update_note_in_db(note)
-        self.generate_and_index_qa_pairs(note)
+        self._reindex_qa(note, replace=False)
+        self._update_manifest(note)
 
         return note
 
@@ -186,6 +528,27 @@ class ZKB:
 
         return Note(full_path)
 
+    def read_note_records(
+        self, filenames: Optional[Iterable[str]] = None
+    ) -> List[NoteRecord]:
+        """
+        Read compact records of indexed notes from the database.
+
+        Parameters
+        ----------
+        filenames : Optional[Iterable[str]], optional
+            Filenames of the notes to read, in the order to return them, by
+            default None (every note)
+
+        Returns
+        -------
+        List[NoteRecord]
+            Records of the notes found; unknown filenames are skipped
+        """
+        return [
+            NoteRecord(*summary) for summary in self.db.iter_note_summaries(filenames)
+        ]
+
     def update_note(
         self,
         filename: str,
@@ -224,8 +587,8 @@ class ZKB:
 
         note = Note(full_path)
         self._update_note_in_db(note)
-        self.qa_kb.collection.delete(where={"note_filename": filename})
-        self.generate_and_index_qa_pairs(note)
+        self._reindex_qa(note, replace=True)
+        self._update_manifest(note)
 
         return note
 
@@ -248,35 +611,310 @@ class ZKB:
             raise FileNotFoundError(f"Note {filename} does not exist")
 
         os.remove(full_path)
-        self.db.delete_note(filename)
-        self.qa_kb.collection.delete(where={"note_filename": filename})
+        self._purge_note(filename, str(full_path.absolute()))
+
+    @contextmanager
+    def batch(self) -> Iterator[NoteBatch]:
+        """
+        Collect note changes and apply them together when the block exits.
+
+        The yielded ``NoteBatch`` records ``create``, ``update`` and
+        ``delete`` calls, which are passed to ``apply_changes`` on a normal
+        exit and discarded if the block raises. The resulting counts are set
+        as the batch's ``counts``.
+
+        Yields
+        ------
+        NoteBatch
+            The batch to record changes in
+
+        Examples
+        --------
+        >>> with zkb.batch() as batch:
+        ...     batch.create("new", "Links to [[old]].")
+        ...     batch.delete("old")
+        """
+        batch = NoteBatch()
+        yield batch
+        batch.counts = self.apply_changes(batch.changes)
+
+    @METRICS.instrument("apply_changes")
+    def apply_changes(
+        self, changes: Iterable[Union[NoteChange, Dict[str, Any], Tuple]]
+    ) -> Dict[str, int]:
+        """
+        Create, update and delete many notes at once.
+
+        Changes to the same note are coalesced first: only its last content
+        is written, and a note created and deleted again is never written.
+        Every change is checked before any file is touched. The files are
+        then written or removed, and the notes, links and search rows of all
+        of them change in one database transaction. Finally the QA index is
+        brought up to date with one batched delete and one batched add, or,
+        when indexing is deferred, a job is queued per note in that same
+        transaction. As in ``scan_notes``, the manifest only records notes
+        whose QA pairs were indexed.
 
-    def search_notes(self, query: str) -> List[Note]:
+        Parameters
+        ----------
+        changes : Iterable[Union[NoteChange, Dict[str, Any], Tuple]]
+            The changes, in order, as ``NoteChange``s or dicts or tuples of
+            their ``action``, ``filename``, ``content`` and ``metadata``
+
+        Returns
+        -------
+        Dict[str, int]
+            Counts of created, updated and deleted notes, and of changes
+            coalesced into later ones
+
+        Raises
+        ------
+        ValueError
+            If a change has an unknown action
+        FileExistsError
+            If a note is created while it exists
+        FileNotFoundError
+            If a note is updated or deleted while it does not exist
+        """
+        changes = [as_change(change) for change in changes]
+        coalesced = coalesce_changes(
+            changes, lambda filename: (self.notes_path / f"{filename}.md").exists()
+        )
+        counts = {
+            "created": 0,
+            "updated": 0,
+            "deleted": 0,
+            "coalesced": len(changes) - len(coalesced),
+        }
+        notes: List[Note] = []
+        replace: List[bool] = []
+        removed: List[Tuple[str, str]] = []
+        for filename, existed, change in coalesced:
+            full_path = self.notes_path / f"{filename}.md"
+            if change is None:
+                os.remove(full_path)
+                removed.append((filename, str(full_path.absolute())))
+                counts["deleted"] += 1
+                continue
+            full_content = self._prepare_note_content(change.content, change.metadata)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(full_content)
+            notes.append(Note(full_path))
+            replace.append(existed)
+            counts["updated" if existed else "created"] += 1
+
+        with self.db.transaction():
+            self.db.bulk_delete_notes(filename for filename, _ in removed)
+            self.db.bulk_delete_manifest_entries(full_path for _, full_path in removed)
+            self.db.bulk_add_or_update_notes(_note_row(note) for note in notes)
+            if self.defer_indexing:
+                for filename, _ in removed:
+                    self.jobs.enqueue(filename, DELETE)
+                for note in notes:
+                    self.jobs.enqueue(note.filename, INDEX)
+        if self._graph is not None:
+            for filename, _ in removed:
+                self._graph.remove_note(filename)
+        for note in notes:
+            self._update_graph(note)
+
+        errors: List[Optional[Exception]] = [None] * len(notes)
+        if not self.defer_indexing and (notes or removed):
+            try:
+                errors = self.indexer.index_batch(
+                    notes, replace, removed=[filename for filename, _ in removed]
+                )
+            finally:
+                self._bump_qa_index_version()
+        self.db.bulk_upsert_manifest_entries(
+            _manifest_entry(note) for note, error in zip(notes, errors) if error is None
+        )
+        return counts
+
+    @METRICS.instrument("search_notes")
+    def search_notes(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        fields: Optional[List[str]] = ("title", "body"),
+        as_records: bool = False,
+    ) -> Union[List[Note], List[NoteRecord]]:
         """
         Search for notes based on a query string.
 
+        Uses the full-text index of note titles, bodies and frontmatter that
+        scans and note CRUD maintain. Terms are matched as whole words and
+        ANDed together; ``"quoted terms"`` match a phrase and ``term*``
+        matches a prefix.
+
         Parameters
         ----------
         query : str
             The search query
+        limit : Optional[int], optional
+            Maximum number of notes to return, by default None (all)
+        offset : int, optional
+            Number of best matches to skip, by default 0
+        fields : Optional[List[str]], optional
+            Fields to match, any of "title", "body" and "frontmatter", or
+            None for all, by default ("title", "body")
+        as_records : bool, optional
+            Return compact NoteRecords read from the database instead of Note
+            objects, e.g. for large result sets, by default False
 
         Returns
         -------
-        List[Note]
-            A list of matching Note objects
+        Union[List[Note], List[NoteRecord]]
+            A list of matching notes, best BM25 match first
+        """
+        hits = self.search(query, limit=limit, offset=offset, fields=fields)
+        if as_records:
+            return self.read_note_records(hit["filename"] for hit in hits)
+        return [
+            Note(Path(hit["full_path"]))
+            for hit in hits
+            if Path(hit["full_path"]).exists()
+        ]
+
+    @METRICS.instrument("search")
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = 10,
+        offset: int = 0,
+        fields: Optional[List[str]] = None,
+        match_any: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the full-text index without reading the matching notes.
+
+        Parameters
+        ----------
+        query : str
+            The search query, with the syntax of ``search_notes``
+        limit : Optional[int], optional
+            Maximum number of hits to return, by default 10
+        offset : int, optional
+            Number of best hits to skip, by default 0
+        fields : Optional[List[str]], optional
+            Fields to match, any of "title", "body" and "frontmatter", or
+            None for all, by default None
+        match_any : bool, optional
+            Match notes containing any term instead of all terms, by
+            default False
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            Hits with filename, full_path, title, a snippet with matches in
+            [brackets], and BM25 score (lower is better)
         """
         if not query:
             return []
-        matching_notes = []
-        for note_file in self.notes_path.rglob("*.md"):
-            note = Note(note_file)
-            if (
-                query.lower() in note.content.lower()
-                or query.lower() in note.metadata.get("title", "").lower()
+        keys = ("filename", "full_path", "title", "snippet", "score")
+        return [
+            dict(zip(keys, row))
+            for row in self.db.search_notes(
+                query, limit=limit, offset=offset, fields=fields, match_any=match_any
+            )
+        ]
+
+    def sync_paths(self, paths: Iterable[Union[str, Path]]) -> Dict[str, int]:
+        """
+        Bring the index in line with the current state of some note files.
+
+        This is the incremental counterpart of ``scan_notes`` for a known set
+        of changed paths, as reported by a filesystem watcher. Paths outside
+        ``notes_path`` or without a ``.md`` suffix are ignored. A note that
+        disappeared from one path and reappeared with the same content at
+        another is treated as a move: its rows and QA pairs are re-keyed
+        instead of being purged and generated again.
+
+        Parameters
+        ----------
+        paths : Iterable[Union[str, Path]]
+            Paths that were created, modified, deleted or renamed
+
+        Returns
+        -------
+        Dict[str, int]
+            Counts of added, changed, unchanged, removed and moved notes
+        """
+        counts = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0, "moved": 0}
+        notes_root = self.notes_path.absolute()
+        manifest = self.db.get_manifest()
+        present: Dict[str, Path] = {}
+        vanished: Dict[str, Tuple[str, int, int, str]] = {}
+        for path in map(Path, paths):
+            path = path.absolute()
+            if path.suffix != ".md" or notes_root not in path.parents:
+                continue
+            if path.is_file():
+                present[str(path)] = path
+            elif str(path) in manifest:
+                vanished[str(path)] = manifest[str(path)]
+        moved_from = {entry[3]: full_path for full_path, entry in vanished.items()}
+
+        for full_path, path in present.items():
+            entry = manifest.get(full_path)
+            stat = path.stat()
+            if entry is not None and (entry[1], entry[2]) == (
+                stat.st_mtime_ns,
+                stat.st_size,
             ):
-                matching_notes.append(note)
-        return matching_notes
+                counts["unchanged"] += 1
+                continue
+            content_hash = _hash_file(path)
+            if entry is not None and entry[3] == content_hash:
+                # Touched but not modified: refresh the stat fields only
+                self.db.upsert_manifest_entry(
+                    full_path, entry[0], stat.st_mtime_ns, stat.st_size, content_hash
+                )
+                counts["unchanged"] += 1
+                continue
+            note = Note(path)
+            old_path = moved_from.pop(content_hash, None) if entry is None else None
+            if old_path is not None:
+                self._move_note(vanished.pop(old_path)[0], old_path, note)
+                counts["moved"] += 1
+                continue
+            self._update_note_in_db(note)
+            self._reindex_qa(note, replace=entry is not None)
+            self._update_manifest(note)
+            counts["added" if entry is None else "changed"] += 1
+
+        for full_path, (filename, *_) in vanished.items():
+            self._purge_note(filename, full_path)
+            counts["removed"] += 1
+        return counts
+
+    def rebuild_search_index(self, workers: int = 1) -> int:
+        """
+        Re-read every indexed note from disk into the full-text index.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of parser processes, by default 1
 
+        Returns
+        -------
+        int
+            Number of notes re-indexed
+        """
+        paths = [row[2] for row in self.db.get_all_notes() if Path(row[2]).exists()]
+        loaded = _load_notes([(path, None) for path in paths], workers, SCAN_CHUNK_SIZE)
+        self.db.update_search_index(
+            (filename, title, body, frontmatter)
+            for filename, _, title, _, body, frontmatter in (
+                _note_row(note) for _, note in loaded
+            )
+        )
+        self.db.set_meta("search_index_stale", None)
+        return len(paths)
+
+    @METRICS.instrument("qa.query")
     def query_qa(
         self,
         question: str,
@@ -299,11 +937,378 @@ class ZKB:
         -------
         List[Dict[str, Any]]
             List of matching QA pairs with metadata
+
+        Notes
+        -----
+        Rewordings and their embeddings are cached per normalized question,
+        and results per question, ``n_results``, ``num_rewordings`` and QA
+        index version. The version changes whenever notes are (re)indexed or
+        removed, so cached results never outlive the index they came from.
         """
-        return self.qa_kb.query(
-            question, n_results=n_results, num_rewordings=num_rewordings
+        return self._query_qa(
+            question, n_results, num_rewordings, self._qa_index_version()
         )
 
+    @METRICS.instrument("qa.query_batch")
+    def query_qa_batch(
+        self,
+        questions: List[str],
+        n_results: int = 5,
+        num_rewordings: int = 3,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Query the QA knowledge base with many questions at once.
+
+        Parameters
+        ----------
+        questions : List[str]
+            The questions to query
+        n_results : int, optional
+            Number of results to return per question, by default 5
+        num_rewordings : int, optional
+            Number of rewordings for each question, by default 3
+
+        Returns
+        -------
+        List[List[Dict[str, Any]]]
+            The results ``query_qa`` returns for each question, in the order
+            of ``questions``
+
+        Notes
+        -----
+        Uses and fills the ``query_qa`` caches, and looks up repeated
+        questions once. The questions missing from them are reworded
+        concurrently, within ``qa_concurrency`` and ``qa_rate_limit``, their
+        rewordings are embedded EMBED_BATCH_SIZE at a time, and the
+        collection is queried with the embeddings of QUERY_BATCH_SIZE
+        questions per call, on one thread per core.
+        """
+        version = self._qa_index_version()
+        keys = [normalize_question(question) for question in questions]
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        missing: Dict[str, str] = {}
+        for key, question in zip(keys, questions):
+            if key in results or key in missing:
+                continue
+            cached = self.query_cache.get((key, n_results, num_rewordings, version))
+            if cached is None:
+                missing[key] = question
+            else:
+                results[key] = cached
+        if missing:
+            results.update(
+                self._query_qa_many(missing, n_results, num_rewordings, version)
+            )
+        return [copy.deepcopy(results[key]) for key in keys]
+
+    def _query_qa_many(
+        self,
+        questions: Dict[str, str],
+        n_results: int,
+        num_rewordings: int,
+        version: str,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """``query_qa_batch`` of questions keyed by their normalized form."""
+        rewordings: Dict[str, Tuple[List[str], List[Any]]] = {}
+        unreworded = []
+        for key in questions:
+            cached = self.rewording_cache.get((key, num_rewordings))
+            if cached is None:
+                unreworded.append(key)
+            else:
+                rewordings[key] = cached
+        if unreworded:
+            question_sets = self.indexer.reword(
+                [questions[key] for key in unreworded], num_rewordings
+            )
+            texts = [text for question_set in question_sets for text in question_set]
+            embeddings: List[Any] = []
+            for start in range(0, len(texts), EMBED_BATCH_SIZE):
+                batch = texts[start : start + EMBED_BATCH_SIZE]
+                with METRICS.timer("embedding", sum(len(text) for text in batch)):
+                    embeddings.extend(self.qa_kb.embedding_function(batch))
+            start = 0
+            for key, question_set in zip(unreworded, question_sets):
+                cached = (question_set, embeddings[start : start + len(question_set)])
+                start += len(question_set)
+                self.rewording_cache.put((key, num_rewordings), cached)
+                rewordings[key] = cached
+
+        keys = list(questions)
+        batches = [
+            keys[start : start + QUERY_BATCH_SIZE]
+            for start in range(0, len(keys), QUERY_BATCH_SIZE)
+        ]
+
+        def query(batch: List[str]) -> List[List[Dict[str, Any]]]:
+            return _query_collection_many(
+                self.qa_kb.collection,
+                [rewordings[key][1] for key in batch],
+                n_results,
+                self.qa_refs,
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=min(len(batches), os.cpu_count() or 1),
+            thread_name_prefix="zkb-query",
+        ) as executor:
+            found = [hits for batch in executor.map(query, batches) for hits in batch]
+        for key, hits in zip(keys, found):
+            self.query_cache.put((key, n_results, num_rewordings, version), hits)
+        return dict(zip(keys, found))
+
+    def query_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Return hit, miss, eviction, expiration and entry counts of both
+        ``query_qa`` cache levels, keyed by ``rewordings`` and ``results``.
+        """
+        return {
+            "rewordings": self.rewording_cache.stats(),
+            "results": self.query_cache.stats(),
+        }
+
+    def clear_query_cache(self) -> None:
+        """Empty both levels of the ``query_qa`` cache."""
+        self.rewording_cache.clear()
+        self.query_cache.clear()
+
+    def process_index_jobs(self, max_jobs: Optional[int] = None) -> int:
+        """
+        Run queued QA index jobs that are due.
+
+        Failed jobs are retried with exponential backoff until they exceed
+        the queue's attempt limit.
+
+        Parameters
+        ----------
+        max_jobs : Optional[int], optional
+            Maximum number of jobs to run, by default None (all due jobs)
+
+        Returns
+        -------
+        int
+            Number of jobs run
+        """
+        processed = 0
+        while max_jobs is None or processed < max_jobs:
+            job = self.jobs.claim()
+            if job is None:
+                break
+            filename, action, generation = job
+            try:
+                self._run_index_job(filename, action)
+            except Exception as e:
+                from loguru import logger
+
+                logger.warning(f"Index job for {filename} failed: {e}")
+                self.jobs.fail(filename, generation, f"{type(e).__name__}: {e}")
+            else:
+                self.jobs.complete(filename, generation)
+            processed += 1
+        return processed
+
+    def run_index_worker(self, poll_interval: float = 1.0, once: bool = False) -> int:
+        """
+        Process the QA index job queue until interrupted.
+
+        Parameters
+        ----------
+        poll_interval : float, optional
+            Seconds to wait between polls of an empty queue, by default 1.0
+        once : bool, optional
+            Return once no job is due instead of polling, by default False
+
+        Returns
+        -------
+        int
+            Number of jobs run
+        """
+        self.jobs.requeue_running()
+        processed = 0
+        while True:
+            count = self.process_index_jobs()
+            processed += count
+            if count == 0:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+
+    @METRICS.instrument("hybrid_query")
+    def hybrid_query(
+        self,
+        question: str,
+        n_results: int = 5,
+        num_rewordings: int = 0,
+        latency_budget: Optional[float] = None,
+        rrf_k: int = RRF_K,
+    ) -> Dict[str, Any]:
+        """
+        Query notes with full-text search and the QA index at once.
+
+        The embedding lookup runs on a worker thread while the full-text
+        search runs on this one. Both rankings are merged with reciprocal
+        rank fusion and deduplicated by note, so each note appears once.
+
+        Parameters
+        ----------
+        question : str
+            The question or search terms
+        n_results : int, optional
+            Number of notes to return, by default 5
+        num_rewordings : int, optional
+            Number of rewordings for the embedding lookup, by default 0
+        latency_budget : Optional[float], optional
+            Seconds the query may take. A stage is skipped up front when its
+            moving-average latency exceeds the budget, and dropped if it is
+            still running when the budget runs out. By default None (wait for
+            both stages)
+        rrf_k : int, optional
+            Rank fusion constant, by default RRF_K
+
+        Returns
+        -------
+        Dict[str, Any]
+            ``results``: notes best first, each with ``note_filename``,
+            ``score``, ``lexical_rank`` and ``semantic_rank`` (None if the
+            stage did not find it) plus the ``title``/``snippet`` and
+            ``question``/``answer`` of its best hit per stage;
+            ``timings``: seconds spent per stage, in fusion and in total;
+            ``skipped``: stages left out because of the latency budget
+        """
+        start = time.perf_counter()
+        candidates = max(n_results * 2, 10)
+        timings: Dict[str, float] = {}
+        skipped: List[str] = []
+
+        def fits_budget(stage: str) -> bool:
+            expected = self._stage_latencies.expected(stage)
+            if latency_budget is not None and expected is not None:
+                if expected > latency_budget:
+                    skipped.append(stage)
+                    return False
+            return True
+
+        version = self._qa_index_version()
+
+        def semantic() -> Tuple[List[Dict[str, Any]], float]:
+            stage_start = time.perf_counter()
+            results = self._query_qa(question, candidates, num_rewordings, version)
+            elapsed = time.perf_counter() - stage_start
+            self._stage_latencies.observe("semantic", elapsed)
+            return results, elapsed
+
+        executor = None
+        semantic_future = None
+        if fits_budget("semantic"):
+            executor = ThreadPoolExecutor(max_workers=1)
+            semantic_future = executor.submit(semantic)
+
+        lexical_hits: List[Dict[str, Any]] = []
+        if fits_budget("lexical"):
+            stage_start = time.perf_counter()
+            lexical_hits = self.search(question, limit=candidates, match_any=True)
+            elapsed = time.perf_counter() - stage_start
+            self._stage_latencies.observe("lexical", elapsed)
+            timings["lexical"] = elapsed
+
+        semantic_hits: List[Dict[str, Any]] = []
+        if semantic_future is not None:
+            remaining = (
+                None
+                if latency_budget is None
+                else max(0.0, latency_budget - (time.perf_counter() - start))
+            )
+            try:
+                semantic_hits, timings["semantic"] = semantic_future.result(
+                    timeout=remaining
+                )
+            except FuturesTimeoutError:
+                # Record the overrun so the next query can skip up front
+                self._stage_latencies.observe("semantic", time.perf_counter() - start)
+                skipped.append("semantic")
+            executor.shutdown(wait=False)
+
+        fusion_start = time.perf_counter()
+        lexical_by_note = {hit["filename"]: hit for hit in lexical_hits}
+        semantic_by_note: Dict[str, Dict[str, Any]] = {}
+        for hit in semantic_hits:
+            # A deduplicated pair counts for every note sharing it
+            filenames = hit["metadata"].get(
+                "note_filenames", [hit["metadata"].get("note_filename")]
+            )
+            for filename in filenames:
+                if filename is not None and filename not in semantic_by_note:
+                    semantic_by_note[filename] = hit
+        rankings = {
+            "lexical": list(lexical_by_note),
+            "semantic": list(semantic_by_note),
+        }
+        results = []
+        for filename, score in reciprocal_rank_fusion(rankings, k=rrf_k)[:n_results]:
+            result = {"note_filename": filename, "score": score}
+            for stage, ranking in rankings.items():
+                result[f"{stage}_rank"] = (
+                    ranking.index(filename) + 1 if filename in ranking else None
+                )
+            if filename in lexical_by_note:
+                result["title"] = lexical_by_note[filename]["title"]
+                result["snippet"] = lexical_by_note[filename]["snippet"]
+            if filename in semantic_by_note:
+                result["question"] = semantic_by_note[filename]["question"]
+                result["answer"] = semantic_by_note[filename]["answer"]
+            results.append(result)
+        timings["fusion"] = time.perf_counter() - fusion_start
+        timings["total"] = time.perf_counter() - start
+
+        return {"results": results, "timings": timings, "skipped": skipped}
+
+    def _qa_index_version(self) -> str:
+        return self.db.get_meta("qa_index_version") or "0"
+
+    def _bump_qa_index_version(self) -> None:
+        """
+        Invalidate cached ``query_qa`` results after the QA index changed, and
+        save the vector index, if any, as matching the new version.
+        """
+        vectors = self._vector_collection
+        if vectors is None:
+            self.db.increment_meta("qa_index_version")
+        else:
+            with vectors.lock:
+                self.db.increment_meta("qa_index_version")
+                vectors.commit()
+        self.query_cache.clear()
+
+    def _query_qa(
+        self, question: str, n_results: int, num_rewordings: int, version: str
+    ) -> List[Dict[str, Any]]:
+        """
+        ``query_qa`` against a given QA index version.
+
+        Callers read the version once and pass it in, so that one request
+        reads and fills a single cache generation even if notes are reindexed
+        while it runs, as ``_query_qa_many`` does for all the questions of a
+        ``query_qa_batch``.
+        """
+        normalized = normalize_question(question)
+        results_key = (normalized, n_results, num_rewordings, version)
+        results = self.query_cache.get(results_key)
+        if results is None:
+            rewordings_key = (normalized, num_rewordings)
+            cached = self.rewording_cache.get(rewordings_key)
+            if cached is None:
+                with METRICS.timer("llm.generate_rewordings"):
+                    questions = self.qa_kb.generate_rewordings(question, num_rewordings)
+                with METRICS.timer("embedding", sum(len(q) for q in questions)):
+                    cached = (questions, self.qa_kb.embedding_function(questions))
+                self.rewording_cache.put(rewordings_key, cached)
+            results = _query_collection(
+                self.qa_kb.collection, cached[1], n_results, self.qa_refs
+            )
+            self.query_cache.put(results_key, results)
+        # Callers get their own copy so they cannot alter cached results
+        return copy.deepcopy(results)
+
     def _prepare_note_content(
         self, content: str, metadata: Optional[Dict] = None
     ) -> str:
@@ -315,15 +1320,325 @@ class ZKB:
         yaml_metadata += "---\n\n"
         return yaml_metadata + content
 
+    def _index_scan_batch(
+        self,
+        batch: List[Tuple[Tuple[str, Any, os.stat_result], Tuple[str, Optional[Note]]]],
+        counts: Dict[str, int],
+    ) -> None:
+        """
+        Write a batch of scanned notes to the database and QA index.
+
+        Notes and links go in with one bulk transaction up front, then the
+        batch's QA pairs are generated concurrently. Manifest entries are only
+        recorded for notes whose QA pairs were indexed, so an interrupted or
+        failed scan re-indexes the unfinished notes next time.
+        """
+        scanned = [
+            (full_path, entry, note)
+            for (full_path, entry, _), (_, note) in batch
+            if note is not None
+        ]
+        self.db.bulk_add_or_update_notes(_note_row(note) for *_, note in scanned)
+        for *_, note in scanned:
+            self._update_graph(note)
+        errors = self._reindex_qa_many(
+            [note for *_, note in scanned],
+            replace=[entry is not None for _, entry, _ in scanned],
+        )
+        failed = {
+            full_path
+            for (full_path, _, _), error in zip(scanned, errors)
+            if error is not None
+        }
+
+        manifest_entries = []
+        for (full_path, entry, stat), (content_hash, note) in batch:
+            if note is None:
+                # Touched but not modified: refresh the stat fields only
+                filename = entry[0]
+                counts["unchanged"] += 1
+            else:
+                filename = note.filename
+                counts["added" if entry is None else "changed"] += 1
+                if full_path in failed:
+                    continue
+            manifest_entries.append(
+                (full_path, filename, stat.st_mtime_ns, stat.st_size, content_hash)
+            )
+        self.db.bulk_upsert_manifest_entries(manifest_entries)
+
     def _update_note_in_db(self, note: Note) -> None:
         """Update note information in the database."""
-        links = [
-            (link["filename"], link.get("display_text", link["filename"]))
-            for link in note.links
+        self.db.add_or_update_note_links(*_note_row(note))
+        self._update_graph(note)
+
+    def _delete_note_from_db(self, filename: str) -> None:
+        self.db.delete_note(filename)
+        if self._graph is not None:
+            self._graph.remove_note(filename)
+
+    def _update_graph(self, note: Note) -> None:
+        """Apply a note's links to the link graph, if it has been loaded."""
+        if self._graph is not None:
+            self._graph.update_note(
+                note.filename, (link["filename"] for link in note.links)
+            )
+
+    def _update_manifest(self, note: Note) -> None:
+        """Record the current on-disk state of a note in the scan manifest."""
+        self.db.upsert_manifest_entry(*_manifest_entry(note))
+
+    def _move_note(self, old_filename: str, old_full_path: str, note: Note) -> None:
+        """Re-key a note that moved on disk without regenerating its QA pairs."""
+        self._delete_note_from_db(old_filename)
+        self.db.delete_manifest_entry(old_full_path)
+        self._update_note_in_db(note)
+        self._update_manifest(note)
+        status = self.jobs.get_status(old_filename)
+        if status is not None and status["status"] != DONE:
+            # Its QA pairs are still being (re)built under the old name
+            self.jobs.enqueue(note.filename, INDEX)
+            return
+        self._move_qa(old_filename, note)
+
+    def _move_qa(self, old_filename: str, note: Note) -> None:
+        """Move a note's QA pairs, with their embeddings, to its new name and path."""
+        collection = self.qa_kb.collection
+        if self.qa_refs is not None:
+            self.qa_refs.move(old_filename, note.filename, str(note.full_path))
+        existing = collection.get(
+            where={"note_filename": old_filename},
+            include=["documents", "metadatas", "embeddings"],
+        )
+        if len(existing["ids"]) == 0:
+            self._bump_qa_index_version()
+            return
+        old_prefix = f"qa_{old_filename}_"
+        ids = [
+            f"qa_{note.filename}_{id_[len(old_prefix) :]}"
+            if id_.startswith(old_prefix)
+            else id_
+            for id_ in existing["ids"]
         ]
-        self.db.add_or_update_note_links(
-            note.filename,
-            str(note.full_path),
-            note.metadata.get("title", note.filename),
-            links,
+        metadatas = [
+            {
+                **metadata,
+                "note_filename": note.filename,
+                "note_full_path": str(note.full_path),
+            }
+            for metadata in existing["metadatas"]
+        ]
+        collection.delete(where={"note_filename": old_filename})
+        collection.add(
+            ids=ids,
+            documents=existing["documents"],
+            metadatas=metadatas,
+            embeddings=existing["embeddings"],
         )
+        self._bump_qa_index_version()
+
+    def _purge_note(self, filename: str, full_path: str) -> None:
+        """Remove a note from the database, the manifest and the QA index."""
+        self._delete_note_from_db(filename)
+        self.db.delete_manifest_entry(full_path)
+        self._remove_qa(filename)
+
+    def _reindex_qa(self, note: Note, replace: bool) -> None:
+        """Index a note's QA pairs now, or queue it when indexing is deferred."""
+        if self.defer_indexing:
+            self.jobs.enqueue(note.filename, INDEX)
+            return
+        try:
+            self.generate_and_index_qa_pairs(note, replace=replace)
+        finally:
+            self._bump_qa_index_version()
+
+    def _reindex_qa_many(
+        self, notes: List[Note], replace: List[bool]
+    ) -> List[Optional[Exception]]:
+        """Like ``_reindex_qa`` for many notes, indexing them concurrently."""
+        if self.defer_indexing:
+            for note in notes:
+                self.jobs.enqueue(note.filename, INDEX)
+            return [None] * len(notes)
+        try:
+            return self.indexer.index_notes(notes, replace=replace)
+        finally:
+            self._bump_qa_index_version()
+
+    def _remove_qa(self, filename: str) -> None:
+        """Remove a note's QA pairs now, or queue it when indexing is deferred."""
+        if self.defer_indexing:
+            self.jobs.enqueue(filename, DELETE)
+            return
+        try:
+            self.indexer.remove_note(filename)
+        finally:
+            self._bump_qa_index_version()
+
+    def _run_index_job(self, filename: str, action: str) -> None:
+        """Bring the QA index of a note in line with its current state."""
+        try:
+            row = self.db.get_note_by_filename(filename)
+            if action != INDEX or row is None or not Path(row[2]).exists():
+                self.indexer.remove_note(filename)
+                return
+            self.generate_and_index_qa_pairs(Note(Path(row[2])), replace=True)
+        finally:
+            self._bump_qa_index_version()
+
+
+def _query_collection(
+    collection: Any,
+    embeddings: List[Any],
+    n_results: int,
+    refs: Optional[QARefs] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Query a QA collection with precomputed question embeddings.
+
+    Mirrors ``QuestionAnswerKB.query``: hits are deduplicated by answer and
+    the ``n_results`` most similar are returned. All embeddings go to the
+    collection in a single query. With ``refs``, each result's metadata also
+    lists in ``note_filenames`` every note sharing the pair, owner first.
+    """
+    return _query_collection_many(collection, [embeddings], n_results, refs)[0]
+
+
+def _query_collection_many(
+    collection: Any,
+    embedding_sets: List[List[Any]],
+    n_results: int,
+    refs: Optional[QARefs] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    ``_query_collection`` for several questions, each with its own set of
+    embeddings, in a single query of the collection and of ``refs``.
+    """
+    with METRICS.timer("vector.query"):
+        results = collection.query(
+            query_embeddings=[
+                embedding for embeddings in embedding_sets for embedding in embeddings
+            ],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+    hits = zip(results["documents"], results["metadatas"], results["distances"])
+    found = []
+    for embeddings in embedding_sets:
+        seen_answers = set()
+        unique_results = []
+        for documents, metadatas, distances in islice(hits, len(embeddings)):
+            for document, metadata, distance in zip(documents, metadatas, distances):
+                if metadata["answer"] in seen_answers:
+                    continue
+                seen_answers.add(metadata["answer"])
+                unique_results.append(
+                    {
+                        "question": document,
+                        "answer": metadata["answer"],
+                        "metadata": {
+                            k: v for k, v in metadata.items() if k != "answer"
+                        },
+                        "similarity": 1 - distance,
+                    }
+                )
+        found.append(
+            sorted(unique_results, key=lambda r: r["similarity"], reverse=True)[
+                :n_results
+            ]
+        )
+    if refs is not None:
+        referrers = refs.referrers(
+            r["metadata"]["pair_hash"]
+            for unique_results in found
+            for r in unique_results
+            if r["metadata"].get("pair_hash")
+        )
+        for result in (r for unique_results in found for r in unique_results):
+            owner = result["metadata"].get("note_filename")
+            shared = referrers.get(result["metadata"].get("pair_hash"), [])
+            result["metadata"]["note_filenames"] = [owner] + [
+                filename for filename in shared if filename != owner
+            ]
+    return found
+
+
+def _hash_file(file_path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_entry(note: Note) -> Tuple[str, str, int, int, str]:
+    """The manifest entry recording the current on-disk state of a note."""
+    stat = note.full_path.stat()
+    return (
+        str(note.full_path),
+        note.filename,
+        stat.st_mtime_ns,
+        stat.st_size,
+        _hash_file(note.full_path),
+    )
+
+
+def _note_row(note: Note) -> Tuple[str, str, str, List[Tuple[str, str]], str, str]:
+    """
+    Return the ``(filename, full_path, title, links, body, frontmatter)``
+    database row of a note.
+    """
+    links = [
+        (link["filename"], link.get("display_text", link["filename"]))
+        for link in note.links
+    ]
+    return (
+        note.filename,
+        str(note.full_path),
+        note.metadata.get("title", note.filename),
+        links,
+        note.content,
+        _frontmatter_text(note.metadata),
+    )
+
+
+def _frontmatter_text(metadata: Dict[str, Any]) -> str:
+    """Flatten note metadata into ``key: value`` lines for full-text search."""
+    lines = []
+    for key, value in metadata.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        lines.append(f"{key}: " + ", ".join(str(v) for v in values))
+    return "\n".join(lines)
+
+
+def _load_note(job: Tuple[str, Optional[str]]) -> Tuple[str, Optional[Note]]:
+    """
+    Hash and parse a note file.
+
+    The note is only parsed when its hash differs from ``known_hash``;
+    otherwise ``None`` is returned in its place. Runs in parser processes
+    during parallel scans, so it must stay a picklable module-level function.
+    """
+    full_path, known_hash = job
+    content_hash = _hash_file(Path(full_path))
+    if content_hash == known_hash:
+        return content_hash, None
+    # Parse here, in the worker, rather than lazily in the writer process
+    return content_hash, Note(Path(full_path)).parse()
+
+
+def _load_notes(
+    jobs: List[Tuple[str, Optional[str]]],
+    workers: int,
+    chunk_size: int,
+) -> Iterator[Tuple[str, Optional[Note]]]:
+    """Yield ``_load_note`` results in job order, in-process or from a pool."""
+    if workers <= 1 or len(jobs) <= 1:
+        yield from map(_load_note, jobs)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_load_note, jobs, chunksize=max(1, chunk_size))
@@ -0,0 +1,22 @@
+import shutil
+
+import pytest
+from zkb import ZKB
+from zkb.bench.fake_qa import FakeQuestionAnswerKB
+
+
+@pytest.fixture
+def fake_qa() -> FakeQuestionAnswerKB:
+    return FakeQuestionAnswerKB()
+
+
+@pytest.fixture
+def offline_zkb(tmp_path, fake_qa) -> ZKB:
+    """A ZKB over a copy of the test notes, backed by the offline fake QA store."""
+    test_data_path = tmp_path / "test_data"
+    shutil.copytree("tests/data", test_data_path)
+    return ZKB(
+        data_dir=str(test_data_path),
+        db_dir=str(tmp_path / "test_db"),
+        qa_backend=fake_qa,
+    )
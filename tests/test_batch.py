@@ -0,0 +1,119 @@
+import pytest
+from zkb import ZKB
+from zkb.batch import CREATE, DELETE, UPDATE, NoteChange
+from zkb.bench.fake_qa import FakeQuestionAnswerKB
+
+
+def _answers(zkb: ZKB, filename: str) -> set:
+    rows = zkb.qa_kb.collection.get(where={"note_filename": filename})
+    return {metadata["answer"] for metadata in rows["metadatas"]}
+
+
+def test_apply_changes_writes_everything_in_one_batch(offline_zkb, fake_qa) -> None:
+    offline_zkb.scan_notes()
+    fake_qa.collection.add_calls = fake_qa.collection.delete_calls = 0
+
+    counts = offline_zkb.apply_changes(
+        [
+            NoteChange(CREATE, "first", "The first note links to [[second]]."),
+            {"action": CREATE, "filename": "second", "content": "A second note."},
+            (UPDATE, "another_note", "Rewritten from scratch."),
+            (DELETE, "example_note"),
+        ]
+    )
+
+    assert counts == {"created": 2, "updated": 1, "deleted": 1, "coalesced": 0}
+    assert fake_qa.collection.add_calls == 1
+    assert fake_qa.collection.delete_calls == 1
+    assert offline_zkb.find_backlinks("second") == ["first"]
+    assert not (offline_zkb.notes_path / "example_note.md").exists()
+    assert _answers(offline_zkb, "example_note") == set()
+    assert _answers(offline_zkb, "another_note") == {"Rewritten from scratch."}
+    assert [r.filename for r in offline_zkb.read_note_records()] == [
+        "another_note",
+        "first",
+        "second",
+    ]
+    # The manifest is in sync: a rescan finds nothing to do
+    assert offline_zkb.scan_notes()["unchanged"] == 3
+
+
+def test_changes_to_one_note_are_coalesced(offline_zkb, fake_qa) -> None:
+    counts = offline_zkb.apply_changes(
+        [
+            (CREATE, "draft", "First draft."),
+            (UPDATE, "draft", "Final draft."),
+            (CREATE, "scratch", "Thrown away."),
+            (DELETE, "scratch"),
+        ]
+    )
+
+    assert counts == {"created": 1, "updated": 0, "deleted": 0, "coalesced": 3}
+    assert fake_qa.generate_calls == 1
+    assert _answers(offline_zkb, "draft") == {"Final draft."}
+    assert not (offline_zkb.notes_path / "scratch.md").exists()
+
+
+def test_invalid_changes_apply_nothing(offline_zkb) -> None:
+    with pytest.raises(FileNotFoundError):
+        offline_zkb.apply_changes(
+            [(CREATE, "new", "Never written."), (DELETE, "missing")]
+        )
+    with pytest.raises(FileExistsError):
+        offline_zkb.apply_changes([(CREATE, "example_note", "Already there.")])
+    with pytest.raises(ValueError):
+        offline_zkb.apply_changes([("rename", "example_note")])
+
+    assert not (offline_zkb.notes_path / "new.md").exists()
+
+
+def test_batch_applies_on_exit_only(offline_zkb) -> None:
+    with offline_zkb.batch() as batch:
+        batch.create("kept", "Created in a batch.")
+        assert not (offline_zkb.notes_path / "kept.md").exists()
+    assert batch.counts["created"] == 1
+    assert offline_zkb.read_note("kept").content.strip() == "Created in a batch."
+
+    with pytest.raises(RuntimeError):
+        with offline_zkb.batch() as batch:
+            batch.delete("kept")
+            raise RuntimeError("abort")
+    assert (offline_zkb.notes_path / "kept.md").exists()
+
+
+def test_deferred_batch_enqueues_in_the_same_transaction(offline_zkb) -> None:
+    offline_zkb.scan_notes()
+    offline_zkb.defer_indexing = True
+
+    offline_zkb.apply_changes(
+        [(CREATE, "later", "Indexed by the worker."), (DELETE, "example_note")]
+    )
+
+    assert offline_zkb.qa_kb.collection.get(where={"note_filename": "later"})[
+        "ids"
+    ] == []
+    assert offline_zkb.jobs.counts()["pending"] == 2
+    assert offline_zkb.process_index_jobs() == 2
+    assert _answers(offline_zkb, "later") == {"Indexed by the worker."}
+    assert _answers(offline_zkb, "example_note") == set()
+
+
+def test_batched_deletes_match_a_rescan(offline_zkb, tmp_path) -> None:
+    offline_zkb.scan_notes()
+    offline_zkb.apply_changes(
+        [(CREATE, "linker", "Points at [[another_note]]."), (DELETE, "another_note")]
+    )
+
+    fresh = ZKB(
+        data_dir=str(offline_zkb.data_path),
+        db_dir=str(tmp_path / "fresh_db"),
+        qa_backend=FakeQuestionAnswerKB(),
+    )
+    fresh.scan_notes()
+    broken = sorted(offline_zkb.find_broken_links())
+    assert ("example_note", "another_note") in broken
+    assert ("linker", "another_note") in broken
+    assert broken == sorted(fresh.find_broken_links())
+    assert offline_zkb.find_backlinks("another_note") == fresh.find_backlinks(
+        "another_note"
+    )
@@ -0,0 +1,37 @@
+import json
+
+from zkb.bench import generate_vault, run_benchmarks
+
+
+def test_generate_vault_is_deterministic(tmp_path) -> None:
+    first = generate_vault(tmp_path / "a", num_notes=20, broken_link_ratio=0.5)
+    second = generate_vault(tmp_path / "b", num_notes=20, broken_link_ratio=0.5)
+
+    assert first == second
+    assert first["notes"] == 20 and first["links"] == 100
+    assert 0 < first["broken_links"] < first["links"]
+    for path in (tmp_path / "a").iterdir():
+        assert path.read_text() == (tmp_path / "b" / path.name).read_text()
+
+
+def test_run_benchmarks_reports_every_operation(tmp_path) -> None:
+    report = run_benchmarks(notes=30, samples=3, work_dir=str(tmp_path))
+
+    json.dumps(report)
+    assert report["vault"]["notes"] == 30
+    assert {
+        "scan",
+        "rescan_unchanged",
+        "rescan_incremental",
+        "find_orphaned_notes",
+        "find_broken_links",
+        "find_backlinks",
+        "search_notes",
+        "create_note",
+        "read_note",
+        "update_note",
+        "delete_note",
+        "query_qa",
+    } <= set(report["results"])
+    assert report["results"]["find_backlinks"]["runs"] == 3
+    assert all(result["min_ms"] >= 0 for result in report["results"].values())
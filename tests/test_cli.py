@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+from zkb import cli
+from zkb.bench.fake_qa import FakeQuestionAnswerKB
+from zkb.zkb import ZKB
+
+
+def _run(monkeypatch, capsys, tmp_path, *argv) -> str:
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "zkb",
+            "--data-dir",
+            str(tmp_path),
+            "--db-path",
+            str(tmp_path / "db" / "zkb.db"),
+        ]
+        + list(argv),
+    )
+    cli.main()
+    return capsys.readouterr().out
+
+
+def test_cli_uses_the_database_directory(tmp_path, monkeypatch, capsys) -> None:
+    zkb = ZKB(
+        data_dir=str(tmp_path),
+        db_dir=str(tmp_path / "db"),
+        qa_backend=FakeQuestionAnswerKB(),
+    )
+    zkb.create_note("first", "See [[second]].")
+    zkb.create_note("second", "Nothing here.")
+
+    out = _run(monkeypatch, capsys, tmp_path, "find-backlinks", "second")
+
+    assert out.splitlines() == ["Backlinks to second:", "first"]
+
+
+def test_graph_commands_do_not_load_the_qa_store(tmp_path) -> None:
+    code = f"""
+import sys
+from zkb import cli
+sys.argv = ["zkb", "--data-dir", {str(tmp_path)!r},
+            "--db-path", {str(tmp_path / "db" / "zkb.db")!r}, "find-orphans"]
+cli.main()
+print(sorted(name for name in ("qa_store", "chromadb", "numpy") if name in sys.modules))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.splitlines()[-1] == "[]"
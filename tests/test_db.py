@@ -0,0 +1,227 @@
+import sqlite3
+import statistics
+import threading
+import time
+
+from zkb.db import (
+    BACKLINKS_SQL,
+    BROKEN_LINKS_SQL,
+    ORPHANED_NOTES_SQL,
+    SCHEMA_VERSION,
+    Database,
+)
+
+
+def _rows(count: int) -> list:
+    return [
+        (
+            f"note_{i}",
+            f"/notes/note_{i}.md",
+            f"Note {i}",
+            [(f"note_{(i + 1) % count}", "next"), ("missing", "missing")],
+        )
+        for i in range(count)
+    ]
+
+
+def _dump(db: Database) -> tuple:
+    return (
+        db.get_all_notes(),
+        db.conn.execute("SELECT * FROM links ORDER BY rowid").fetchall(),
+    )
+
+
+def test_bulk_ingest_matches_per_note_writes(tmp_path) -> None:
+    serial = Database(str(tmp_path / "serial.db"))
+    bulk = Database(str(tmp_path / "bulk.db"))
+    rows = _rows(25)
+
+    for row in rows:
+        serial.add_or_update_note_links(*row)
+    with bulk.bulk_mode():
+        written = bulk.bulk_add_or_update_notes(iter(rows), batch_size=7)
+
+    assert written == 25
+    assert _dump(bulk) == _dump(serial)
+
+
+def test_bulk_ingest_replaces_existing_links(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"))
+    db.bulk_add_or_update_notes(_rows(3))
+    db.bulk_add_or_update_notes([("note_0", "/notes/note_0.md", "Renamed", [])])
+
+    assert db.get_note_by_filename("note_0")[3] == "Renamed"
+    assert db.get_backlinks("note_1") == []
+
+
+def test_nested_transactions_commit_or_roll_back_together(tmp_path) -> None:
+    db = Database(str(tmp_path / "nested.db"))
+    db.bulk_add_or_update_notes(_rows(3))
+
+    try:
+        with db.transaction():
+            db.bulk_delete_notes(["note_0", "note_1"])
+            db.bulk_add_or_update_notes([("note_3", "/notes/note_3.md", "Note 3", [])])
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert [row[1] for row in db.get_all_notes()] == ["note_0", "note_1", "note_2"]
+
+    with db.transaction():
+        db.bulk_delete_notes(["note_0", "note_1"])
+    assert [row[1] for row in db.get_all_notes()] == ["note_2"]
+    # The deleted notes' links go; links to them stay, now broken
+    assert db.get_backlinks("note_2") == []
+    assert ("note_2", "note_0") in db.get_broken_links()
+
+
+def test_bulk_mode_restores_pragmas(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"))
+    before = db.conn.execute("PRAGMA synchronous").fetchone()
+
+    with db.bulk_mode():
+        assert db.conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert db.conn.execute("PRAGMA synchronous").fetchone() == (1,)
+
+    assert db.conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert db.conn.execute("PRAGMA synchronous").fetchone() == before
+
+
+def test_bulk_mode_uses_wal_without_read_connections(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"), read_connections=0)
+    assert db.conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+
+    with db.bulk_mode():
+        assert db.conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        db.bulk_add_or_update_notes(_rows(3))
+
+    assert db.conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    assert len(db.get_all_notes()) == 3
+
+
+def test_graph_queries_use_link_indexes(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"))
+    db.bulk_add_or_update_notes(_rows(50))
+
+    backlinks_plan = db.explain_query_plan(BACKLINKS_SQL, ("note_1",))
+    orphans_plan = db.explain_query_plan(ORPHANED_NOTES_SQL)
+    broken_plan = db.explain_query_plan(BROKEN_LINKS_SQL)
+
+    assert any("idx_links_to_note (to_note=?)" in line for line in backlinks_plan)
+    assert any("idx_links_to_note (to_note=?)" in line for line in orphans_plan)
+    assert any("(filename=?)" in line for line in broken_plan)
+    assert not any(line.startswith("SCAN links") for line in backlinks_plan)
+
+
+def test_duplicate_links_are_stored_once(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"))
+    db.add_or_update_note_links(
+        "a", "/notes/a.md", "A", [("b", "b"), ("b", "again"), ("c", "c")]
+    )
+
+    assert db.get_backlinks("b") == [("a",)]
+    assert db.get_broken_links() == [("a", "b"), ("a", "c")]
+
+
+def test_migration_upgrades_legacy_database(tmp_path) -> None:
+    db_file = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_file)
+    conn.execute(
+        "CREATE TABLE notes (id INTEGER PRIMARY KEY, filename TEXT UNIQUE, "
+        "full_path TEXT UNIQUE, title TEXT)"
+    )
+    conn.execute("CREATE TABLE links (from_note TEXT, to_note TEXT, display_text TEXT)")
+    conn.executemany(
+        "INSERT INTO links VALUES (?, ?, ?)",
+        [("a", "b", "b"), ("a", "b", "b"), ("c", "b", "b")],
+    )
+    conn.commit()
+    conn.close()
+
+    db = Database(str(db_file))
+
+    assert db.schema_version() == SCHEMA_VERSION
+    assert db.get_backlinks("b") == [("a",), ("c",)]
+
+
+def test_reads_do_not_wait_for_an_open_write(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"))
+    db.bulk_add_or_update_notes(_rows(3))
+    writing, release = threading.Event(), threading.Event()
+
+    def write() -> None:
+        with db.transaction() as conn:
+            conn.execute("DELETE FROM links")
+            writing.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    writing.wait(5)
+    try:
+        # The uncommitted delete is invisible to readers, which don't block
+        assert db.get_backlinks("note_1") == [("note_0",)]
+        assert len(db.get_broken_links()) == 3
+    finally:
+        release.set()
+        writer.join()
+
+    assert db.get_backlinks("note_1") == []
+
+
+def test_nested_reads_reuse_the_thread_reader(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"), read_connections=1)
+    db.bulk_add_or_update_notes(_rows(5))
+
+    backlinks = {
+        to_note: db.get_backlinks(to_note) for _, to_note in db.iter_links()
+    }
+
+    assert backlinks["note_0"] == [("note_4",)]
+    assert len(backlinks["missing"]) == 5
+
+
+def test_concurrent_reads_under_write_load(tmp_path) -> None:
+    db = Database(str(tmp_path / "zkb.db"), read_connections=3)
+    rows = _rows(200)
+    db.bulk_add_or_update_notes(rows)
+    done = threading.Event()
+    errors: list = []
+    latencies: list = []
+
+    def write() -> None:
+        try:
+            for _ in range(3):
+                with db.bulk_mode():
+                    db.bulk_add_or_update_notes(rows, batch_size=50)
+                for row in rows[:50]:
+                    db.add_or_update_note_links(*row)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def read(worker: int) -> None:
+        i = worker
+        try:
+            while not done.is_set():
+                start = time.perf_counter()
+                assert db.get_backlinks(f"note_{i % 200}")
+                assert len(db.get_orphaned_notes()) == 0
+                db.search_notes("note")
+                latencies.append(time.perf_counter() - start)
+                i += 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write)] + [
+        threading.Thread(target=read, args=(worker,)) for worker in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert latencies
+    assert statistics.median(latencies) < 1.0
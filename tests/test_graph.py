@@ -0,0 +1,166 @@
+import random
+
+import pytest
+import zkb.graph
+from zkb.graph import LinkGraph
+
+
+@pytest.fixture
+def graph() -> LinkGraph:
+    #  a -> b -> c -> d    e -> f    g    (a -> missing is broken)
+    return LinkGraph(
+        notes="abcdefg",
+        links=[("a", "b"), ("b", "c"), ("c", "d"), ("e", "f"), ("a", "missing")],
+    )
+
+
+def _snapshot(graph: LinkGraph) -> dict:
+    return {
+        note: (sorted(graph.links(note)), sorted(graph.backlinks(note)))
+        for note in graph.notes
+    }
+
+
+def test_neighborhood(graph) -> None:
+    assert graph.neighborhood("b") == {"a": 1, "c": 1}
+    assert graph.neighborhood("a", hops=2, direction="out") == {"b": 1, "c": 2}
+    assert graph.neighborhood("d", hops=5, direction="in") == {
+        "c": 1,
+        "b": 2,
+        "a": 3,
+    }
+    assert graph.neighborhood("missing") == {}
+    with pytest.raises(ValueError):
+        graph.neighborhood("a", direction="sideways")
+
+
+def test_shortest_path(graph) -> None:
+    assert graph.shortest_path("a", "d") == ["a", "b", "c", "d"]
+    assert graph.shortest_path("d", "a") == ["d", "c", "b", "a"]
+    assert graph.shortest_path("d", "a", directed=True) is None
+    assert graph.shortest_path("a", "e") is None
+    assert graph.shortest_path("a", "missing") is None
+
+
+def test_components_and_centrality(graph) -> None:
+    assert graph.connected_components() == [["a", "b", "c", "d"], ["e", "f"], ["g"]]
+
+    ranks = graph.pagerank()
+    assert sum(ranks.values()) == pytest.approx(1.0)
+    assert ranks["d"] > ranks["c"] > ranks["b"] > ranks["a"]
+    assert graph.in_degrees()["b"] == 1 and graph.in_degrees()["a"] == 0
+
+
+def test_incremental_updates_match_rebuild(graph) -> None:
+    graph.compact_threshold = 2
+    graph.update_note("g", ["a", "e"])
+    graph.update_note("a", ["c"])
+    assert graph.connected_components() == [["a", "b", "c", "d", "e", "f", "g"]]
+    graph.remove_note("c")
+    graph.update_note("h", ["b", "b"])
+
+    rebuilt = LinkGraph(
+        notes="abdefgh",
+        links=[("a", "c"), ("b", "c"), ("e", "f"), ("g", "a"), ("g", "e"), ("h", "b")],
+    )
+    rebuilt.remove_note("c")
+    assert _snapshot(graph) == _snapshot(rebuilt)
+    assert graph.pagerank() == pytest.approx(rebuilt.pagerank())
+    # Links to a removed note stay, as broken links
+    assert "c" not in graph and graph.backlinks("c") == ["a", "b"]
+    assert graph.neighborhood("b") == {"h": 1}
+
+
+def test_random_updates_match_rebuild() -> None:
+    rng = random.Random(0)
+    names = [f"n{i}" for i in range(50)]
+    links = {name: set(rng.sample(names, 3)) for name in names}
+    graph = LinkGraph(
+        names, [(s, t) for s, targets in links.items() for t in targets], 8
+    )
+    for _ in range(200):
+        name = rng.choice(names)
+        if rng.random() < 0.1:
+            graph.remove_note(name)
+            links.pop(name, None)
+        else:
+            links[name] = set(rng.sample(names, rng.randrange(5)))
+            graph.update_note(name, links[name])
+
+    rebuilt = LinkGraph(
+        links, [(s, t) for s, targets in links.items() for t in targets]
+    )
+    assert _snapshot(graph) == _snapshot(rebuilt)
+    assert graph.connected_components() == rebuilt.connected_components()
+
+    for _ in range(50):
+        source, target = rng.sample(sorted(links), 2)
+        path = graph.shortest_path(source, target, directed=True)
+        expected = _bfs_distance(links, source, target)
+        assert (path is None) == (expected is None)
+        if path is not None:
+            assert len(path) - 1 == expected
+            assert all(b in links[a] for a, b in zip(path, path[1:]))
+
+
+def _bfs_distance(links: dict, source: str, target: str):
+    distances = {source: 0}
+    frontier = [source]
+    while frontier and target not in distances:
+        next_frontier = []
+        for node in frontier:
+            for neighbor in links.get(node, ()):
+                if neighbor in links and neighbor not in distances:
+                    distances[neighbor] = distances[node] + 1
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return distances.get(target)
+
+
+def test_without_numpy(graph, monkeypatch) -> None:
+    expected = graph.pagerank()
+    monkeypatch.setattr(zkb.graph, "np", None)
+    pure = LinkGraph(
+        notes="abcdefg",
+        links=[("a", "b"), ("b", "c"), ("c", "d"), ("e", "f"), ("a", "missing")],
+    )
+
+    assert _snapshot(pure) == _snapshot(graph)
+    assert pure.pagerank() == pytest.approx(expected)
+
+
+def test_zkb_graph_tracks_changes(offline_zkb) -> None:
+    offline_zkb.scan_notes()
+    graph = offline_zkb.graph
+    assert offline_zkb.find_shortest_path("example_note", "another_note") == [
+        "example_note",
+        "another_note",
+    ]
+
+    offline_zkb.create_note("hub", "See [[example_note]] and [[another_note]].")
+    assert offline_zkb.graph is graph
+    assert offline_zkb.find_neighborhood("hub") == {
+        "example_note": 1,
+        "another_note": 1,
+    }
+    assert offline_zkb.rank_notes(top=1, by="in-degree")[0][1] == 2
+
+    offline_zkb.delete_note("hub")
+    assert "hub" not in offline_zkb.graph
+    assert offline_zkb.find_components() == [["another_note", "example_note"]]
+
+
+def test_zkb_graph_reloads_after_external_writes(offline_zkb, fake_qa) -> None:
+    from zkb import ZKB
+
+    offline_zkb.scan_notes()
+    graph = offline_zkb.graph
+    other = ZKB(
+        data_dir=str(offline_zkb.data_path),
+        db_dir=str(offline_zkb.db_dir_path),
+        qa_backend=fake_qa,
+    )
+    other.create_note("outsider", "Links to [[example_note]].")
+
+    assert offline_zkb.graph is not graph
+    assert "outsider" in offline_zkb.find_neighborhood("example_note")
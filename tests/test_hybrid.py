@@ -0,0 +1,56 @@
+import pytest
+from zkb.hybrid import StageLatencies, reciprocal_rank_fusion
+
+
+@pytest.fixture
+def indexed_zkb(offline_zkb):
+    offline_zkb.scan_notes()
+    offline_zkb.create_note("gardening", "Tomatoes need plenty of sun. Water daily.")
+    return offline_zkb
+
+
+def test_reciprocal_rank_fusion() -> None:
+    fused = reciprocal_rank_fusion({"a": ["x", "y"], "b": ["y", "z"]}, k=60)
+
+    assert [key for key, _ in fused] == ["y", "x", "z"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_stage_latencies_ewma() -> None:
+    latencies = StageLatencies(alpha=0.5)
+    assert latencies.expected("semantic") is None
+
+    latencies.observe("semantic", 1.0)
+    latencies.observe("semantic", 3.0)
+
+    assert latencies.expected("semantic") == pytest.approx(2.0)
+
+
+def test_hybrid_query_fuses_both_stages(indexed_zkb) -> None:
+    response = indexed_zkb.hybrid_query("Tomatoes need plenty of sun?")
+
+    results = response["results"]
+    filenames = [r["note_filename"] for r in results]
+    assert filenames[0] == "gardening"
+    assert len(filenames) == len(set(filenames))
+    assert results[0]["lexical_rank"] == 1
+    assert results[0]["semantic_rank"] is not None
+    assert "answer" in results[0] and "snippet" in results[0]
+    assert response["skipped"] == []
+    assert {"lexical", "semantic", "fusion", "total"} <= set(response["timings"])
+
+
+def test_hybrid_query_respects_latency_budget(indexed_zkb, fake_qa) -> None:
+    fake_qa.collection.query_latency = 0.5
+
+    response = indexed_zkb.hybrid_query("Tomatoes", latency_budget=0.05)
+
+    assert response["skipped"] == ["semantic"]
+    assert response["timings"]["total"] < 0.4
+    assert response["results"][0]["note_filename"] == "gardening"
+    assert response["results"][0]["semantic_rank"] is None
+
+    # The overrun is remembered, so the next query skips without waiting
+    response = indexed_zkb.hybrid_query("Tomatoes", latency_budget=0.05)
+    assert response["skipped"] == ["semantic"]
+    assert "semantic" not in response["timings"]
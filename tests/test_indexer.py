@@ -0,0 +1,128 @@
+import time
+
+from zkb.indexer import QAIndexer, TokenBucket
+from zkb.note import Note
+
+
+def _write_notes(notes_path, count: int) -> list:
+    notes = []
+    for i in range(count):
+        path = notes_path / f"concurrent_{i}.md"
+        path.write_text(f"Note {i} has one fact. It also has another.")
+        notes.append(Note(path))
+    return notes
+
+
+def test_index_notes_runs_llm_calls_concurrently(offline_zkb, fake_qa) -> None:
+    fake_qa.latency = 0.05
+    notes = _write_notes(offline_zkb.notes_path, 8)
+    indexer = QAIndexer(fake_qa, concurrency=8)
+
+    start = time.perf_counter()
+    errors = indexer.index_notes(notes, num_rewordings=3)
+    elapsed = time.perf_counter() - start
+
+    # Serially: 8 notes x (1 generation + 2 rewordings) x 50ms = 1.2s
+    assert errors == [None] * 8
+    assert elapsed < 0.6
+    assert fake_qa.collection.count() == 8 * 2 * 4
+    assert fake_qa.collection.add_calls == 8
+
+
+def test_concurrency_limit_bounds_in_flight_calls(offline_zkb, fake_qa) -> None:
+    fake_qa.latency = 0.01
+    notes = _write_notes(offline_zkb.notes_path, 6)
+
+    QAIndexer(fake_qa, concurrency=2).index_notes(notes, num_rewordings=2)
+
+    assert fake_qa.max_in_flight == 2
+
+
+def test_index_notes_isolates_failures(offline_zkb, fake_qa) -> None:
+    fake_qa.fail_times = 1
+    notes = _write_notes(offline_zkb.notes_path, 3)
+
+    errors = QAIndexer(fake_qa, concurrency=1).index_notes(notes)
+
+    assert isinstance(errors[0], RuntimeError)
+    assert errors[1:] == [None, None]
+
+
+def test_token_bucket_limits_rate() -> None:
+    bucket = TokenBucket(rate=50, capacity=1)
+
+    start = time.perf_counter()
+    for _ in range(11):
+        bucket.acquire()
+
+    assert time.perf_counter() - start >= 0.18
+
+
+def test_scan_retries_notes_whose_indexing_failed(offline_zkb, fake_qa) -> None:
+    fake_qa.fail_times = 1
+
+    assert offline_zkb.scan_notes()["added"] == 2
+    assert offline_zkb.scan_notes() == {
+        "added": 1,
+        "changed": 0,
+        "unchanged": 1,
+        "removed": 0,
+    }
+
+
+def test_large_notes_are_generated_in_chunks(offline_zkb, fake_qa) -> None:
+    path = offline_zkb.notes_path / "large.md"
+    paragraphs = [f"Paragraph {i} states a fact." for i in range(40)]
+    path.write_text("---\ntitle: Large\n---\n" + "\n\n".join(paragraphs))
+
+    indexed = QAIndexer(fake_qa, chunk_chars=200).index_note(
+        Note(path), num_rewordings=0
+    )
+
+    assert fake_qa.generate_calls > 1
+    assert indexed == 40
+    rows = fake_qa.collection.get(where={"note_filename": "large"})
+    assert len(set(rows["ids"])) == 40
+    assert {m["answer"] for m in rows["metadatas"]} == set(paragraphs)
+
+
+def test_reindex_regenerates_only_changed_sections(offline_zkb, fake_qa) -> None:
+    path = offline_zkb.notes_path / "sections.md"
+    sections = [f"# Part {i}\n\nPart {i} states a fact." for i in range(5)]
+    path.write_text("---\ntitle: Sections\n---\n" + "\n\n".join(sections))
+    indexer = QAIndexer(fake_qa)
+    indexer.index_note(Note(path), num_rewordings=0)
+    before = fake_qa.collection.get(where={"note_filename": "sections"})
+    assert {m["section"] for m in before["metadatas"]} == {f"Part {i}" for i in range(5)}
+
+    sections[2] = "# Part 2\n\nPart 2 states a different fact."
+    path.write_text("---\ntitle: Edited\n---\n" + "\n\n".join(sections))
+    fake_qa.generate_calls = 0
+    indexer.index_note(Note(path), num_rewordings=0, replace=True)
+
+    assert fake_qa.generate_calls == 1
+    after = fake_qa.collection.get(where={"note_filename": "sections"})
+    assert len(after["ids"]) == 5
+    assert len(set(before["ids"]) & set(after["ids"])) == 4
+    assert any("different fact" in m["answer"] for m in after["metadatas"])
+
+    fake_qa.generate_calls = 0
+    path.write_text("---\ntitle: Retitled\n---\n" + "\n\n".join(sections))
+    assert indexer.index_note(Note(path), num_rewordings=0, replace=True) == 0
+    assert fake_qa.generate_calls == 0
+
+
+def test_reindex_replaces_entries_without_section_ids(offline_zkb, fake_qa) -> None:
+    path = offline_zkb.notes_path / "legacy.md"
+    path.write_text("# Heading\n\nA fact.")
+    fake_qa.collection.add(
+        ids=["qa_legacy_0_0"],
+        documents=["Old question?"],
+        metadatas=[{"note_filename": "legacy", "answer": "Old answer."}],
+    )
+
+    QAIndexer(fake_qa).index_note(Note(path), num_rewordings=0, replace=True)
+
+    rows = fake_qa.collection.get(where={"note_filename": "legacy"})
+    assert "qa_legacy_0_0" not in rows["ids"]
+    assert all(m["section_id"] for m in rows["metadatas"])
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from zkb import ZKB
+
+
+def _questions_for(zkb: ZKB, filename: str) -> list:
+    return zkb.qa_kb.collection.get(where={"note_filename": filename})["documents"]
+
+
+def test_deferred_crud_only_enqueues(offline_zkb) -> None:
+    offline_zkb.defer_indexing = True
+
+    offline_zkb.create_note("queued", "Queued notes are indexed later.")
+
+    assert offline_zkb.qa_kb.generate_calls == 0
+    assert offline_zkb.jobs.get_status("queued")["status"] == "pending"
+    assert offline_zkb.run_index_worker(once=True) == 1
+    assert offline_zkb.jobs.get_status("queued")["status"] == "done"
+    assert _questions_for(offline_zkb, "queued")
+
+
+def test_jobs_for_the_same_note_coalesce(offline_zkb) -> None:
+    offline_zkb.defer_indexing = True
+    offline_zkb.create_note("busy", "First draft.")
+    offline_zkb.update_note("busy", "Second draft.")
+    offline_zkb.update_note("busy", "Final draft.")
+
+    assert offline_zkb.jobs.counts()["pending"] == 1
+    assert offline_zkb.process_index_jobs() == 1
+    assert offline_zkb.qa_kb.generate_calls == 1
+    assert [a["answer"] for a in offline_zkb.qa_kb.collection.get()["metadatas"]] == [
+        "Final draft."
+    ] * 4
+
+
+def test_status_queries_do_not_wait_for_writes(offline_zkb) -> None:
+    offline_zkb.defer_indexing = True
+    offline_zkb.create_note("queued", "Queued notes are indexed later.")
+
+    with ThreadPoolExecutor(1) as pool, offline_zkb.db.transaction():
+        counts = pool.submit(offline_zkb.jobs.counts).result(timeout=5)
+        status = pool.submit(offline_zkb.jobs.get_status, "queued").result(timeout=5)
+
+    assert counts["pending"] == 1
+    assert status["status"] == "pending"
+
+
+def test_deferred_delete_removes_qa_pairs(offline_zkb) -> None:
+    offline_zkb.create_note("doomed", "This note will be deleted.")
+    offline_zkb.defer_indexing = True
+
+    offline_zkb.delete_note("doomed")
+    assert _questions_for(offline_zkb, "doomed")
+
+    offline_zkb.process_index_jobs()
+    assert _questions_for(offline_zkb, "doomed") == []
+
+
+def test_failed_jobs_retry_with_backoff(offline_zkb) -> None:
+    offline_zkb.defer_indexing = True
+    offline_zkb.jobs.backoff_seconds = 0
+    offline_zkb.jobs.max_attempts = 3
+    offline_zkb.qa_kb.fail_times = 2
+    offline_zkb.create_note("flaky", "The backend fails twice.")
+
+    offline_zkb.process_index_jobs(max_jobs=1)
+    status = offline_zkb.jobs.get_status("flaky")
+    assert status["status"] == "pending"
+    assert status["attempts"] == 1
+    assert "QA backend unavailable" in status["last_error"]
+
+    offline_zkb.process_index_jobs()
+    assert offline_zkb.jobs.get_status("flaky")["status"] == "done"
+
+
+def test_jobs_fail_after_max_attempts(offline_zkb) -> None:
+    offline_zkb.defer_indexing = True
+    offline_zkb.jobs.backoff_seconds = 0
+    offline_zkb.jobs.max_attempts = 2
+    offline_zkb.qa_kb.fail_times = 5
+    offline_zkb.create_note("broken", "The backend never recovers.")
+
+    offline_zkb.process_index_jobs()
+
+    assert offline_zkb.jobs.get_status("broken")["status"] == "failed"
+    assert offline_zkb.jobs.counts()["failed"] == 1
+
+
+def test_backoff_delays_retries(offline_zkb) -> None:
+    offline_zkb.defer_indexing = True
+    offline_zkb.qa_kb.fail_times = 1
+    offline_zkb.create_note("later", "Retried after a delay.")
+
+    assert offline_zkb.process_index_jobs() == 1
+    assert offline_zkb.process_index_jobs() == 0
+    assert offline_zkb.jobs.get_status("later")["run_after"] > 0
@@ -0,0 +1,136 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from zkb import metrics
+from zkb.metrics import LATENCY_BUCKETS, Metrics
+
+
+def test_histogram_counts_bytes_and_buckets() -> None:
+    registry = Metrics(enabled=True)
+    for seconds in (0.00002, 0.0003, 0.0004, 2.0, 100.0):
+        registry.observe("op", seconds, nbytes=10)
+
+    histogram = registry.histogram("op")
+    assert histogram.count == 5 and histogram.bytes == 50
+    assert sum(histogram.buckets) == 5 and histogram.buckets[-1] == 1
+    assert histogram.quantile(0.5) == 0.0005
+    assert histogram.quantile(1.0) == LATENCY_BUCKETS[-1]
+
+
+def test_instrument_times_calls_and_generators() -> None:
+    registry = Metrics(enabled=True)
+
+    @registry.instrument("call")
+    def call(x):
+        return x * 2
+
+    @registry.instrument("generate")
+    def generate(n):
+        yield from range(n)
+
+    assert call(2) == 4
+    assert list(generate(3)) == [0, 1, 2]
+    assert registry.snapshot()["call"]["count"] == 1
+    assert registry.snapshot()["generate"]["count"] == 1
+
+
+def test_disabled_registry_records_nothing() -> None:
+    registry = Metrics(enabled=False)
+    with registry.timer("op"):
+        pass
+
+    assert registry.snapshot() == {}
+
+
+def test_prometheus_and_json_exports() -> None:
+    registry = Metrics(enabled=True)
+    registry.observe("db.get_meta", 0.002, nbytes=7)
+
+    text = registry.to_prometheus()
+    assert '# TYPE zkb_operation_seconds histogram' in text
+    assert 'zkb_operation_seconds_bucket{operation="db.get_meta",le="0.005"} 1' in text
+    assert 'zkb_operation_seconds_bucket{operation="db.get_meta",le="+Inf"} 1' in text
+    assert 'zkb_operation_bytes_total{operation="db.get_meta"} 7' in text
+    assert json.loads(registry.to_json())["operations"]["db.get_meta"]["count"] == 1
+
+
+def test_text_report_survives_a_concurrent_reset(monkeypatch) -> None:
+    registry = Metrics(enabled=True)
+    registry.observe("scan", 0.5)
+    snapshot = registry.snapshot
+
+    def snapshot_then_reset():
+        # As a server saving with reset=True right after the snapshot
+        data = snapshot()
+        registry.reset()
+        return data
+
+    monkeypatch.setattr(registry, "snapshot", snapshot_then_reset)
+
+    assert registry.to_text().splitlines()[1].split()[:2] == ["scan", "1"]
+
+
+def test_save_adds_to_saved_metrics(tmp_path) -> None:
+    path = tmp_path / "metrics.json"
+    for _ in range(2):
+        registry = Metrics(enabled=True)
+        registry.observe("scan", 0.5)
+        registry.save(path)
+
+    assert Metrics.load(path).snapshot()["scan"]["count"] == 2
+    assert Metrics.load(tmp_path / "missing.json").snapshot() == {}
+
+
+def test_concurrent_saves_keep_every_count(tmp_path) -> None:
+    path = tmp_path / "metrics.json"
+
+    def save(_):
+        # Each save opens the lock file anew, as another process would
+        registry = Metrics(enabled=True)
+        registry.observe("scan", 0.5)
+        registry.save(path)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(save, range(64)))
+
+    assert Metrics.load(path).snapshot()["scan"]["count"] == 64
+
+
+def test_save_with_reset_only_adds_new_counts(tmp_path) -> None:
+    path = tmp_path / "metrics.json"
+    registry = Metrics(enabled=True)
+    registry.observe("scan", 0.5)
+    registry.save(path, reset=True)
+    registry.observe("scan", 0.5)
+    registry.save(path, reset=True)
+
+    assert registry.snapshot() == {}
+    assert Metrics.load(path, reset=True).snapshot()["scan"]["count"] == 2
+    assert not path.exists()
+
+
+def test_zkb_operations_are_instrumented(offline_zkb, monkeypatch) -> None:
+    monkeypatch.setattr(metrics.METRICS, "enabled", True)
+    metrics.reset()
+
+    offline_zkb.scan_notes()
+    offline_zkb.search_notes("example")
+    offline_zkb.query_qa("What is an example note?", num_rewordings=0)
+    offline_zkb.apply_changes([("create", "batched", "Indexed in a batch.")])
+
+    recorded = metrics.snapshot()
+    for name in (
+        "scan",
+        "note.read",
+        "note.parse_frontmatter",
+        "db.bulk_add_or_update_notes",
+        "qa.index",
+        "qa.index_batch",
+        "llm.generate_qa_pairs",
+        "search_notes",
+        "qa.query",
+        "embedding",
+        "vector.query",
+    ):
+        assert recorded[name]["count"] >= 1, name
+    assert recorded["note.read"]["bytes"] > 0
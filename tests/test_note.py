@@ -0,0 +1,166 @@
+import pickle
+import sys
+
+import pytest
+import zkb.note
+from zkb.note import Note, NoteRecord
+
+
+def _write(tmp_path, text: str, name: str = "note") -> Note:
+    path = tmp_path / f"{name}.md"
+    path.write_text(text, encoding="utf-8")
+    return Note(path)
+
+
+def test_frontmatter_content_and_links(tmp_path) -> None:
+    note = _write(
+        tmp_path,
+        "---\ntitle: Test\ntags: [a, b]\n---\n\nSee [[other#Intro|the intro]] and [[x]].\n",
+    )
+
+    assert note.metadata == {"title": "Test", "tags": ["a", "b"]}
+    assert note.content == "See [[other#Intro|the intro]] and [[x]]."
+    assert note.links == [
+        {"filename": "other", "heading": "Intro", "display_text": "the intro"},
+        {"filename": "x", "heading": None, "display_text": "x"},
+    ]
+
+
+def test_closing_delimiter_must_be_its_own_line(tmp_path) -> None:
+    note = _write(tmp_path, "---\ntitle: a --- b\nrule: '---'\n---\nBody\n")
+
+    assert note.metadata == {"title": "a --- b", "rule": "---"}
+    assert note.content == "Body"
+
+
+def test_no_or_unterminated_frontmatter(tmp_path) -> None:
+    assert _write(tmp_path, "Just text\n", "plain").metadata == {}
+    assert _write(tmp_path, "Just text\n", "plain").content == "Just text\n"
+
+    note = _write(tmp_path, "---\ntitle: open\nBody", "open")
+    assert note.metadata == {}
+    assert note.content == "---\ntitle: open\nBody"
+
+    # A thematic break is not frontmatter
+    note = _write(tmp_path, "----\nNot yaml\n---\n", "rule")
+    assert note.metadata == {} and note.content.startswith("----")
+
+
+def test_invalid_or_non_mapping_yaml(tmp_path) -> None:
+    assert _write(tmp_path, "---\n: [\n---\nBody", "bad").metadata == {}
+    assert _write(tmp_path, "---\n- a list\n---\nBody", "list").metadata == {}
+
+
+def test_fields_are_parsed_lazily(tmp_path) -> None:
+    missing = Note(tmp_path / "missing.md")
+    assert missing.filename == "missing"
+
+    note = _write(tmp_path, "---\ntitle: Before\n---\nBody [[a]]")
+    assert "metadata" not in vars(note)
+    assert note.content == "Body [[a]]"
+    assert "metadata" not in vars(note) and "links" not in vars(note)
+    (tmp_path / "note.md").write_text("changed")
+    assert note.metadata == {"title": "Before"}
+
+
+def test_parsed_note_pickles_without_raw_text(tmp_path) -> None:
+    note = _write(tmp_path, "---\ntitle: T\n---\nBody [[a]]").parse()
+    (tmp_path / "note.md").unlink()
+
+    copy = pickle.loads(pickle.dumps(note))
+
+    assert "_parts" not in vars(copy)
+    assert (copy.metadata, copy.content, copy.links) == (
+        note.metadata,
+        note.content,
+        note.links,
+    )
+
+
+def test_note_record_is_compact(tmp_path) -> None:
+    note = _write(tmp_path, "---\ntitle: T\n---\nSee [[a]] and [[b|B]].")
+    record = NoteRecord.from_note(note)
+
+    assert not hasattr(record, "__dict__")
+    assert record.links == ("a", "b")
+    assert record.title == "T"
+    assert record.filename is sys.intern("note")
+    assert record.links[0] is NoteRecord("x", "/x.md", "x", ["a"]).links[0]
+    assert record.full_path == str(note.full_path)
+    assert NoteRecord("x", "/d/X.markdown", "x").full_path == "/d/X.markdown"
+
+
+def test_note_record_reads_content_on_demand(tmp_path) -> None:
+    record = NoteRecord.from_note(_write(tmp_path, "Before"))
+
+    (tmp_path / "note.md").write_text("After [[c]]")
+
+    assert record.content == "After [[c]]"
+    assert record.load().links[0]["filename"] == "c"
+
+
+SAMPLES = {
+    "frontmatter": "---\ntitle: T\n---\n\n  Body [[a#h|A]] and [[b]]\n\n",
+    "crlf": "---\r\ntitle: T\r\n---\r\nLine one\r\nLine [[c]] two\r\n",
+    "unicode": "---\ntitle: Ünïcode\n---\nCafé [[naïve|é]] ✓",
+    "plain": "  No frontmatter [[d]]  \n",
+    "unterminated": "---\ntitle: open\nBody [[e]]",
+}
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_memory_mapped_notes_parse_the_same(tmp_path, monkeypatch, name) -> None:
+    path = tmp_path / f"{name}.md"
+    path.write_bytes(SAMPLES[name].encode("utf-8"))
+    expected = Note(path)
+    monkeypatch.setattr(zkb.note, "MMAP_THRESHOLD", 0)
+
+    mapped = Note(path)
+
+    assert mapped.links == expected.links  # from the mapping, before content
+    assert mapped.metadata == expected.metadata
+    assert mapped.content == expected.content
+
+
+def test_iter_chunks(tmp_path, monkeypatch) -> None:
+    paragraphs = [f"Paragraph {i} " + "word " * (i % 7) for i in range(50)]
+    body = "\n\n".join(p.strip() for p in paragraphs)
+    note = _write(tmp_path, "---\ntitle: T\n---\n" + body)
+
+    chunks = list(note.iter_chunks(120))
+
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert "\n\n".join(chunks) == body
+    assert list(note.iter_chunks(10_000)) == [note.content]
+
+    monkeypatch.setattr(zkb.note, "MMAP_THRESHOLD", 0)
+    assert list(Note(note.file_path).iter_chunks(120)) == chunks
+
+
+def test_iter_chunks_never_splits_characters(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(zkb.note, "MMAP_THRESHOLD", 0)
+    note = _write(tmp_path, "é" * 100 + "✓" * 100)
+
+    chunks = list(note.iter_chunks(31))
+
+    assert all(len(chunk.encode()) <= 31 for chunk in chunks)
+    assert "".join(chunks) == "é" * 100 + "✓" * 100
+
+
+def test_iter_sections(tmp_path, monkeypatch) -> None:
+    body = (
+        "Intro [[a]].\n\n# First\nOne.\n```\n# not a heading\n```\n\n"
+        "## Second ##\nTwo.\n\n#nospace\n\n### Third\n" + "Three. " * 30
+    )
+    note = _write(tmp_path, "---\ntitle: T\n---\n" + body)
+
+    sections = list(note.iter_sections(100))
+
+    assert [heading for heading, _ in sections[:3]] == [None, "First", "Second"]
+    assert sections[1][1] == "# First\nOne.\n```\n# not a heading\n```"
+    assert sections[2][1] == "## Second ##\nTwo.\n\n#nospace"
+    assert {heading for heading, _ in sections[3:]} == {"Third"}
+    assert all(len(text) <= 100 for _, text in sections)
+
+    monkeypatch.setattr(zkb.note, "MMAP_THRESHOLD", 0)
+    assert list(Note(note.file_path).iter_sections(100)) == sections
@@ -0,0 +1,101 @@
+import json
+
+from zkb.qa_cache import QACache
+
+PAIRS = [{"q": "Why?", "a": "Because.", "questions": ["Why?", "How come?"]}]
+
+
+def test_cache_hits_and_misses(tmp_path) -> None:
+    cache = QACache(str(tmp_path / "cache.db"), max_bytes=1 << 20)
+    key = QACache.key("body", num_rewordings=1, model="m")
+
+    assert cache.get(key) is None
+    cache.put(key, PAIRS)
+
+    assert cache.get(key) == PAIRS
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_key_covers_body_and_parameters() -> None:
+    key = QACache.key("body", num_rewordings=1, model="m")
+
+    assert key == QACache.key("body", model="m", num_rewordings=1)
+    assert key != QACache.key("body!", num_rewordings=1, model="m")
+    assert key != QACache.key("body", num_rewordings=2, model="m")
+    assert key != QACache.key("body", num_rewordings=1, model="other")
+
+
+def test_cache_evicts_least_recently_used(tmp_path) -> None:
+    value = [{"q": "x" * 60, "a": "y", "questions": []}]
+    cache = QACache(str(tmp_path / "cache.db"), max_bytes=2 * len(json.dumps(value)))
+    cache.put("a", value)
+    cache.put("b", value)
+    cache.get("a")
+
+    cache.put("c", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_cache_shared_by_instances_stays_within_its_bound(tmp_path) -> None:
+    value = [{"q": "x" * 60, "a": "y", "questions": []}]
+    max_bytes = 3 * len(json.dumps(value))
+    first = QACache(str(tmp_path / "cache.db"), max_bytes=max_bytes)
+    second = QACache(str(tmp_path / "cache.db"), max_bytes=max_bytes)
+
+    for i in range(4):
+        first.put(f"first_{i}", value)
+        second.put(f"second_{i}", value)
+
+    assert first.stats()["bytes"] <= max_bytes
+    assert first.stats()["entries"] == 3
+    assert first.evictions + second.evictions == 5
+
+
+def test_cache_hits_buffer_their_last_use(tmp_path) -> None:
+    cache = QACache(str(tmp_path / "cache.db"), max_bytes=1 << 20)
+    cache.put("k", PAIRS)
+    saved = cache.conn.execute("SELECT last_used FROM qa_cache").fetchone()
+
+    cache.get("k")
+    assert cache.conn.execute("SELECT last_used FROM qa_cache").fetchone() == saved
+
+    cache.put("other", PAIRS)
+    assert cache.conn.execute(
+        "SELECT last_used FROM qa_cache WHERE key = 'k'"
+    ).fetchone() > saved
+
+
+def test_cache_persists_across_instances(tmp_path) -> None:
+    QACache(str(tmp_path / "cache.db"), max_bytes=1 << 20).put("k", PAIRS)
+
+    cache = QACache(str(tmp_path / "cache.db"), max_bytes=1 << 20)
+
+    assert cache.get("k") == PAIRS
+    assert cache.stats()["entries"] == 1
+
+
+def test_frontmatter_only_update_reuses_generated_pairs(offline_zkb, fake_qa) -> None:
+    offline_zkb.create_note("cached", "Paris is in France.", {"title": "Before"})
+    calls = fake_qa.generate_calls
+
+    offline_zkb.update_note("cached", "Paris is in France.", {"title": "After"})
+
+    assert fake_qa.generate_calls == calls
+    # The unchanged section keeps its entries, so the cache is not consulted
+    assert offline_zkb.qa_cache.stats()["hits"] == 0
+    assert offline_zkb.query_qa("Where is Paris?")[0]["answer"] == "Paris is in France."
+
+
+def test_full_rescan_reuses_generated_pairs(offline_zkb, fake_qa) -> None:
+    offline_zkb.scan_notes()
+    calls = fake_qa.generate_calls
+
+    offline_zkb.scan_notes(full=True)
+
+    assert fake_qa.generate_calls == calls
+    assert offline_zkb.qa_cache.stats()["hits"] == 0
@@ -0,0 +1,114 @@
+from zkb import ZKB
+from zkb.bench.fake_qa import FakeCollection
+from zkb.qa_dedup import pair_hash
+
+QUESTION = "What does the note say about Paris is in France?"
+
+
+def _rows(fake_qa, filename: str) -> dict:
+    return fake_qa.collection.get(where={"note_filename": filename})
+
+
+def test_pair_hash_ignores_case_punctuation_and_spacing() -> None:
+    assert pair_hash("What is  it?", "It is Paris.") == pair_hash(
+        "what is it", "it is paris!"
+    )
+    assert pair_hash("What is it?", "Paris") != pair_hash("What is it?", "Rome")
+
+
+def test_duplicate_pairs_are_stored_once(offline_zkb, fake_qa) -> None:
+    offline_zkb.create_note("first", "Paris is in France.")
+    stored = fake_qa.collection.count()
+
+    offline_zkb.create_note("second", "Paris is in France!")
+
+    assert fake_qa.collection.count() == stored
+    assert len(_rows(fake_qa, "second")["ids"]) == 0
+    result = offline_zkb.query_qa(QUESTION, num_rewordings=0)[0]
+    assert result["metadata"]["note_filenames"] == ["first", "second"]
+    hits = offline_zkb.hybrid_query(QUESTION)["results"]
+    assert {"first", "second"} <= {hit["note_filename"] for hit in hits}
+
+
+def test_deleting_the_owner_hands_shared_pairs_over(offline_zkb, fake_qa) -> None:
+    offline_zkb.create_note("first", "Paris is in France.")
+    offline_zkb.create_note("second", "Paris is in France.")
+    owned = set(_rows(fake_qa, "first")["documents"])
+
+    offline_zkb.delete_note("first")
+
+    assert set(_rows(fake_qa, "second")["documents"]) == owned
+    assert offline_zkb.qa_refs.stats()["refs"] == 0
+    result = offline_zkb.query_qa(QUESTION, num_rewordings=0)[0]
+    assert result["metadata"]["note_filenames"] == ["second"]
+
+
+def test_editing_a_referencing_note_drops_its_references(offline_zkb, fake_qa) -> None:
+    offline_zkb.create_note("first", "Paris is in France.")
+    offline_zkb.create_note("second", "Paris is in France.")
+
+    offline_zkb.update_note("second", "Rome is in Italy.")
+
+    assert offline_zkb.qa_refs.stats()["refs"] == 0
+    result = offline_zkb.query_qa(QUESTION, num_rewordings=0)[0]
+    assert result["metadata"]["note_filenames"] == ["first"]
+
+
+def test_near_duplicates_use_the_similarity_threshold(tmp_path, fake_qa) -> None:
+    zkb = ZKB(
+        data_dir=str(tmp_path / "data"),
+        db_dir=str(tmp_path / "db"),
+        qa_backend=fake_qa,
+        qa_dedup_similarity=0.85,
+    )
+    zkb.create_note("first", "Paris is in France.")
+    zkb.create_note("second", "Paris is located in France.")
+    zkb.create_note("third", "Rome is in Italy.")
+
+    assert len(_rows(fake_qa, "second")["ids"]) == 0
+    assert len(_rows(fake_qa, "third")["ids"]) > 0
+    assert zkb.qa_refs.stats() == {"refs": 1, "shared_pairs": 1}
+
+
+class L2Collection(FakeCollection):
+    """Reports squared L2 distances, as a default chromadb collection does."""
+
+    metadata = {"hnsw:space": "l2"}
+
+    def query(self, *args, **kwargs) -> dict:
+        result = super().query(*args, **kwargs)
+        result["distances"] = [[2 * d for d in row] for row in result["distances"]]
+        return result
+
+
+def test_near_duplicates_in_an_l2_collection(tmp_path, fake_qa, monkeypatch) -> None:
+    fake_qa.collection = L2Collection()
+    # Same answer, questions at cosine similarity 0.87: squared L2 distance 0.27
+    monkeypatch.setattr(
+        fake_qa, "generate_qa_pairs", lambda text: [{"q": text, "a": "In France."}]
+    )
+    zkb = ZKB(
+        data_dir=str(tmp_path / "data"),
+        db_dir=str(tmp_path / "db"),
+        qa_backend=fake_qa,
+        qa_dedup_similarity=0.85,
+    )
+    zkb.create_note("first", "Where is Paris?")
+    zkb.create_note("second", "Where is Paris located?")
+
+    assert len(_rows(fake_qa, "second")["ids"]) == 0
+    assert zkb.qa_refs.stats() == {"refs": 1, "shared_pairs": 1}
+
+
+def test_deduplication_can_be_disabled(tmp_path, fake_qa) -> None:
+    zkb = ZKB(
+        data_dir=str(tmp_path / "data"),
+        db_dir=str(tmp_path / "db"),
+        qa_backend=fake_qa,
+        qa_dedup_similarity=0,
+    )
+    zkb.create_note("first", "Paris is in France.")
+    zkb.create_note("second", "Paris is in France.")
+
+    assert zkb.qa_refs is None
+    assert len(_rows(fake_qa, "second")["ids"]) > 0
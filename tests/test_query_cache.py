@@ -0,0 +1,130 @@
+import pytest
+from zkb.query_cache import TTLCache, normalize_question
+
+
+@pytest.fixture
+def indexed_zkb(offline_zkb, fake_qa):
+    offline_zkb.scan_notes()
+    fake_qa.rewording_calls = fake_qa.embedding_calls = 0
+    fake_qa.collection.query_calls = 0
+    return offline_zkb
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries() -> None:
+    cache = TTLCache(max_entries=10, ttl=0)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_normalize_question() -> None:
+    assert normalize_question("  What IS\tthis? ") == "what is this?"
+
+
+def test_query_qa_reuses_rewordings_and_results(indexed_zkb, fake_qa) -> None:
+    first = indexed_zkb.query_qa("What is an example note?", num_rewordings=2)
+    assert fake_qa.rewording_calls == 1
+
+    assert indexed_zkb.query_qa("what is an  example note?", num_rewordings=2) == first
+    assert fake_qa.rewording_calls == 1
+    assert fake_qa.collection.query_calls == 1
+
+    # A different n_results misses the results cache but not the rewordings
+    indexed_zkb.query_qa("What is an example note?", n_results=1, num_rewordings=2)
+    assert fake_qa.rewording_calls == 1
+    assert fake_qa.embedding_calls == 1
+    assert fake_qa.collection.query_calls == 2
+
+    stats = indexed_zkb.query_cache_stats()
+    assert stats["rewordings"]["hits"] == 1
+    assert stats["results"]["hits"] == 1
+
+
+def test_query_qa_results_invalidated_on_change(indexed_zkb, fake_qa) -> None:
+    question = "What does the note say about Tomatoes need sun?"
+    assert not any(
+        r["metadata"]["note_filename"] == "garden"
+        for r in indexed_zkb.query_qa(question, num_rewordings=0)
+    )
+
+    indexed_zkb.create_note("garden", "Tomatoes need sun.")
+    fake_qa.embedding_calls = 0  # deduplication embeds the new pairs
+    results = indexed_zkb.query_qa(question, num_rewordings=0)
+    assert results[0]["metadata"]["note_filename"] == "garden"
+
+    indexed_zkb.delete_note("garden")
+    results = indexed_zkb.query_qa(question, num_rewordings=0)
+    assert all(r["metadata"]["note_filename"] != "garden" for r in results)
+    assert fake_qa.embedding_calls == 0
+
+
+def test_query_qa_results_are_copies(indexed_zkb) -> None:
+    indexed_zkb.query_qa("example", num_rewordings=0)[0]["answer"] = "changed"
+
+    assert indexed_zkb.query_qa("example", num_rewordings=0)[0]["answer"] != "changed"
+
+
+def test_query_cache_disabled(tmp_path, fake_qa) -> None:
+    from zkb import ZKB
+
+    zkb = ZKB(
+        data_dir=str(tmp_path / "data"),
+        db_dir=str(tmp_path / "db"),
+        qa_backend=fake_qa,
+        query_cache_size=0,
+    )
+    zkb.query_qa("anything", num_rewordings=1)
+    zkb.query_qa("anything", num_rewordings=1)
+
+    assert fake_qa.rewording_calls == 2
+
+
+def test_query_qa_batch_matches_query_qa(indexed_zkb, fake_qa) -> None:
+    questions = [
+        "What is an example note?",
+        "Where is Paris?",
+        "what is an  example note?",
+        "Which note links to another?",
+    ]
+
+    batch = indexed_zkb.query_qa_batch(questions, n_results=3, num_rewordings=2)
+
+    assert fake_qa.rewording_calls == 3
+    assert fake_qa.embedding_calls == 1
+    assert fake_qa.collection.query_calls == 1
+    assert batch[0] == batch[2]
+    indexed_zkb.clear_query_cache()
+    assert batch == [
+        indexed_zkb.query_qa(question, n_results=3, num_rewordings=2)
+        for question in questions
+    ]
+
+
+def test_query_qa_batch_shares_the_query_cache(indexed_zkb, fake_qa) -> None:
+    first = indexed_zkb.query_qa("Where is Paris?", num_rewordings=0)
+
+    batch = indexed_zkb.query_qa_batch(
+        ["Where is Paris?", "What is an example note?"], num_rewordings=0
+    )
+
+    assert batch[0] == first
+    assert fake_qa.collection.query_calls == 2
+    assert (
+        indexed_zkb.query_qa("What is an example note?", num_rewordings=0) == (batch[1])
+    )
+    assert fake_qa.collection.query_calls == 2
+    assert indexed_zkb.query_qa_batch([]) == []
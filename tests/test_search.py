@@ -0,0 +1,111 @@
+import pytest
+from zkb.db import build_match_query
+
+
+@pytest.fixture
+def searchable_zkb(offline_zkb):
+    offline_zkb.scan_notes()
+    return offline_zkb
+
+
+def _filenames(hits) -> list:
+    return [hit["filename"] for hit in hits]
+
+
+def test_build_match_query() -> None:
+    assert build_match_query("") is None
+    assert build_match_query('  "" * ') is None
+    assert build_match_query("foo bar") == '"foo" "bar"'
+    assert build_match_query('"exact phrase" pre*') == '"exact phrase" "pre"*'
+    assert build_match_query('say "hi') == '"say" "\\"hi"'.replace('\\"', '""')
+    assert build_match_query("x", ["title"]) == '{title} : ("x")'
+    with pytest.raises(ValueError):
+        build_match_query("x", ["nope"])
+
+
+def test_search_ranks_title_matches_first(searchable_zkb) -> None:
+    searchable_zkb.create_note("mentions", "An aside about another topic entirely.")
+
+    hits = searchable_zkb.search("another")
+
+    assert _filenames(hits)[0] == "another_note"
+    assert "mentions" in _filenames(hits)
+
+
+def test_search_prefix_and_phrase_queries(searchable_zkb) -> None:
+    assert searchable_zkb.search("exam") == []
+    assert _filenames(searchable_zkb.search("exam*", fields=["body"])) == [
+        "example_note"
+    ]
+    assert _filenames(searchable_zkb.search('"example note"')) == ["example_note"]
+    assert searchable_zkb.search('"note example"') == []
+
+
+def test_search_snippets_highlight_matches(searchable_zkb) -> None:
+    (hit,) = searchable_zkb.search("links", fields=["body"])
+
+    assert "[links]" in hit["snippet"]
+
+
+def test_search_limit_and_offset(searchable_zkb) -> None:
+    everything = _filenames(searchable_zkb.search("note*", limit=None))
+
+    assert len(everything) == 2
+    assert _filenames(searchable_zkb.search("note*", limit=1)) == everything[:1]
+    assert _filenames(searchable_zkb.search("note*", limit=1, offset=1)) == (
+        everything[1:]
+    )
+
+
+def test_search_frontmatter(searchable_zkb) -> None:
+    assert set(_filenames(searchable_zkb.search("test"))) == {
+        "example_note",
+        "another_note",
+    }
+    assert searchable_zkb.search_notes("test") == []
+
+
+def test_search_tolerates_fts_syntax_in_queries(searchable_zkb) -> None:
+    assert searchable_zkb.search('AND OR ( ") NEAR example.') == []
+    assert _filenames(searchable_zkb.search("example.", fields=["body"])) == [
+        "example_note"
+    ]
+
+
+def test_search_index_follows_crud(searchable_zkb) -> None:
+    searchable_zkb.create_note("volcano", "Lava flows downhill.")
+    assert _filenames(searchable_zkb.search("lava")) == ["volcano"]
+
+    searchable_zkb.update_note("volcano", "Magma stays underground.")
+    assert searchable_zkb.search("lava") == []
+    assert _filenames(searchable_zkb.search("magma")) == ["volcano"]
+
+    searchable_zkb.delete_note("volcano")
+    assert searchable_zkb.search("magma") == []
+
+
+def test_scan_backfills_search_index_of_older_databases(searchable_zkb) -> None:
+    with searchable_zkb.db.conn:
+        searchable_zkb.db.conn.execute("DELETE FROM notes_fts")
+    searchable_zkb.db.set_meta("search_index_stale", "1")
+
+    searchable_zkb.scan_notes()
+
+    assert len(searchable_zkb.search("note*")) == 2
+    assert searchable_zkb.db.get_meta("search_index_stale") is None
+
+
+def test_note_records(searchable_zkb) -> None:
+    records = searchable_zkb.read_note_records()
+    by_name = {record.filename: record for record in records}
+
+    assert set(by_name) == {"example_note", "another_note"}
+    assert by_name["example_note"].links == ("another_note", "yet_another_note")
+    assert searchable_zkb.read_note_records(["another_note", "nope"]) == [
+        by_name["another_note"]
+    ]
+
+    hits = searchable_zkb.search_notes("example", as_records=True)
+    assert [hit.filename for hit in hits] == [
+        note.filename for note in searchable_zkb.search_notes("example")
+    ]
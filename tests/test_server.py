@@ -0,0 +1,169 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from zkb.cli import CLI
+from zkb import ZKB, metrics
+from zkb.bench.fake_qa import FakeQuestionAnswerKB
+from zkb.client import ServerError, ZKBClient
+from zkb.metrics import Metrics
+from zkb.server import ZKBServer
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="Unix sockets are not available"
+)
+
+
+@pytest.fixture
+def server(offline_zkb, tmp_path):
+    server = ZKBServer(offline_zkb, tmp_path / "zkb.sock", workers=4)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while ZKBClient.connect(server.socket_path) is None:
+        assert time.monotonic() < deadline, "server did not start"
+        time.sleep(0.01)
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+def test_client_calls_zkb_methods(server) -> None:
+    with ZKBClient(server.socket_path) as client:
+        client.create_note("first", "See [[second]].")
+        client.create_note("second", "Paris is in France.", {"title": "Second"})
+
+        assert client.find_backlinks("second") == ["first"]
+        assert ["first", "second"] == sorted(
+            hit["filename"] for hit in client.search("paris OR see", match_any=True)
+        )
+        note = client.read_note("second")
+        assert note["metadata"] == {"title": "Second"}
+        assert note["content"].strip() == "Paris is in France."
+        assert client.query_qa("Where is Paris?", num_rewordings=0)
+
+        client.delete_note("first")
+        assert client.find_backlinks("second") == []
+
+
+def test_client_applies_batches_of_changes(server) -> None:
+    with ZKBClient(server.socket_path) as client:
+        counts = client.apply_changes(
+            [
+                ["create", "draft", "First draft."],
+                {"action": "update", "filename": "draft", "content": "See [[x]]."},
+                ["delete", "example_note"],
+            ]
+        )
+
+        assert counts == {"created": 1, "updated": 0, "deleted": 1, "coalesced": 1}
+        assert client.find_broken_links() == [["draft", "x"]]
+
+
+def test_errors_are_raised_by_the_client(server) -> None:
+    with ZKBClient(server.socket_path) as client:
+        with pytest.raises(FileNotFoundError):
+            client.read_note("missing")
+        with pytest.raises(ValueError, match="Unknown method"):
+            client.call("_purge_note", "first", "/first.md")
+        with pytest.raises(TypeError):
+            client.call("find_backlinks", "a", "b", "c")
+        with pytest.raises(ServerError, match="ProgrammingError"):
+            client.find_backlinks(["not", "a", "filename"])
+        # The connection survives errors
+        assert client.find_orphaned_notes() == server.zkb.find_orphaned_notes()
+
+
+def test_concurrent_clients(server) -> None:
+    server.zkb.create_note("hub", "The hub note.")
+    for i in range(10):
+        server.zkb.create_note(f"spoke_{i}", "Links to [[hub]].")
+
+    def query(i: int) -> list:
+        with ZKBClient(server.socket_path) as client:
+            if i % 2:
+                client.update_note(f"spoke_{i % 10}", "Links to [[hub]] again.")
+            return client.find_backlinks("hub")
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(query, range(40)))
+
+    assert all(len(backlinks) == 10 for backlinks in results)
+
+
+def test_cli_uses_a_running_server(server, tmp_path, capsys) -> None:
+    server.zkb.create_note("first", "See [[second]].")
+    cli = CLI(
+        data_dir=str(server.zkb.data_path),
+        db_path=str(tmp_path / "elsewhere" / "zkb.db"),
+        socket_path=server.socket_path,
+    )
+
+    cli.find_backlinks("second")
+
+    assert isinstance(cli.zkb, ZKBClient)
+    assert capsys.readouterr().out.splitlines() == ["Backlinks to second:", "first"]
+
+
+def test_cli_ignores_a_server_of_another_vault(server, tmp_path, capsys) -> None:
+    other = ZKB(
+        data_dir=str(tmp_path / "other"),
+        db_dir=str(tmp_path / "other_db"),
+        qa_backend=FakeQuestionAnswerKB(),
+    )
+    other.create_note("local", "See [[elsewhere]].")
+    cli = CLI(
+        data_dir=str(tmp_path / "other"),
+        db_path=str(tmp_path / "other_db" / "zkb.db"),
+        socket_path=server.socket_path,
+    )
+
+    cli.find_backlinks("elsewhere")
+
+    assert not isinstance(cli.zkb, ZKBClient)
+    assert capsys.readouterr().out.splitlines() == ["Backlinks to elsewhere:", "local"]
+
+
+def test_a_second_server_refuses_the_socket(server) -> None:
+    with pytest.raises(RuntimeError, match="already listening"):
+        ZKBServer(server.zkb, server.socket_path).serve()
+
+
+def test_server_saves_its_metrics(offline_zkb, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(metrics.METRICS, "enabled", True)
+    metrics.reset()
+    metrics_path = tmp_path / "metrics.json"
+    server = ZKBServer(
+        offline_zkb,
+        tmp_path / "zkb.sock",
+        metrics_path=metrics_path,
+        metrics_interval=0.05,
+    )
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while (client := ZKBClient.connect(server.socket_path)) is None:
+        assert time.monotonic() < deadline, "server did not start"
+        time.sleep(0.01)
+
+    with client:
+        client.search_notes("example")
+        # Saved while the server keeps running
+        while "search_notes" not in Metrics.load(metrics_path).snapshot():
+            assert time.monotonic() < deadline, "metrics were not saved"
+            time.sleep(0.01)
+        client.search_notes("example")
+    server.stop()
+    thread.join(5)
+
+    assert Metrics.load(metrics_path).snapshot()["search_notes"]["count"] == 2
+    assert metrics.snapshot() == {}
+
+
+def test_clients_fall_back_without_a_server(tmp_path) -> None:
+    (tmp_path / "zkb.sock").touch()
+
+    assert ZKBClient.connect(tmp_path / "zkb.sock") is None
+    assert ZKBClient.connect(tmp_path / "missing.sock") is None
@@ -0,0 +1,130 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from zkb import ZKB  # noqa: E402
+from zkb.bench.fake_qa import FakeQuestionAnswerKB  # noqa: E402
+from zkb.vector_index import FLOAT16, INT8, PQ, IVFIndex  # noqa: E402
+
+
+def _clustered(n: int, dim: int = 32, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    x = centers[rng.integers(0, 20, n)] + 0.5 * rng.normal(size=(n, dim))
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _recall(index: IVFIndex, x, queries, k: int = 10, **kwargs) -> float:
+    exact = np.argsort(-(queries @ x.T), axis=1)[:, :k]
+    found = index.search(queries, k, **kwargs)
+    return np.mean(
+        [
+            len({int(id_) for id_, _ in hits} & set(row)) / k
+            for hits, row in zip(found, exact)
+        ]
+    )
+
+
+def _built(storage: str, x) -> IVFIndex:
+    index = IVFIndex(storage, nlist=32, nprobe=8)
+    index.train(x)
+    index.build([([str(i) for i in range(len(x))], x)])
+    return index
+
+
+@pytest.mark.parametrize("storage", [PQ, INT8, FLOAT16])
+def test_search_recalls_the_exact_neighbours(storage) -> None:
+    x = _clustered(3000)
+    queries = _clustered(50, seed=1)
+    index = _built(storage, x)
+
+    def fetch(ids):
+        return ids, x[[int(id_) for id_ in ids]]
+
+    assert len(index) == 3000
+    assert _recall(index, x, queries, rerank=4, fetch=fetch) >= 0.9
+    assert _recall(index, x, queries, nprobe=len(index.centroids)) >= (
+        0.5 if storage == PQ else 0.9
+    )
+
+
+def test_changes_survive_save_and_load(tmp_path) -> None:
+    x = _clustered(2000)
+    index = _built(PQ, x)
+    index.remove(["0", "1"])
+    index.add(["new"], x[:1])
+    index.save(tmp_path, "7")
+
+    loaded = IVFIndex(PQ)
+    assert loaded.load(tmp_path) == "7"
+    assert isinstance(loaded._codes, np.memmap)
+    assert len(loaded) == 1999
+    hits = [id_ for id_, _ in loaded.search(x[:1], 3, nprobe=64)[0]]
+    assert "new" in hits and "0" not in hits
+    assert loaded.search(x[5:10], 5) == index.search(x[5:10], 5)
+    assert IVFIndex(INT8).load(tmp_path) is None
+
+
+def _vault(tmp_path, qa_backend) -> ZKB:
+    return ZKB(
+        data_dir=str(tmp_path / "data"),
+        db_dir=str(tmp_path / "db"),
+        qa_backend=qa_backend,
+        qa_vector_index=FLOAT16,
+        qa_vector_nprobe=1000,
+        qa_vector_min_entries=20,
+        qa_dedup_similarity=0,
+    )
+
+
+def test_query_qa_is_answered_by_the_index(tmp_path, fake_qa) -> None:
+    store = fake_qa.collection
+    zkb = _vault(tmp_path, fake_qa)
+    zkb.apply_changes(
+        [
+            ("create", f"note_{i}", f"Fact {i} concerns topic {i % 7}. It holds {i}.")
+            for i in range(30)
+        ]
+    )
+    exact_qa = FakeQuestionAnswerKB()
+    exact_qa.collection = store
+    exact = ZKB(
+        data_dir=str(tmp_path / "data"),
+        db_dir=str(tmp_path / "exact_db"),
+        qa_backend=exact_qa,
+    ).query_qa("What concerns topic 3?", n_results=3, num_rewordings=0)
+    store.query_calls = 0
+
+    results = zkb.query_qa("What concerns topic 3?", n_results=3, num_rewordings=0)
+
+    assert zkb.qa_kb.collection.active
+    assert (tmp_path / "db" / "qa_index" / "meta.json").exists()
+    assert store.query_calls == 0
+    # Ties aside, which may break either way, the index finds the exact best
+    assert results[0]["similarity"] == pytest.approx(exact[0]["similarity"], abs=1e-3)
+
+    zkb.delete_note("note_3")
+    results = zkb.query_qa("What concerns topic 3?", n_results=60)
+    assert len(results) == 56
+    assert all(r["metadata"]["note_filename"] != "note_3" for r in results)
+
+
+def test_index_follows_changes_by_another_process(tmp_path, fake_qa) -> None:
+    store = fake_qa.collection
+    zkb = _vault(tmp_path, fake_qa)
+    zkb.apply_changes([("create", f"note_{i}", f"Fact number {i}.") for i in range(30)])
+    zkb.query_qa("Fact number 4.")
+    # A second process over the same QA store opens the saved index
+    other_qa = FakeQuestionAnswerKB()
+    other_qa.collection = store
+    other = _vault(tmp_path, other_qa)
+    collection = other.qa_kb.collection
+    collection._rebuild = lambda version: pytest.fail("rebuilt a current index")
+    other.query_qa("Fact number 4.")
+    assert collection.active
+    del collection._rebuild
+
+    # A change the first ZKB never saw: its index is stale and rebuilt
+    other.create_note("late", "A late arrival.")
+    results = zkb.query_qa("A late arrival.", n_results=1)
+    assert results[0]["metadata"]["note_filename"] == "late"
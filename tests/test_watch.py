@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+
+import pytest
+from zkb import ZKB
+from zkb.bench.fake_qa import FakeQuestionAnswerKB
+from zkb.watch import NoteWatcher
+
+
+@pytest.fixture
+def indexed_zkb(offline_zkb):
+    offline_zkb.scan_notes()
+    return offline_zkb
+
+
+def _qa_filenames(zkb) -> set:
+    metadatas = zkb.qa_kb.collection.get()["metadatas"]
+    return {metadata["note_filename"] for metadata in metadatas}
+
+
+def test_sync_paths_adds_changes_and_removes(indexed_zkb) -> None:
+    notes = indexed_zkb.notes_path
+    (notes / "fresh.md").write_text("A fresh note.")
+    (notes / "example_note.md").write_text("Rewritten example.")
+    (notes / "another_note.md").unlink()
+
+    counts = indexed_zkb.sync_paths(
+        [
+            notes / "fresh.md",
+            notes / "example_note.md",
+            notes / "another_note.md",
+            notes / "draft.md.swp",
+        ]
+    )
+
+    assert counts == {
+        "added": 1,
+        "changed": 1,
+        "unchanged": 0,
+        "removed": 1,
+        "moved": 0,
+    }
+    assert indexed_zkb.search("fresh")[0]["filename"] == "fresh"
+    assert "another_note" not in _qa_filenames(indexed_zkb)
+
+
+def test_sync_paths_treats_renames_as_moves(indexed_zkb, fake_qa) -> None:
+    notes = indexed_zkb.notes_path
+    questions = set(
+        fake_qa.collection.get(where={"note_filename": "example_note"})["documents"]
+    )
+    generate_calls = fake_qa.generate_calls
+    os.rename(notes / "example_note.md", notes / "renamed.md")
+
+    counts = indexed_zkb.sync_paths([notes / "example_note.md", notes / "renamed.md"])
+
+    assert counts["moved"] == 1 and counts["removed"] == counts["added"] == 0
+    assert fake_qa.generate_calls == generate_calls
+    moved = fake_qa.collection.get(where={"note_filename": "renamed"})
+    assert set(moved["documents"]) == questions
+    assert all(id_.startswith("qa_renamed_") for id_ in moved["ids"])
+    assert all(m["note_full_path"].endswith("renamed.md") for m in moved["metadatas"])
+    assert "example_note" not in _qa_filenames(indexed_zkb)
+    assert indexed_zkb.db.get_note_by_filename("example_note") is None
+    assert indexed_zkb.search("example")[0]["filename"] == "renamed"
+
+    # The manifest follows the move, so a rescan has nothing to do
+    assert indexed_zkb.scan_notes()["unchanged"] == 2
+
+
+def test_links_to_a_moved_note_become_broken(indexed_zkb, tmp_path) -> None:
+    notes = indexed_zkb.notes_path
+    os.rename(notes / "another_note.md", notes / "renamed.md")
+
+    indexed_zkb.sync_paths([notes / "another_note.md", notes / "renamed.md"])
+
+    # example_note still links to the old name, as a rescan would report
+    broken = indexed_zkb.find_broken_links()
+    assert ("example_note", "another_note") in broken
+    assert indexed_zkb.find_backlinks("renamed") == []
+    fresh = ZKB(
+        data_dir=str(indexed_zkb.data_path),
+        db_dir=str(tmp_path / "fresh_db"),
+        qa_backend=FakeQuestionAnswerKB(),
+    )
+    fresh.scan_notes()
+    assert sorted(broken) == sorted(fresh.find_broken_links())
+
+
+def _watch_until(watcher, edit, batches: int = 1) -> list:
+    results = []
+
+    def on_batch(result) -> None:
+        results.append(result)
+        if len(results) >= batches:
+            watcher.stop()
+
+    timer = threading.Timer(0.2, edit)
+    timer.start()
+    guard = threading.Timer(10, watcher.stop)
+    guard.start()
+    try:
+        watcher.run(on_batch=on_batch, initial_scan=False)
+    finally:
+        guard.cancel()
+    return results
+
+
+def _save_via_temp_file(notes) -> None:
+    # What many editors do: write a temp file, then rename it over the note
+    temp = notes / ".example_note.md.tmp"
+    temp.write_text("Saved from an editor.")
+    os.replace(temp, notes / "example_note.md")
+    (notes / "example_note.md").touch()
+
+
+def test_polling_watcher_debounces_editor_saves(indexed_zkb) -> None:
+    watcher = NoteWatcher(
+        indexed_zkb, debounce=0.1, poll_interval=0.05, force_polling=True
+    )
+
+    results = _watch_until(watcher, lambda: _save_via_temp_file(watcher.zkb.notes_path))
+
+    assert len(results) == 1
+    assert results[0]["changed"] == 1
+    assert 0 < results[0]["latency"] < 5
+    assert indexed_zkb.search("editor")[0]["filename"] == "example_note"
+
+
+def test_event_watcher_applies_changes(indexed_zkb) -> None:
+    pytest.importorskip("watchfiles")
+    watcher = NoteWatcher(indexed_zkb, debounce=0.1)
+    notes = indexed_zkb.notes_path
+
+    def edit() -> None:
+        time.sleep(0.2)
+        (notes / "watched.md").write_text("Seen by the watcher.")
+
+    results = _watch_until(watcher, edit)
+
+    assert results and results[0]["added"] == 1
+    assert indexed_zkb.search("watcher")[0]["filename"] == "watched"
@@ -1,7 +1,9 @@
+import os
 import shutil
 
 import pytest
 from zkb import ZKB
+from zkb.bench.fake_qa import FakeQuestionAnswerKB
 
 
 @pytest.fixture(scope="function")
@@ -250,3 +252,106 @@ def test_create_note_with_complex_links(zkb):
 
     # Clean up
     zkb.delete_note(filename)
+
+
+@pytest.fixture
+def scanned_zkb(offline_zkb) -> ZKB:
+    offline_zkb.scan_notes()
+    return offline_zkb
+
+
+def _link_state(zkb: ZKB) -> tuple:
+    notes = sorted(row[1] for row in zkb.db.get_all_notes())
+    return (
+        notes,
+        sorted(zkb.find_broken_links()),
+        sorted(zkb.find_orphaned_notes()),
+        {note: sorted(zkb.find_backlinks(note)) for note in notes},
+    )
+
+
+def _fresh_scan(zkb: ZKB, tmp_path) -> ZKB:
+    """A ZKB scanning the same notes into a new database."""
+    fresh = ZKB(
+        data_dir=str(zkb.data_path),
+        db_dir=str(tmp_path / "fresh_db"),
+        qa_backend=FakeQuestionAnswerKB(),
+    )
+    fresh.scan_notes()
+    return fresh
+
+
+def test_rescan_skips_unchanged_notes(scanned_zkb):
+    counts = scanned_zkb.scan_notes()
+    assert counts == {"added": 0, "changed": 0, "unchanged": 2, "removed": 0}
+
+
+def test_rescan_picks_up_changed_added_and_removed_notes(scanned_zkb):
+    notes_path = scanned_zkb.notes_path
+    with open(notes_path / "another_note.md", "a", encoding="utf-8") as f:
+        f.write("\nNow it links to [[example_note]].\n")
+    with open(notes_path / "fresh_note.md", "w", encoding="utf-8") as f:
+        f.write("A note added outside the API.")
+    (notes_path / "example_note.md").unlink()
+
+    counts = scanned_zkb.scan_notes()
+
+    assert counts == {"added": 1, "changed": 1, "unchanged": 0, "removed": 1}
+    assert scanned_zkb.db.get_note_by_filename("example_note") is None
+    assert scanned_zkb.db.get_note_by_filename("fresh_note") is not None
+    assert scanned_zkb.find_backlinks("example_note") == ["another_note"]
+
+
+def test_rescan_ignores_touched_but_unmodified_notes(scanned_zkb):
+    note_file = scanned_zkb.notes_path / "example_note.md"
+    stat = note_file.stat()
+    os.utime(note_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    counts = scanned_zkb.scan_notes()
+
+    assert counts["unchanged"] == 2
+    assert counts["changed"] == 0
+
+
+def test_crud_keeps_manifest_in_sync(scanned_zkb):
+    scanned_zkb.create_note("manifest_note", "Tracked by the manifest.")
+    assert scanned_zkb.scan_notes()["unchanged"] == 3
+
+    scanned_zkb.delete_note("manifest_note")
+    assert scanned_zkb.scan_notes() == {
+        "added": 0,
+        "changed": 0,
+        "unchanged": 2,
+        "removed": 0,
+    }
+
+
+def test_rescan_keeps_links_to_removed_notes_as_broken(scanned_zkb, tmp_path):
+    (scanned_zkb.notes_path / "another_note.md").unlink()
+
+    assert scanned_zkb.scan_notes()["removed"] == 1
+
+    assert ("example_note", "another_note") in scanned_zkb.find_broken_links()
+    assert _link_state(scanned_zkb) == _link_state(_fresh_scan(scanned_zkb, tmp_path))
+
+
+def test_parallel_scan_matches_serial_scan(offline_zkb, tmp_path):
+    for i in range(20):
+        with open(offline_zkb.notes_path / f"bulk_{i}.md", "w", encoding="utf-8") as f:
+            f.write(f"---\ntitle: Bulk {i}\n---\n\nSee [[bulk_{(i + 1) % 25}]].")
+
+    serial, parallel = (
+        ZKB(
+            data_dir=str(offline_zkb.data_path),
+            db_dir=str(tmp_path / f"{name}_db"),
+            qa_backend=FakeQuestionAnswerKB(),
+        )
+        for name in ("serial", "parallel")
+    )
+    serial_counts = serial.scan_notes()
+    parallel_counts = parallel.scan_notes(workers=2, chunk_size=4)
+
+    assert parallel_counts == serial_counts
+    assert parallel.db.get_all_notes() == serial.db.get_all_notes()
+    assert parallel.find_broken_links() == serial.find_broken_links()
+    assert parallel.db.get_manifest() == serial.db.get_manifest()